@@ -4,6 +4,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Settings:
+    # Storage backend: "mysql" (server) or "sqlite" (embedded file in WAL mode, no server needed)
+    DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "isolation_forest.db")
+    SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", 5.0))   # wait for the write lock
+
     # MySQL Configuration
     MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
     MYSQL_PORT = int(os.getenv("MYSQL_PORT", 3306))
@@ -11,15 +16,127 @@ class Settings:
     MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
     MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "isolation_forest_db")
 
+    # MySQL Connection Pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 5.0))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_POOL_PING_INTERVAL_SECONDS = float(os.getenv("DB_POOL_PING_INTERVAL_SECONDS", 30.0))
+    DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", 5))
+    DB_RETRY_BACKOFF_SECONDS = float(os.getenv("DB_RETRY_BACKOFF_SECONDS", 0.5))
+    DB_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("DB_RETRY_BACKOFF_MAX_SECONDS", 8.0))
+    # Apply pending migrations/*.sql at startup (otherwise run `python -m app.schema`)
+    DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "True").lower() == "true"
+
     # FastAPI Configuration
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
     API_PORT = int(os.getenv("API_PORT", 8000))
     API_RELOAD = os.getenv("API_RELOAD", "True").lower() == "true"
+    # Multi-worker mode (gunicorn -c gunicorn.conf.py app.main:app)
+    API_WORKERS = int(os.getenv("API_WORKERS", os.cpu_count() or 1))
+    API_WORKER_TIMEOUT_SECONDS = int(os.getenv("API_WORKER_TIMEOUT_SECONDS", 120))
 
     # Model Configuration
     DEFAULT_CONTAMINATION = float(os.getenv("DEFAULT_CONTAMINATION", 0.1))
     DEFAULT_N_ESTIMATORS = int(os.getenv("DEFAULT_N_ESTIMATORS", 100))
     MIN_TRAINING_SAMPLES = int(os.getenv("MIN_TRAINING_SAMPLES", 100))
+    # How often (seconds) the cached model re-checks the active version stamp
+    MODEL_REFRESH_INTERVAL_SECONDS = float(os.getenv("MODEL_REFRESH_INTERVAL_SECONDS", 5.0))
+    # "compiled" = vectorized NumPy traversal of the flattened forest, "sklearn" = IsolationForest.score_samples
+    SCORING_ENGINE = os.getenv("SCORING_ENGINE", "compiled")
+    # Larger batches are scored by sklearn if the model embeds its estimator; it overtakes the compiled
+    # engine at ~1.2k rows (0 = no limit)
+    COMPILED_MAX_BATCH = int(os.getenv("COMPILED_MAX_BATCH", 1_000))
+    # Models are stored as array artifacts; active ones are memory-mapped from this directory
+    MODEL_ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", "model_artifacts")
+    # Embed the sklearn estimator in artifacts: auto = only with SCORING_ENGINE=sklearn (and in models made by
+    # incremental retraining), true = always (also needed to incrementally retrain a fully trained model), false = never.
+    # Arrays-only artifacts are ~4x smaller than with the estimator and ~3x smaller than the legacy pickle
+    MODEL_ARTIFACT_INCLUDE_ESTIMATOR = os.getenv("MODEL_ARTIFACT_INCLUDE_ESTIMATOR", "auto").lower()   # auto | true | false
+
+    # Training data loading (streamed from analyzed_requests in chunks)
+    TRAINING_MAX_SAMPLES = int(os.getenv("TRAINING_MAX_SAMPLES", 10_000))
+    TRAINING_SAMPLING = os.getenv("TRAINING_SAMPLING", "latest")   # latest | reservoir
+    TRAINING_WINDOW_DAYS = float(os.getenv("TRAINING_WINDOW_DAYS", 0))   # 0 = no time window
+    TRAINING_CHUNK_SIZE = int(os.getenv("TRAINING_CHUNK_SIZE", 10_000))
+    TRAINING_MEMMAP_DIR = os.getenv("TRAINING_MEMMAP_DIR", "")   # set to build the matrix in a .npy on disk
+
+    # Background training jobs (fitting runs in separate processes)
+    TRAINING_PROCESSES = int(os.getenv("TRAINING_PROCESSES", 1))
+    TRAINING_PROGRESS_TREES = int(os.getenv("TRAINING_PROGRESS_TREES", 10))   # trees per progress update
+    TRAINING_JOBS_RETAINED = int(os.getenv("TRAINING_JOBS_RETAINED", 100))   # finished jobs kept for status queries
+    TRAINING_JOBS_DIR = os.getenv("TRAINING_JOBS_DIR", "training_jobs")   # job status files shared by workers ("" = off)
+    TRAINING_JOBS_MAX_AGE_DAYS = float(os.getenv("TRAINING_JOBS_MAX_AGE_DAYS", 7))   # finished status files older than this are deleted (0 = never)
+    # Incremental (rolling forest) retraining: oldest trees replaced per update
+    INCREMENTAL_NEW_TREES = int(os.getenv("INCREMENTAL_NEW_TREES", 20))
+
+    # IP reputation lists (one IP/CIDR per line, optional score), comma-separated paths
+    IP_BLOCKLIST_PATHS = [p for p in os.getenv("IP_BLOCKLIST_PATHS", "").split(",") if p]
+    IP_ALLOWLIST_PATHS = [p for p in os.getenv("IP_ALLOWLIST_PATHS", "").split(",") if p]
+    IP_REPUTATION_DEFAULT_SCORE = float(os.getenv("IP_REPUTATION_DEFAULT_SCORE", 0.5))
+    IP_REPUTATION_CACHE_SIZE = int(os.getenv("IP_REPUTATION_CACHE_SIZE", 100_000))
+    IP_LISTS_RELOAD_SECONDS = float(os.getenv("IP_LISTS_RELOAD_SECONDS", 30.0))   # 0 disables hot reload
+
+    # Payload measurement limits (traversal stops early once exceeded)
+    PAYLOAD_MAX_NODES = int(os.getenv("PAYLOAD_MAX_NODES", 100_000))
+    PAYLOAD_MAX_DEPTH = int(os.getenv("PAYLOAD_MAX_DEPTH", 64))
+    PAYLOAD_MAX_SIZE = int(os.getenv("PAYLOAD_MAX_SIZE", 1_000_000))
+
+    # Endpoint / User-Agent rules (optional JSON file with extra weighted rules)
+    RULES_PATH = os.getenv("RULES_PATH", "")
+    RULE_CACHE_SIZE = int(os.getenv("RULE_CACHE_SIZE", 50_000))
+
+    # Per-IP request rate tracking (frequency_score feature)
+    RATE_WINDOW_SECONDS = float(os.getenv("RATE_WINDOW_SECONDS", 60.0))
+    RATE_BUCKET_SECONDS = float(os.getenv("RATE_BUCKET_SECONDS", 1.0))
+    RATE_SATURATION_COUNT = int(os.getenv("RATE_SATURATION_COUNT", 120))   # requests/window that score 1.0
+    RATE_TRACKER_MAX_IPS = int(os.getenv("RATE_TRACKER_MAX_IPS", 100_000))
+    RATE_TRACKER_BACKEND = os.getenv("RATE_TRACKER_BACKEND", "memory")   # memory | redis
+    RATE_TRACKER_REDIS_URL = os.getenv("RATE_TRACKER_REDIS_URL", "redis://localhost:6379/0")
+    RATE_TRACKER_REDIS_BACKOFF_SECONDS = float(os.getenv("RATE_TRACKER_REDIS_BACKOFF_SECONDS", 5.0))   # count locally this long after a Redis error
+
+    # Micro-batching of concurrent /analyze calls
+    MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "True").lower() == "true"
+    MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", 2.0))
+    MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", 256))
+
+    # Write-behind persistence of analysis results
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "True").lower() == "true"
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500))
+    WRITE_BEHIND_FLUSH_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", 200.0))
+    WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", 50_000))
+    WRITE_BEHIND_POLICY = os.getenv("WRITE_BEHIND_POLICY", "block")   # block | drop | spill
+    WRITE_BEHIND_BLOCK_TIMEOUT_SECONDS = float(os.getenv("WRITE_BEHIND_BLOCK_TIMEOUT_SECONDS", 1.0))
+    WRITE_BEHIND_SPILL_DIR = os.getenv("WRITE_BEHIND_SPILL_DIR", "spill")
+
+    # Pre-aggregated statistics (in-memory counters flushed into the hourly rollup table)
+    STATS_FLUSH_INTERVAL_SECONDS = float(os.getenv("STATS_FLUSH_INTERVAL_SECONDS", 5.0))
+    STATS_MAX_STALENESS_SECONDS = float(os.getenv("STATS_MAX_STALENESS_SECONDS", 5.0))   # rollup totals re-read after
+    STATS_MINUTE_RETENTION_HOURS = float(os.getenv("STATS_MINUTE_RETENTION_HOURS", 48))   # hourly rollups are kept
+    STATS_TIMESERIES_MAX_POINTS = int(os.getenv("STATS_TIMESERIES_MAX_POINTS", 5_000))
+
+    # Bulk labeling (PUT /labeling/labels): ids per UPDATE statement and rows per call
+    LABELING_BULK_CHUNK_SIZE = int(os.getenv("LABELING_BULK_CHUNK_SIZE", 1_000))
+    LABELING_BULK_MAX_ROWS = int(os.getenv("LABELING_BULK_MAX_ROWS", 100_000))
+
+    # Audit listing: exact COUNT(*) results reused per filter for this long
+    AUDIT_COUNT_CACHE_SECONDS = float(os.getenv("AUDIT_COUNT_CACHE_SECONDS", 30.0))
+
+    # Archive: analyzed requests older than ARCHIVE_AFTER_DAYS move to day-partitioned Parquet files (needs pyarrow)
+    ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 0))   # 0 = keep everything in the database
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+    ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", 3600.0))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 10_000))   # rows moved per transaction
+    ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+
+    # Observability
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"   # latency histograms on /metrics
+
+    # Thread pools for blocking work (keeps the event loop responsive)
+    DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", 16))
+    INFERENCE_THREADPOOL_SIZE = int(os.getenv("INFERENCE_THREADPOOL_SIZE", 2))
+    TRAINING_THREADPOOL_SIZE = int(os.getenv("TRAINING_THREADPOOL_SIZE", 1))
 
     @property
     def DATABASE_URL(self):
@@ -1,73 +1,652 @@
+import functools
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError, OperationalError
 from app.config import settings
+from app.executors import run_in_db
+from app.services.metrics import POOL_WAIT, db_seconds, timed
+
+logger = logging.getLogger(__name__)
+
+# Whole transaction, from checkout to commit (includes the caller's work inside the block)
+TRANSACTION_SECONDS = db_seconds.labels("transaction")
+
+
+class PoolTimeoutError(Error):
+    """Raised when no connection could be checked out within the pool timeout"""
+
+
+# Errors worth retrying (lost connection, lock wait, pool exhausted); anything
+# else (DataError, IntegrityError, ...) fails the same way every time
+TRANSIENT_ERRORS = (InterfaceError, OperationalError, PoolTimeoutError, sqlite3.OperationalError)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQL connections.
+
+    Keeps up to `size` idle connections and allows `max_overflow` extra
+    connections under load (closed again on checkin). Connections that sat idle
+    longer than `ping_interval` are pinged before reuse and replaced if dead;
+    new connections are opened with exponential backoff.
+    """
+
+    def __init__(self, size, max_overflow, timeout, pre_ping, ping_interval,
+                 connect_retries, backoff, backoff_max, **connect_args):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.ping_interval = ping_interval
+        self.connect_retries = connect_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.connect_args = connect_args
+
+        # Idle connections as (connection, returned_at); LIFO keeps hot connections in use
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size + max_overflow)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Statistics
+        self._checked_out = 0
+        self._peak_checked_out = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._reconnects = 0
+        self._failed_pings = 0
+        self._wait_seconds_sum = 0.0
+        self._wait_seconds_max = 0.0
+
+    def checkout(self):
+        """Borrow a healthy connection, waiting at most `timeout` seconds for a free slot."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.timeout}s waiting for a database connection "
+                f"(pool size {self.size}, overflow {self.max_overflow})"
+            )
+
+        try:
+            connection = self._take_idle() or self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - started
+        POOL_WAIT.observe(waited)
+        with self._lock:
+            self._checkouts += 1
+            self._checked_out += 1
+            self._peak_checked_out = max(self._peak_checked_out, self._checked_out)
+            self._wait_seconds_sum += waited
+            self._wait_seconds_max = max(self._wait_seconds_max, waited)
+        return connection
+
+    def checkin(self, connection, discard=False):
+        """Return a connection; broken or overflow connections are closed instead of kept."""
+        with self._lock:
+            self._checked_out -= 1
+        try:
+            if discard or self._closed or self._idle.qsize() >= self.size:
+                self._close(connection)
+            else:
+                self._idle.put((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection; checked-out ones are closed on checkin."""
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(connection)
+
+    def stats(self):
+        with self._lock:
+            checked_out = self._checked_out
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "checked_out": checked_out,
+                "idle": self._idle.qsize(),
+                "overflow_in_use": max(checked_out - self.size, 0),
+                "utilization": round(checked_out / (self.size + self.max_overflow), 4),
+                "peak_checked_out": self._peak_checked_out,
+                "checkouts": self._checkouts,
+                "checkout_timeouts": self._timeouts,
+                "average_wait_ms": round(self._wait_seconds_sum / self._checkouts * 1000.0, 4) if self._checkouts else 0.0,
+                "max_wait_ms": round(self._wait_seconds_max * 1000.0, 4),
+                "connections_created": self._created,
+                "reconnects": self._reconnects,
+                "failed_pings": self._failed_pings,
+            }
+
+    def _take_idle(self):
+        while True:
+            try:
+                connection, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if not self.pre_ping or time.monotonic() - returned_at < self.ping_interval:
+                return connection
+            try:
+                connection.ping(reconnect=False)
+                return connection
+            except Error:
+                with self._lock:
+                    self._failed_pings += 1
+                self._close(connection)
+
+    def _open(self):
+        delay = self.backoff
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                connection = mysql.connector.connect(**self.connect_args)
+                with self._lock:
+                    self._created += 1
+                    if attempt > 1:
+                        self._reconnects += 1
+                return connection
+            except Error as e:
+                if attempt == self.connect_retries:
+                    raise
+                logger.warning("Error connecting to MySQL (attempt %d/%d): %s", attempt, self.connect_retries, e)
+                time.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
 
 
 class Database:
+    """
+    MySQL backend: every call borrows a connection from a ConnectionPool.
+
+    Connections run in autocommit mode, so one that only serves SELECTs never
+    keeps a REPEATABLE READ snapshot while it sits in the pool; transaction()
+    and execute_many() open an explicit transaction.
+    """
+
+    dialect = "mysql"
+
     def __init__(self):
-        self.connection = None
+        self.pool = None
 
     def connect(self):
-        """Establish connection to MySQL database"""
+        """Create the connection pool and open the first connection to MySQL"""
+        self.pool = ConnectionPool(
+            size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pre_ping=settings.DB_POOL_PRE_PING,
+            ping_interval=settings.DB_POOL_PING_INTERVAL_SECONDS,
+            connect_retries=settings.DB_CONNECT_RETRIES,
+            backoff=settings.DB_RETRY_BACKOFF_SECONDS,
+            backoff_max=settings.DB_RETRY_BACKOFF_MAX_SECONDS,
+            host=settings.MYSQL_HOST,
+            port=settings.MYSQL_PORT,
+            user=settings.MYSQL_USER,
+            password=settings.MYSQL_PASSWORD,
+            database=settings.MYSQL_DATABASE,
+            # Every read sees the latest commits (model stamp, rollup totals, archived rows)
+            autocommit=True,
+        )
         try:
-            self.connection = mysql.connector.connect(
-                host=settings.MYSQL_HOST,
-                port=settings.MYSQL_PORT,
-                user=settings.MYSQL_USER,
-                password=settings.MYSQL_PASSWORD,
-                database=settings.MYSQL_DATABASE
-            )
-            if self.connection.is_connected():
-                print(f"Successfully connected to MySQL database: {settings.MYSQL_DATABASE}")
-            return self.connection
+            # Warm up one connection so misconfiguration shows at startup
+            self.pool.checkin(self.pool.checkout())
+            logger.info("Successfully connected to MySQL database: %s", settings.MYSQL_DATABASE)
         except Error as e:
-            print(f"Error connecting to MySQL: {e}")
-            return None
+            # The pool keeps retrying on later checkouts
+            logger.error("Error connecting to MySQL: %s", e)
+        return self.pool
 
     def disconnect(self):
-        """Close the database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("MySQL connection closed")
+        """Close all pooled connections"""
+        if self.pool is not None:
+            self.pool.close()
+            logger.info("MySQL connection pool closed")
+
+    def is_connected(self):
+        return self.pool is not None
+
+    def stats(self):
+        return self.pool.stats() if self.pool is not None else None
+
+    @contextmanager
+    def _connection(self):
+        """Check out a connection for one call; discard it if the link broke."""
+        connection = self.pool.checkout()
+        discard = False
+        try:
+            yield connection
+        except (InterfaceError, OperationalError):
+            discard = True
+            raise
+        finally:
+            self.pool.checkin(connection, discard=discard)
 
+    @timed(db_seconds.labels("execute_query"))
     def execute_query(self, query, params=None):
         """Execute a query that modifies data (INSERT, UPDATE, DELETE)"""
-        cursor = self.connection.cursor(dictionary=True)
+        with self._connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params or ())
+                connection.commit()
+                return cursor
+            except Error as e:
+                logger.error("Error executing query: %s", e)
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run several statements on one connection and commit them together (rolled back on error)"""
+        started = time.perf_counter()
+        with self._connection() as connection:
+            connection.start_transaction()
+            cursor = connection.cursor(dictionary=True)
+            try:
+                yield cursor
+                connection.commit()
+            except Exception as e:
+                logger.error("Error in transaction, rolling back: %s", e)
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+                TRANSACTION_SECONDS.observe(time.perf_counter() - started)
+
+    @timed(db_seconds.labels("execute_many"))
+    def execute_many(self, query, params_seq):
+        """Execute one statement for many parameter rows (multi-row INSERT) in a single commit"""
+        if not params_seq:
+            return 0
+        with self._connection() as connection:
+            connection.start_transaction()
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(query, params_seq)
+                connection.commit()
+                return cursor.rowcount
+            except Error as e:
+                logger.error("Error executing batch query: %s", e)
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    @timed(db_seconds.labels("fetch_one"))
+    def fetch_one(self, query, params=None):
+        """Fetch a single row from the database"""
+        with self._connection() as connection:
+            # Buffered so unread rows never leave the pooled connection dirty
+            cursor = connection.cursor(dictionary=True, buffered=True)
+            try:
+                cursor.execute(query, params or ())
+                return cursor.fetchone()
+            except Error as e:
+                logger.error("Error fetching data: %s", e)
+                raise
+            finally:
+                cursor.close()
+
+    @timed(db_seconds.labels("fetch_all"))
+    def fetch_all(self, query, params=None):
+        """Fetch all matching rows from the database"""
+        with self._connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params or ())
+                return cursor.fetchall()
+            except Error as e:
+                logger.error("Error fetching data: %s", e)
+                raise
+            finally:
+                cursor.close()
+
+    def stream(self, query, params=None, chunk_size=10_000):
+        """
+        Yield the result rows (tuples) in lists of up to `chunk_size`.
+
+        Uses an unbuffered cursor, so rows are streamed from the server as they
+        are consumed instead of being materialized client-side. The connection
+        stays checked out until the generator is exhausted or closed; a stream
+        abandoned half-way leaves unread rows behind, so its connection is
+        discarded rather than returned to the pool.
+        """
+        connection = self.pool.checkout()
+        exhausted = False
         try:
-            cursor.execute(query, params or ())
-            self.connection.commit()
-            return cursor
-        except Error as e:
-            print(f"Error executing query: {e}")
-            self.connection.rollback()
+            cursor = connection.cursor(buffered=False)
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        exhausted = True
+                        break
+                    yield rows
+            except Error as e:
+                logger.error("Error streaming data: %s", e)
+                raise
+            finally:
+                if exhausted:
+                    cursor.close()
+        finally:
+            self.pool.checkin(connection, discard=not exhausted)
+
+
+# ==============================================================
+# Embedded SQLite backend
+# ==============================================================
+
+# DATETIME columns hold "YYYY-MM-DD HH:MM:SS[.ffffff]" text, which sorts chronologically
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+
+@functools.lru_cache(maxsize=512)
+def _placeholders(query: str) -> str:
+    """Rewrite the MySQL-style %s placeholders used throughout the app to SQLite's ?."""
+    return query.replace("%s", "?")
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class _SQLiteCursor:
+    """sqlite3 cursor with the subset of the mysql.connector cursor API the app uses."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(_placeholders(query), params or ())
+
+    def executemany(self, query, params_seq):
+        self._cursor.executemany(_placeholders(query), params_seq)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteDatabase:
+    """
+    Embedded backend: one SQLite file in WAL mode, same call surface as Database.
+
+    In WAL mode readers and the writer do not block each other, and every
+    worker process can open the same file. Each thread keeps its own
+    connection (opened on first use, none are shared). A write transaction
+    takes the database write lock up front (BEGIN IMMEDIATE) and waits up to
+    `busy_timeout` seconds for it, so concurrent writers queue instead of
+    failing on a lock upgrade; holding that lock also makes row locks
+    (SELECT ... FOR UPDATE, which SQLite lacks) unnecessary.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str = settings.SQLITE_PATH, busy_timeout: float = settings.SQLITE_BUSY_TIMEOUT_SECONDS):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._connected = False
+
+        # Statistics
+        self._opened = 0
+        self._transactions = 0
+        self._busy_timeouts = 0
+
+    def connect(self):
+        """Create the database file if needed and open this thread's connection"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._connected = True
+        journal_mode = self._connection().execute("PRAGMA journal_mode").fetchone()["journal_mode"]
+        logger.info("Opened SQLite database %s (journal_mode=%s)", self.path, journal_mode)
+        return self
+
+    def disconnect(self):
+        """Close every connection opened by this process"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+        self._connected = False
+        logger.info("SQLite database closed")
+
+    def is_connected(self):
+        return self._connected
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "connections": len(self._connections),
+                "connections_opened": self._opened,
+                "write_transactions": self._transactions,
+                "busy_timeouts": self._busy_timeouts,
+            }
+
+    def _open(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,   # autocommit; write transactions are begun explicitly
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,   # used by one thread, but closed by disconnect()
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints: a power loss may drop the last commits, never corrupt
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _connection(self):
+        """This thread's connection, opened on first use."""
+        if self._pid != os.getpid():
+            # Forked (gunicorn workers, training processes): never touch the parent's connections
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._local = threading.local()
+                    self._connections = []
+                    self._pid = os.getpid()
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._open()
+            connection.row_factory = _dict_row
+            with self._lock:
+                self._connections.append(connection)
+                self._opened += 1
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection()
+        cursor = _SQLiteCursor(connection.cursor())
+        try:
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e):
+                    with self._lock:
+                        self._busy_timeouts += 1
+                raise
+            yield cursor
+            connection.commit()
+            with self._lock:
+                self._transactions += 1
+        except Exception:
+            if connection.in_transaction:
+                connection.rollback()
             raise
         finally:
             cursor.close()
 
+    @timed(db_seconds.labels("execute_query"))
+    def execute_query(self, query, params=None):
+        """Execute a query that modifies data (INSERT, UPDATE, DELETE)"""
+        try:
+            with self._write() as cursor:
+                cursor.execute(query, params)
+                return cursor
+        except sqlite3.Error as e:
+            logger.error("Error executing query: %s", e)
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """Run several statements in one write transaction (rolled back on error)"""
+        started = time.perf_counter()
+        try:
+            with self._write() as cursor:
+                yield cursor
+        except Exception as e:
+            logger.error("Error in transaction, rolling back: %s", e)
+            raise
+        finally:
+            TRANSACTION_SECONDS.observe(time.perf_counter() - started)
+
+    @timed(db_seconds.labels("execute_many"))
+    def execute_many(self, query, params_seq):
+        """Execute one statement for many parameter rows in a single commit"""
+        if not params_seq:
+            return 0
+        try:
+            with self._write() as cursor:
+                cursor.executemany(query, params_seq)
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error("Error executing batch query: %s", e)
+            raise
+
+    @timed(db_seconds.labels("fetch_one"))
     def fetch_one(self, query, params=None):
         """Fetch a single row from the database"""
-        cursor = self.connection.cursor(dictionary=True)
         try:
-            cursor.execute(query, params or ())
-            return cursor.fetchone()
-        except Error as e:
-            print(f"Error fetching data: {e}")
+            cursor = self._connection().execute(_placeholders(query), params or ())
+        except sqlite3.Error as e:
+            logger.error("Error fetching data: %s", e)
             raise
+        try:
+            return cursor.fetchone()
         finally:
             cursor.close()
 
+    @timed(db_seconds.labels("fetch_all"))
     def fetch_all(self, query, params=None):
         """Fetch all matching rows from the database"""
-        cursor = self.connection.cursor(dictionary=True)
         try:
-            cursor.execute(query, params or ())
+            cursor = self._connection().execute(_placeholders(query), params or ())
             return cursor.fetchall()
-        except Error as e:
-            print(f"Error fetching data: {e}")
+        except sqlite3.Error as e:
+            logger.error("Error fetching data: %s", e)
+            raise
+
+    def stream(self, query, params=None, chunk_size=10_000):
+        """
+        Yield the result rows (tuples) in lists of up to `chunk_size`.
+
+        Rows are stepped through incrementally on a connection of its own, a
+        WAL reader that sees one snapshot and never blocks writers; it is
+        closed when the generator is exhausted or closed.
+        """
+        connection = self._open()
+        try:
+            cursor = connection.execute(_placeholders(query), params or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as e:
+            logger.error("Error streaming data: %s", e)
             raise
         finally:
-            cursor.close()
+            connection.close()
+
+
+class AsyncDatabase:
+    """Awaitable facade over Database that runs every call on the db thread pool."""
+
+    def __init__(self, database: Database):
+        self.database = database
+
+    async def execute_query(self, query, params=None):
+        return await run_in_db(self.database.execute_query, query, params)
+
+    async def execute_many(self, query, params_seq):
+        return await run_in_db(self.database.execute_many, query, params_seq)
+
+    async def fetch_one(self, query, params=None):
+        return await run_in_db(self.database.fetch_one, query, params)
+
+    async def fetch_all(self, query, params=None):
+        return await run_in_db(self.database.fetch_all, query, params)
+
+
+BACKENDS = ("mysql", "sqlite")
+
+
+def create_database():
+    if settings.DB_BACKEND == "sqlite":
+        return SQLiteDatabase()
+    if settings.DB_BACKEND != "mysql":
+        raise ValueError(f"Unknown DB_BACKEND '{settings.DB_BACKEND}'. Use one of {list(BACKENDS)}")
+    return Database()
 
 
-# Global database instance (to be initialized at startup)
-db = Database()
\ No newline at end of file
+# Global database instance for the configured backend (to be initialized at startup)
+db = create_database()
+adb = AsyncDatabase(db)
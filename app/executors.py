@@ -0,0 +1,45 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+
+# ------------------------------------------------------------------
+# Dedicated thread pools for blocking work.
+# Route handlers are async, so anything that blocks (mysql.connector calls,
+# sklearn scoring/fitting) must run here instead of on the event loop.
+# ------------------------------------------------------------------
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_THREADPOOL_SIZE, thread_name_prefix="db"
+)
+inference_executor = ThreadPoolExecutor(
+    max_workers=settings.INFERENCE_THREADPOOL_SIZE, thread_name_prefix="inference"
+)
+training_executor = ThreadPoolExecutor(
+    max_workers=settings.TRAINING_THREADPOOL_SIZE, thread_name_prefix="training"
+)
+
+
+async def _run_in(executor, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_in_db(fn, *args, **kwargs):
+    """Run a blocking database call on the database pool."""
+    return await _run_in(db_executor, fn, *args, **kwargs)
+
+
+async def run_in_inference(fn, *args, **kwargs):
+    """Run model scoring on the inference pool."""
+    return await _run_in(inference_executor, fn, *args, **kwargs)
+
+
+async def run_in_training(fn, *args, **kwargs):
+    """Run model fitting on the training pool (kept apart so it never starves inference)."""
+    return await _run_in(training_executor, fn, *args, **kwargs)
+
+
+def shutdown_executors(wait: bool = True):
+    for executor in (training_executor, inference_executor, db_executor):
+        executor.shutdown(wait=wait)
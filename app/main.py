@@ -1,10 +1,27 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import settings
 from app.database import db
-from app.routes import analyze, training, audit, labeling, statistics
+from app.schema import apply_migrations
+from app.executors import shutdown_executors
+from app.services.micro_batcher import micro_batcher
+from app.services.result_writer import result_writer
+from app.services.request_stats import request_stats
+from app.services.archive import request_archive
+from app.services.ip_reputation import ip_reputation
+from app.services.training_jobs import training_jobs
+from app.routes import analyze, training, audit, labeling, statistics, metrics
 import uvicorn
 
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
 # ------------------------------------------------------------------
 # FastAPI Application Instance
 # ------------------------------------------------------------------
@@ -33,12 +50,26 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     db.connect()
-    print("IsolationForestServer started successfully")
+    if settings.DB_AUTO_MIGRATE:
+        apply_migrations()
+    result_writer.start()
+    request_stats.start()
+    request_archive.start()
+    ip_reputation.start()
+    micro_batcher.start()
+    logger.info("IsolationForestServer started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await micro_batcher.stop()
+    ip_reputation.stop()
+    request_archive.stop()
+    training_jobs.shutdown()   # queued jobs are cancelled; a running fit finishes first
+    result_writer.close()   # flush buffered analysis results before the pool goes away
+    request_stats.stop()    # ...and the statistics counters they produced
+    shutdown_executors()
     db.disconnect()
-    print("IsolationForestServer shut down gracefully")
+    logger.info("IsolationForestServer shut down gracefully")
 
 # ------------------------------------------------------------------
 # Include Route Modules
@@ -48,6 +79,7 @@ app.include_router(training.router,     tags=["Training"])
 app.include_router(audit.router,        tags=["Audit"])
 app.include_router(labeling.router,     tags=["Labeling"])
 app.include_router(statistics.router,   tags=["Statistics"])
+app.include_router(metrics.router,      tags=["Monitoring"])
 
 # ------------------------------------------------------------------
 # Health Check / Root Endpoint
@@ -65,8 +97,6 @@ async def root():
 # Run server when executed directly
 # ------------------------------------------------------------------
 if __name__ == "__main__":
-    from app.config import settings
-
     uvicorn.run(
         "app.main:app",
         host=settings.API_HOST,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 
 
@@ -21,6 +21,14 @@ class AnalyzeResponse(BaseModel):
     analyzed_at: datetime
     model_config = ConfigDict(protected_namespaces=())
 
+class AnalyzeBatchResponse(BaseModel):
+    count: int
+    anomaly_count: int
+    model_version: Optional[str] = None
+    results: List[AnalyzeResponse]
+    model_config = ConfigDict(protected_namespaces=())
+
+
 class TrainRequest(BaseModel):
     model_version: str
     use_corrected_labels: bool = True
@@ -34,12 +42,34 @@ class TrainResponse(BaseModel):
     training_samples: int
     training_duration_seconds: float
     accuracy_score: Optional[float] = None
+    data_loading: Optional[Dict[str, Any]] = None
     message: str
     model_config = ConfigDict(protected_namespaces=())
 
 
+class TrainingJobResponse(BaseModel):
+    job_id: str
+    kind: str
+    model_version: str
+    state: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: float
+    samples_loaded: int
+    trees_fitted: int
+    trees_total: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    model_config = ConfigDict(protected_namespaces=())
+
+
 class RetrainRequest(BaseModel):
     model_version: str
+    mode: Literal["full", "incremental"] = "full"
+    new_trees: Optional[int] = None         # incremental: trees replaced (default INCREMENTAL_NEW_TREES)
+    compare_full: bool = False              # incremental: also time a full refit and report agreement
+    model_config = ConfigDict(protected_namespaces=())
 
 
 class RetrainResponse(BaseModel):
@@ -66,6 +96,39 @@ class LabelUpdateResponse(BaseModel):
     message: str
 
 
+class AuditFilter(BaseModel):
+    """Same filters as GET /audit/requests."""
+    ip_address: Optional[str] = None
+    is_anomaly: Optional[bool] = None
+    min_confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+    max_confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    has_user_label: Optional[bool] = None
+
+
+class BulkLabelUpdateRequest(BaseModel):
+    user_label: bool
+    changed_by: str
+    ids: Optional[List[int]] = None             # either explicit ids ...
+    filter: Optional[AuditFilter] = None        # ... or every request matching the filter
+
+
+class LabelChange(BaseModel):
+    request_id: int
+    is_anomaly: bool                  # model prediction
+    old_label: Optional[bool] = None  # previous user label (None = never labeled)
+    new_label: bool
+
+
+class BulkLabelUpdateResponse(BaseModel):
+    success: bool
+    updated: int
+    changes: List[LabelChange]
+    not_found: List[int]
+    message: str
+
+
 class StatisticsResponse(BaseModel):
     total_requests_analyzed: int
     anomaly_count: int
@@ -74,4 +137,26 @@ class StatisticsResponse(BaseModel):
     active_model: Dict[str, Any]
     label_corrections: Dict[str, int]
     average_confidence: float
-    uptime_hours: float
\ No newline at end of file
+    uptime_hours: float
+
+class TimeseriesPoint(BaseModel):
+    bucket_start: datetime
+    requests: int
+    anomalies: int
+    anomaly_rate: float
+    average_confidence: Optional[float] = None
+    confidence_p50: Optional[float] = None
+    confidence_p90: Optional[float] = None
+    confidence_p99: Optional[float] = None
+    label_corrections: int
+    false_positives_corrected: int
+    false_negatives_corrected: int
+
+
+class TimeseriesResponse(BaseModel):
+    bucket: str
+    start: datetime = Field(serialization_alias="from")
+    end: datetime = Field(serialization_alias="to")
+    model_version: Optional[str] = None
+    points: List[TimeseriesPoint]
+    model_config = ConfigDict(protected_namespaces=())
@@ -1,80 +1,83 @@
 import json
 from datetime import datetime
+from time import perf_counter
+from typing import List
 from fastapi import APIRouter, HTTPException
-import numpy as np
 
-from app.models.request_models import AnalyzeRequest, AnalyzeResponse
-from app.services.feature_extractor import FeatureExtractor
+from app.models.request_models import AnalyzeRequest, AnalyzeResponse, AnalyzeBatchResponse
+from app.services.feature_extractor import FeatureExtractor, PayloadStats
 from app.services.ml_service import ml_service
-from app.database import db
+from app.services.micro_batcher import micro_batcher
+from app.services.result_writer import result_writer, record_statistics, INSERT_ANALYZED_REQUEST
+from app.config import settings
+from app.database import adb
+from app.executors import run_in_inference
+from app.services.metrics import ANALYZE, ANALYZE_BATCH, FEATURE_EXTRACTION, RESULT_PERSIST
 
 router = APIRouter()
 
 
+def _result_row(request: AnalyzeRequest, features, payload_stats: PayloadStats, is_anomaly: bool,
+                confidence: float, model_version: str, analyzed_at: datetime) -> tuple:
+    """Build the analyzed_requests row for one scored request (`features` is its row of X)."""
+    return (
+        request.request_id,
+        request.ip_address,
+        request.endpoint,
+        request.http_method,
+        payload_stats.size,   # measured once during feature extraction, no re-serialization
+        json.dumps(request.headers),
+        *features.tolist(),   # FEATURE_COLUMNS order, same as the INSERT column list
+        is_anomaly,
+        confidence,
+        model_version,
+        analyzed_at,
+    )
+
+
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_request(request: AnalyzeRequest):
     """
     Analyze an incoming HTTP request and determine if it's anomalous
     using the active Isolation Forest model.
     """
+    started = perf_counter()
     try:
-        # 1. Extract numerical features
-        features = FeatureExtractor.extract_features(request.dict())
-        X = np.array([[
-            float(features["ip_reputation_score"]),
-            float(features["payload_complexity_score"]),
-            float(features["header_anomaly_score"]),
-            float(features["endpoint_risk_score"]),
-            float(features["frequency_score"]),
-        # ← If your model was trained on more than 5 features, add them here in the same order!
-        ]], dtype=np.float32)   # ← shape = (1, n_features)
-        ml_service.load_active_model()
-        # 2. Run prediction
-        raw_prediction = ml_service.model.predict(X)                    # ← now works
-        raw_score      = ml_service.model.decision_function(X)          # ← now works
-
-        is_anomaly = bool(raw_prediction[0].item())     # → True / False (pure Python)
-        confidence = round(float(raw_score[0].item()), 4)
-
-        # 3. Persist analysis result in database
-        payload_size = len(json.dumps(request.payload)) if request.payload else 0
-        headers_json = json.dumps(request.headers)
-
-        insert_query = """
-            INSERT INTO analyzed_requests (
-                request_id, ip_address, endpoint, http_method,
-                payload_size, headers_json,
-                ip_reputation_score, payload_complexity_score,
-                header_anomaly_score, endpoint_risk_score, frequency_score,
-                is_anomaly, confidence, model_version, analyzed_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        db.execute_query(insert_query, (
-            request.request_id,
-            request.ip_address,
-            request.endpoint,
-            request.http_method,
-            payload_size,
-            headers_json,
-            features['ip_reputation_score'],
-            features['payload_complexity_score'],
-            features['header_anomaly_score'],
-            features['endpoint_risk_score'],
-            features['frequency_score'],
-            is_anomaly,
-            confidence,
-            ml_service.model_version or "unknown",
-            datetime.utcnow()
-        ))
+        # 1. Extract numerical features → shape = (1, n_features)
+        payload_stats = FeatureExtractor.measure_payload(request.payload)
+        X = await FeatureExtractor.extract_batch_async([request], [payload_stats])
+        FEATURE_EXTRACTION.observe(perf_counter() - started)
+
+        # 2. Run prediction (cached model; label derived from the score).
+        #    Concurrent calls are coalesced into one scoring pass by the micro-batcher.
+        if settings.MICROBATCH_ENABLED:
+            is_anomaly, score, model_version = await micro_batcher.submit(X[0])
+        else:
+            labels, scores, model_version = await run_in_inference(ml_service.score, X)
+            is_anomaly, score = bool(labels[0]), float(scores[0])
+
+        confidence = round(score, 4)
+
+        # 3. Persist analysis result (write-behind: buffered and flushed in bulk)
+        analyzed_at = datetime.utcnow()
+        row = _result_row(request, X[0], payload_stats, is_anomaly, confidence, model_version, analyzed_at)
+        persisting = perf_counter()
+        if settings.WRITE_BEHIND_ENABLED:
+            await result_writer.submit([row])
+        else:
+            await adb.execute_query(INSERT_ANALYZED_REQUEST, row)
+            record_statistics([row])
+        finished = perf_counter()
+        RESULT_PERSIST.observe(finished - persisting)
+        ANALYZE.observe(finished - started)
 
         # 4. Return response
         return AnalyzeResponse(
             request_id=request.request_id,
             isAnomaly=is_anomaly,
             confidence=confidence,
-            model_version=ml_service.model_version or "unknown",
-            analyzed_at=datetime.utcnow()
+            model_version=model_version,
+            analyzed_at=analyzed_at
         )
 
     except ValueError as ve:
@@ -82,4 +85,58 @@ async def analyze_request(request: AnalyzeRequest):
         raise HTTPException(status_code=503, detail=f"Model error: {str(ve)}")
     except Exception as e:
         # Catch-all for unexpected errors
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+@router.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+async def analyze_batch(requests: List[AnalyzeRequest]):
+    """
+    Analyze many requests at once: one feature matrix, one scoring pass
+    over the forest and one multi-row INSERT for the whole batch.
+    """
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one request")
+
+    try:
+        started = perf_counter()
+        payload_stats = [FeatureExtractor.measure_payload(r.payload) for r in requests]
+        X = await FeatureExtractor.extract_batch_async(requests, payload_stats)
+        FEATURE_EXTRACTION.observe(perf_counter() - started)
+        labels, scores, model_version = await run_in_inference(ml_service.score, X)
+
+        analyzed_at = datetime.utcnow()
+        results = []
+        rows = []
+        for request, features, stats, label, score in zip(requests, X, payload_stats, labels, scores):
+            is_anomaly = bool(label)
+            confidence = round(float(score), 4)
+            rows.append(_result_row(request, features, stats, is_anomaly, confidence, model_version, analyzed_at))
+            results.append(AnalyzeResponse(
+                request_id=request.request_id,
+                isAnomaly=is_anomaly,
+                confidence=confidence,
+                model_version=model_version,
+                analyzed_at=analyzed_at
+            ))
+
+        persisting = perf_counter()
+        if settings.WRITE_BEHIND_ENABLED:
+            await result_writer.submit(rows)
+        else:
+            await adb.execute_many(INSERT_ANALYZED_REQUEST, rows)
+            record_statistics(rows)
+        finished = perf_counter()
+        RESULT_PERSIST.observe(finished - persisting)
+        ANALYZE_BATCH.observe(finished - started)
+
+        return AnalyzeBatchResponse(
+            count=len(results),
+            anomaly_count=int(labels.sum()),
+            model_version=model_version,
+            results=results
+        )
+
+    except ValueError as ve:
+        raise HTTPException(status_code=503, detail=f"Model error: {str(ve)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
@@ -1,16 +1,24 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
-from app.database import db
+from app.database import adb
+from app.executors import run_in_db
+from app.services.audit_query import (
+    PAGE_COLUMNS, AuditFilters, archived_page, count_requests, encode_cursor, keyset_condition
+)
 
 router = APIRouter(prefix="/audit", tags=["Audit"])
 
 
 @router.get("/requests")
 async def get_analyzed_requests(
-    page: int = Query(1, ge=1, description="Page number (1-indexed)"),
+    page: int = Query(1, ge=1, description="Page number (1-indexed); ignored when a cursor is given"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    count: Literal["exact", "cached", "approximate", "none"] = Query(
+        "exact", description="How total_records is computed; cached and approximate may be stale"
+    ),
     ip_address: Optional[str] = Query(None),
     is_anomaly: Optional[bool] = Query(None),
     min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
@@ -22,65 +30,59 @@ async def get_analyzed_requests(
     """
     Retrieve analyzed requests with powerful filtering and pagination.
     Used by security team for investigation and model feedback.
+
+    Results are ordered newest first by (analyzed_at, id). Pass `next_cursor`
+    back as `cursor` to get the following page: it seeks directly to the
+    position through the index, so every page costs the same however deep
+    it is. `page` (LIMIT/OFFSET) still works but gets slower with depth.
+
+    Requests moved to the Parquet archive (ARCHIVE_AFTER_DAYS) are included:
+    they are older than every row in the database, so the listing continues
+    into the archive once the database rows are exhausted.
     """
     try:
         # Build dynamic WHERE conditions
-        where_conditions = []
-        params = []
-
-        if ip_address:
-            where_conditions.append("ip_address = %s")
-            params.append(ip_address)
-
-        if is_anomaly is not None:
-            where_conditions.append("is_anomaly = %s")
-            params.append(is_anomaly)
-
-        if min_confidence is not None:
-            where_conditions.append("confidence >= %s")
-            params.append(min_confidence)
-
-        if max_confidence is not None:
-            where_conditions.append("confidence <= %s")
-            params.append(max_confidence)
-
-        if date_from:
-            where_conditions.append("analyzed_at >= %s")
-            params.append(date_from)
-
-        if date_to:
-            where_conditions.append("analyzed_at <= %s")
-            params.append(date_to)
-
-        if has_user_label is not None:
-            if has_user_label:
-                where_conditions.append("user_label IS NOT NULL")
-            else:
-                where_conditions.append("user_label IS NULL")
-
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-
-        # Count total matching records
-        count_query = f"SELECT COUNT(*) AS total FROM analyzed_requests WHERE {where_clause}"
-        count_result = db.fetch_one(count_query, tuple(params))
-        total_records = count_result["total"] if count_result else 0
-
-        # Pagination
-        offset = (page - 1) * page_size
-        total_pages = (total_records + page_size - 1) // page_size
+        filters = AuditFilters(
+            ip_address=ip_address,
+            is_anomaly=is_anomaly,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence,
+            date_from=date_from,
+            date_to=date_to,
+            has_user_label=has_user_label,
+        )
+        where_clause, params = filters.where()
+
+        # Count total matching records (exact unless the client opts in to cached/approximate), archive included
+        total_records = await run_in_db(count_requests, where_clause, params, count, filters)
+        total_pages = (total_records + page_size - 1) // page_size if total_records is not None else None
+
+        # Pagination: keyset when a cursor is given, OFFSET otherwise
+        page_clause, page_params = where_clause, list(params)
+        offset = 0
+        if cursor:
+            keyset, keyset_params = keyset_condition(cursor)
+            page_clause = f"{where_clause} AND {keyset}"
+            page_params += keyset_params
+        else:
+            offset = (page - 1) * page_size
 
         # Fetch paginated data
         data_query = f"""
-            SELECT 
-                id, request_id, ip_address, endpoint, http_method,
-                is_anomaly, confidence, model_version, user_label, analyzed_at
+            SELECT {", ".join(PAGE_COLUMNS)}
             FROM analyzed_requests
-            WHERE {where_clause}
-            ORDER BY analyzed_at DESC
+            WHERE {page_clause}
+            ORDER BY analyzed_at DESC, id DESC
             LIMIT %s OFFSET %s
         """
-        params_with_pagination = params + [page_size, offset]
-        results = db.fetch_all(data_query, tuple(params_with_pagination))
+        params_with_pagination = page_params + [page_size, offset]
+        results = await adb.fetch_all(data_query, tuple(params_with_pagination))
+
+        # Continue a short page with archived rows
+        if len(results) < page_size:
+            results = list(results) + await run_in_db(
+                archived_page, filters, where_clause, params, len(results), page_size, cursor, offset
+            )
 
         # Format response
         data = [
@@ -99,16 +101,25 @@ async def get_analyzed_requests(
             for row in results
         ]
 
+        next_cursor = None
+        if len(results) == page_size:
+            last = results[-1]
+            next_cursor = encode_cursor(last["analyzed_at"], last["id"])
+
         return {
             "total_records": total_records,
-            "page": page,
+            "count_mode": count,
+            "page": None if cursor else page,
             "page_size": page_size,
             "total_pages": total_pages,
+            "next_cursor": next_cursor,
             "data": data
         }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Audit query failed: {str(e)}"
-        )
\ No newline at end of file
+        )
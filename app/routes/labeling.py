@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Path
-from datetime import datetime
 
-from app.models.request_models import LabelUpdateRequest, LabelUpdateResponse
-from app.database import db
+from app.models.request_models import (
+    LabelUpdateRequest, LabelUpdateResponse, BulkLabelUpdateRequest, BulkLabelUpdateResponse
+)
+from app.executors import run_in_db
+from app.services.audit_query import AuditFilters
+from app.services.label_service import update_labels
 
 router = APIRouter(prefix="/labeling", tags=["Labeling"])
 
@@ -22,31 +25,17 @@ async def update_label(
     This enables the feedback loop for continuous model improvement.
     """
     try:
-        # 1. Check if the request exists
-        check_query = "SELECT id, is_anomaly FROM analyzed_requests WHERE id = %s"
-        existing = db.fetch_one(check_query, (request_id,))
+        # 1.+2. Read the old state and update the label atomically
+        result = await run_in_db(
+            update_labels, request.user_label, request.changed_by, ids=[request_id]
+        )
 
-        if not existing:
+        if result["not_found"]:
             raise HTTPException(status_code=404, detail="Request not found")
 
-        old_label = bool(existing["is_anomaly"])
+        old_label = result["changes"][0]["is_anomaly"]
         new_label = request.user_label
 
-        # 2. Update the label in database
-        update_query = """
-            UPDATE analyzed_requests
-            SET user_label = %s,
-                label_changed_at = %s,
-                label_changed_by = %s
-            WHERE id = %s
-        """
-        db.execute_query(update_query, (
-            new_label,
-            datetime.utcnow(),
-            request.changed_by,
-            request_id
-        ))
-
         # 3. Return success response
         return LabelUpdateResponse(
             success=True,
@@ -63,4 +52,45 @@ async def update_label(
         raise HTTPException(
             status_code=500,
             detail=f"Label update failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.put(
+    "/labels",
+    response_model=BulkLabelUpdateResponse,
+    summary="Label many requests at once",
+    description="Set the same label on a list of request ids, or on every request matching an audit filter."
+)
+async def update_labels_bulk(request: BulkLabelUpdateRequest):
+    """
+    Bulk version of PUT /labeling/label/{request_id} for incident triage.
+    All rows change in one transaction, written in chunked multi-row UPDATEs;
+    each change reports the previous user label.
+    """
+    try:
+        if request.filter is not None:
+            filters = AuditFilters(**request.filter.model_dump())
+            if not any(value is not None for value in filters):
+                raise ValueError("Filter must contain at least one condition")
+        else:
+            filters = None
+
+        result = await run_in_db(
+            update_labels, request.user_label, request.changed_by, ids=request.ids, filters=filters
+        )
+
+        return BulkLabelUpdateResponse(
+            success=True,
+            updated=len(result["changes"]),
+            changes=result["changes"],
+            not_found=result["not_found"],
+            message=f"{len(result['changes'])} labels updated successfully"
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Bulk label update failed: {str(e)}"
+        )
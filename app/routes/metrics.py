@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.database import db
+from app.services.metrics import metrics
+from app.services.ml_service import ml_service
+from app.services.micro_batcher import micro_batcher
+from app.services.result_writer import result_writer
+from app.services.request_stats import request_stats
+from app.services.rate_tracker import rate_tracker
+from app.services.ip_reputation import ip_reputation
+from app.services.rule_engine import rule_engine
+from app.services.audit_query import count_cache
+from app.services.archive import request_archive
+
+router = APIRouter(tags=["Monitoring"])
+
+# Component counters exported as gauges, read at scrape time
+metrics.add_collector("model_registry", ml_service.registry.stats)
+metrics.add_collector("micro_batcher", micro_batcher.stats)
+metrics.add_collector("database_pool", db.stats)
+metrics.add_collector("result_writer", result_writer.stats)
+metrics.add_collector("request_stats", request_stats.stats)
+metrics.add_collector("rate_tracker", rate_tracker.stats)
+metrics.add_collector("ip_reputation", ip_reputation.stats)
+metrics.add_collector("rule_engine", rule_engine.stats)
+metrics.add_collector("audit_count_cache", count_cache.stats)
+metrics.add_collector("request_archive", request_archive.stats)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition: per-stage latency histograms
+    (ifs_stage_duration_seconds), Database call histograms
+    (ifs_db_call_duration_seconds) and component counters as gauges.
+    Metrics are per process; with several workers each scrape sees one worker.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
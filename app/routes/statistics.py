@@ -1,8 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timezone
+from typing import Any, Dict, Literal, Optional
 
-from app.models.request_models import StatisticsResponse
+from app.models.request_models import StatisticsResponse, TimeseriesResponse
 from app.database import db
+from app.executors import run_in_db
+from app.services.ml_service import ml_service
+from app.services.micro_batcher import micro_batcher
+from app.services.result_writer import result_writer
+from app.services.rate_tracker import rate_tracker
+from app.services.ip_reputation import ip_reputation
+from app.services.rule_engine import rule_engine
+from app.services.request_stats import BUCKETS, request_stats
+from app.services.audit_query import count_cache
+from app.services.archive import request_archive
 
 router = APIRouter(prefix="/statistics", tags=["Statistics"])
 
@@ -15,77 +26,123 @@ async def get_statistics():
     """
     Get comprehensive server and model performance statistics.
     Perfect for monitoring dashboards and health checks.
+
+    Served from pre-aggregated counters: the hourly rollup table is re-read at
+    most every STATS_MAX_STALENESS_SECONDS, so polling never scans analyzed_requests.
     """
     try:
-        # 1. Total requests analyzed
-        total_result = db.fetch_one("SELECT COUNT(*) AS total FROM analyzed_requests")
-        total_requests = total_result["total"] if total_result else 0
-
-        # 2. Anomaly vs Legitimate breakdown
-        anomaly_result = db.fetch_one("SELECT COUNT(*) AS count FROM analyzed_requests WHERE is_anomaly = TRUE")
-        anomaly_count = anomaly_result["count"] if anomaly_result else 0
-        legitimate_count = total_requests - anomaly_count
-
-        anomaly_rate = round(anomaly_count / total_requests, 4) if total_requests > 0 else 0.0
-
-        # 3. Active model information
-        model_result = db.fetch_one("""
-            SELECT model_version, training_date, training_samples, accuracy_score
-            FROM models WHERE is_active = TRUE LIMIT 1
-        """)
-
-        if model_result and model_result["model_version"]:
-            active_model = {
-                "version": model_result["model_version"],
-                "training_date": model_result["training_date"].isoformat() + "Z",
-                "training_samples": model_result["training_samples"],
-                "accuracy_score": float(model_result["accuracy_score"]) if model_result["accuracy_score"] else None
-            }
-        else:
-            active_model = {
-                "version": "none",
-                "training_date": None,
-                "training_samples": 0,
-                "accuracy_score": None
-            }
-
-        # 4. Label corrections (false positives / false negatives corrected by humans)
-        corrections_result = db.fetch_one("""
-            SELECT 
-                COUNT(*) AS total_corrections,
-                SUM(CASE WHEN is_anomaly = TRUE AND user_label = FALSE THEN 1 ELSE 0 END) AS false_positives,
-                SUM(CASE WHEN is_anomaly = FALSE AND user_label = TRUE THEN 1 ELSE 0 END) AS false_negatives
-            FROM analyzed_requests
-            WHERE user_label IS NOT NULL
-        """)
-
-        label_corrections = {
-            "total_corrections": corrections_result["total_corrections"] or 0,
-            "false_positives_corrected": corrections_result["false_positives"] or 0,
-            "false_negatives_corrected": corrections_result["false_negatives"] or 0
-        }
+        if request_stats.is_stale():
+            await run_in_db(request_stats.refresh)
+        return _build_statistics(request_stats.totals(), request_stats.active_model)
 
-        # 5. Average prediction confidence
-        avg_result = db.fetch_one("SELECT AVG(confidence) AS avg_conf FROM analyzed_requests")
-        average_confidence = round(float(avg_result["avg_conf"] or 0.0), 4)
-
-        # 6. Server uptime in hours
-        uptime_hours = round((datetime.utcnow() - SERVER_START_TIME).total_seconds() / 3600, 2)
-
-        # 7. Return structured response
-        return StatisticsResponse(
-            total_requests_analyzed=total_requests,
-            anomaly_count=anomaly_count,
-            legitimate_count=legitimate_count,
-            anomaly_rate=anomaly_rate,
-            active_model=active_model,
-            label_corrections=label_corrections,
-            average_confidence=average_confidence,
-            uptime_hours=uptime_hours
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve statistics: {str(e)}"
         )
 
+
+def _build_statistics(totals: Dict[str, float], model_result: Optional[Dict[str, Any]]) -> StatisticsResponse:
+    """Assemble the statistics response from rollup totals and the active model row."""
+    # 1. Total requests analyzed
+    total_requests = int(totals["requests"])
+
+    # 2. Anomaly vs Legitimate breakdown
+    anomaly_count = int(totals["anomalies"])
+    legitimate_count = total_requests - anomaly_count
+
+    anomaly_rate = round(anomaly_count / total_requests, 4) if total_requests > 0 else 0.0
+
+    # 3. Active model information
+    if model_result and model_result["model_version"]:
+        active_model = {
+            "version": model_result["model_version"],
+            "training_date": model_result["training_date"].isoformat() + "Z",
+            "training_samples": model_result["training_samples"],
+            "accuracy_score": float(model_result["accuracy_score"]) if model_result["accuracy_score"] else None
+        }
+    else:
+        active_model = {
+            "version": "none",
+            "training_date": None,
+            "training_samples": 0,
+            "accuracy_score": None
+        }
+
+    # 4. Label corrections (false positives / false negatives corrected by humans)
+    label_corrections = {
+        "total_corrections": int(totals["corrections"]),
+        "false_positives_corrected": int(totals["false_positives_corrected"]),
+        "false_negatives_corrected": int(totals["false_negatives_corrected"])
+    }
+
+    # 5. Average prediction confidence
+    average_confidence = round(totals["confidence_sum"] / total_requests, 4) if total_requests > 0 else 0.0
+
+    # 6. Server uptime in hours
+    uptime_hours = round((datetime.utcnow() - SERVER_START_TIME).total_seconds() / 3600, 2)
+
+    # 7. Return structured response
+    return StatisticsResponse(
+        total_requests_analyzed=total_requests,
+        anomaly_count=anomaly_count,
+        legitimate_count=legitimate_count,
+        anomaly_rate=anomaly_rate,
+        active_model=active_model,
+        label_corrections=label_corrections,
+        average_confidence=average_confidence,
+        uptime_hours=uptime_hours
+    )
+
+
+@router.get("/timeseries", response_model=TimeseriesResponse)
+async def get_statistics_timeseries(
+    bucket: Literal["1m", "1h", "1d"] = Query("1h", description="Bucket size"),
+    start: Optional[datetime] = Query(None, alias="from", description="Start (UTC, default: 60 buckets before 'to')"),
+    end: Optional[datetime] = Query(None, alias="to", description="End, exclusive (UTC, default: now)"),
+    model_version: Optional[str] = Query(None, description="Only requests scored by this model version"),
+):
+    """
+    Per-bucket request counts, anomaly rate, confidence percentiles (p50/p90/p99)
+    and label corrections, read from the minute (1m) or hourly (1h, 1d) rollups.
+    Buckets without requests are omitted.
+    """
+    end = _naive_utc(end) if end else datetime.utcnow()
+    start = _naive_utc(start) if start else end - 60 * BUCKETS[bucket][1]
+    try:
+        points = await run_in_db(request_stats.timeseries, bucket, start, end, model_version)
+        return TimeseriesResponse(bucket=bucket, start=start, end=end, model_version=model_version, points=points)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to retrieve statistics: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Failed to retrieve timeseries: {str(e)}"
+        )
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Rollup buckets are naive UTC (like analyzed_at); convert timezone-aware query values."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/runtime")
+async def get_runtime_statistics():
+    """
+    In-process runtime counters (served from memory, no database access).
+    """
+    return {
+        "model_registry": ml_service.registry.stats(),
+        "micro_batcher": micro_batcher.stats(),
+        "database_pool": db.stats(),
+        "result_writer": result_writer.stats(),
+        "rate_tracker": rate_tracker.stats(),
+        "ip_reputation": ip_reputation.stats(),
+        "rule_engine": rule_engine.stats(),
+        "request_stats": request_stats.stats(),
+        "audit_count_cache": count_cache.stats(),
+        "request_archive": request_archive.stats(),
+    }
@@ -1,20 +1,39 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
 from fastapi import APIRouter, HTTPException
 
 from app.models.request_models import (
-    TrainRequest, TrainResponse,
-    RetrainRequest, RetrainResponse
+    TrainRequest, RetrainRequest, TrainingJobResponse
 )
 from app.services.ml_service import ml_service
+from app.services.training_jobs import training_jobs
+from app.executors import run_in_db
 from app.config import settings
 
 router = APIRouter(prefix="/training", tags=["Training"])
 
 
-@router.post("/train", response_model=TrainResponse)
+def _data_options(training_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Training data loader overrides accepted in training_params."""
+    options: Dict[str, Any] = {}
+    if "max_samples" in training_params:
+        options["max_samples"] = int(training_params["max_samples"])
+    if "sampling" in training_params:
+        options["sampling"] = str(training_params["sampling"])
+    for key in ("since", "until"):
+        if training_params.get(key):
+            options[key] = datetime.fromisoformat(str(training_params[key]))
+    return options
+
+
+@router.post("/train", response_model=TrainingJobResponse, status_code=202)
 async def train_model(request: TrainRequest):
     """
-    Train a brand new Isolation Forest model.
-    Accepts optional training parameters (contamination, n_estimators).
+    Start training a brand new Isolation Forest model in the background.
+    Accepts optional training parameters (contamination, n_estimators) and
+    training data options (max_samples, sampling, since, until).
+    Returns the job; poll GET /training/jobs/{job_id} for progress.
     """
     try:
         # Use provided params or fall back to defaults from settings
@@ -22,15 +41,18 @@ async def train_model(request: TrainRequest):
 
         contamination = training_params.get("contamination", settings.DEFAULT_CONTAMINATION)
         n_estimators = training_params.get("n_estimators", settings.DEFAULT_N_ESTIMATORS)
+        data_options = _data_options(training_params)
 
-        result = ml_service.train_model(
+        job = training_jobs.submit(
+            "train",
             model_version=request.model_version,
             contamination=float(contamination),
             n_estimators=int(n_estimators),
-            use_corrected_labels=request.use_corrected_labels
+            use_corrected_labels=request.use_corrected_labels,
+            data_options=data_options
         )
 
-        return TrainResponse(**result)
+        return TrainingJobResponse(**job.to_dict())
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -38,18 +60,59 @@ async def train_model(request: TrainRequest):
         raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
 
 
-@router.post("/retrain", response_model=RetrainResponse)
+@router.post("/retrain", response_model=TrainingJobResponse, status_code=202)
 async def retrain_model(request: RetrainRequest):
     """
-    Retrain the model using user-corrected labels (feedback loop).
-    This improves detection over time.
+    Start retraining the model using user-corrected labels (feedback loop)
+    in the background. This improves detection over time.
+    mode="incremental" replaces only the oldest `new_trees` trees of the
+    active forest with trees fitted on recent data (rolling forest).
+    Fails with 400 right away if there are too few corrected labels.
     """
     try:
-        result = ml_service.retrain_model(new_model_version=request.model_version)
+        # Checked up front so the caller gets the 400, not a failed job
+        await run_in_db(ml_service.count_corrected_labels)
 
-        return RetrainResponse(**result)
+        if request.mode == "incremental":
+            job = training_jobs.submit(
+                "retrain",
+                model_version=request.model_version,
+                mode="incremental",
+                new_trees=request.new_trees or settings.INCREMENTAL_NEW_TREES,
+                compare_full=request.compare_full,
+                use_corrected_labels=True
+            )
+        else:
+            job = training_jobs.submit(
+                "retrain",
+                model_version=request.model_version,
+                contamination=0.1,
+                n_estimators=100,
+                use_corrected_labels=True
+            )
+
+        return TrainingJobResponse(**job.to_dict())
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Retraining failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Retraining failed: {str(e)}")
+
+
+@router.get("/jobs", response_model=List[TrainingJobResponse])
+async def list_training_jobs():
+    """Recent training jobs, newest first."""
+    return [TrainingJobResponse(**status) for status in training_jobs.statuses()]
+
+
+@router.get("/jobs/{job_id}", response_model=TrainingJobResponse)
+async def get_training_job(job_id: str):
+    """
+    Status of a training job: state (queued, loading, fitting, activating,
+    succeeded, failed), elapsed time, samples loaded and trees fitted.
+    The training or retraining summary is in `result` once it succeeded.
+    """
+    status = training_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return TrainingJobResponse(**status)
@@ -0,0 +1,121 @@
+"""
+Versioned schema migrations.
+
+Migrations are the SQL files named NNN_description.sql in migrations/
+(MySQL) or migrations/sqlite/ (the same versions in SQLite's dialect), applied
+in file-name order. Each applied file is recorded in schema_migrations, so
+every file runs exactly once per database. Several workers starting at the
+same time serialize on a MySQL named lock, or on SQLite's write lock, which
+the migration transaction holds from its start.
+
+    python -m app.schema            # apply pending migrations
+    python -m app.schema --status   # list applied and pending migrations
+"""
+import argparse
+import logging
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List
+
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATIONS_DIRS = {"mysql": MIGRATIONS_ROOT, "sqlite": os.path.join(MIGRATIONS_ROOT, "sqlite")}
+MIGRATIONS_DIR = MIGRATIONS_DIRS[db.dialect]
+_MIGRATION_FILE = re.compile(r"^\d{3}_[A-Za-z0-9_]+\.sql$")
+_LOCK_NAME = "isolation_forest_schema_migrations"
+_LOCK_TIMEOUT_SECONDS = 60
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(255) PRIMARY KEY,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+
+def available_migrations(directory: str = MIGRATIONS_DIR) -> List[str]:
+    return sorted(name for name in os.listdir(directory) if _MIGRATION_FILE.match(name))
+
+
+def applied_migrations() -> List[str]:
+    db.execute_query(CREATE_MIGRATIONS_TABLE)
+    return [row["version"] for row in db.fetch_all("SELECT version FROM schema_migrations ORDER BY version")]
+
+
+def apply_migrations(directory: str = MIGRATIONS_DIR) -> List[str]:
+    """Apply pending migrations in order and return the names applied."""
+    applied_now = []
+    with db.transaction() as cursor, _migration_lock(cursor):
+        cursor.execute(CREATE_MIGRATIONS_TABLE)
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row["version"] for row in cursor.fetchall()}
+
+        for name in available_migrations(directory):
+            if name in done:
+                continue
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                statements = split_statements(f.read())
+            # MySQL commits DDL implicitly: a failed file stops the run and is retried next start.
+            # SQLite DDL is transactional: the whole run is rolled back.
+            for statement in statements:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, applied_at) VALUES (%s, %s)",
+                (name, datetime.utcnow())
+            )
+            applied_now.append(name)
+            logger.info("Applied migration %s", name)
+    return applied_now
+
+
+@contextmanager
+def _migration_lock(cursor):
+    """Hold the MySQL named lock for the block (SQLite: the transaction already holds the write lock)."""
+    if db.dialect != "mysql":
+        yield
+        return
+    cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (_LOCK_NAME, _LOCK_TIMEOUT_SECONDS))
+    if not cursor.fetchall()[0]["locked"]:
+        raise RuntimeError(f"Timed out waiting for the schema migration lock after {_LOCK_TIMEOUT_SECONDS}s")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+        cursor.fetchall()
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a migration file on `;` at line ends, dropping `--` comment lines."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    db.connect()
+    try:
+        if args.status:
+            done = set(applied_migrations())
+            for name in available_migrations():
+                print(f"{'applied' if name in done else 'pending':>8}  {name}")
+        else:
+            applied = apply_migrations()
+            print(f"{len(applied)} migration(s) applied" if applied else "Schema is up to date")
+    finally:
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
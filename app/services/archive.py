@@ -0,0 +1,479 @@
+import argparse
+import fcntl
+import functools
+import glob
+import itertools
+import logging
+import operator
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.database import db
+from app.services.feature_schema import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION, N_FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Archived analyzed_requests columns and their Arrow types, in file order
+ARCHIVE_COLUMNS = (
+    ("id", "int64"),
+    ("request_id", "string"),
+    ("ip_address", "string"),
+    ("endpoint", "string"),
+    ("http_method", "string"),
+    ("payload_size", "int64"),
+    ("headers_json", "string"),
+    *((name, "double") for name in FEATURE_COLUMNS),
+    ("is_anomaly", "bool"),
+    ("confidence", "double"),
+    ("model_version", "string"),
+    ("analyzed_at", "timestamp[us]"),
+    ("user_label", "bool"),
+    ("label_changed_at", "timestamp[us]"),
+    ("label_changed_by", "string"),
+    ("feature_schema_version", "int16"),   # null in files written before the column existed (= v1)
+)
+
+_SELECT = ", ".join(name for name, _ in ARCHIVE_COLUMNS)
+_BOOLEANS = ("is_anomaly", "user_label")
+# Archived rows are read and deleted under the row locks, so no label update can slip in between
+_FOR_UPDATE = " FOR UPDATE" if db.dialect == "mysql" else ""
+_DELETE_CHUNK = 1_000
+
+
+def _pyarrow():
+    try:
+        import pyarrow  # optional dependency, only needed once rows are archived
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The request archive needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in ARCHIVE_COLUMNS])
+
+
+def _utc(value: datetime) -> datetime:
+    """Naive UTC datetime, the way analyzed_at is stored."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _timestamp(pa, value: datetime):
+    return pa.scalar(_utc(value), type=pa.timestamp("us"))
+
+
+def _filter_expression(pa, filters=None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       after: Optional[Tuple[datetime, int]] = None):
+    """
+    Arrow dataset expression equivalent to AuditFilters.where(), a [since, until)
+    window on analyzed_at and the keyset position `after`; None matches everything.
+    """
+    field = pa.dataset.field
+    conditions = []
+
+    if filters is not None:
+        if filters.ip_address:
+            conditions.append(field("ip_address") == filters.ip_address)
+        if filters.is_anomaly is not None:
+            conditions.append(field("is_anomaly") == bool(filters.is_anomaly))
+        if filters.has_user_label is not None:
+            conditions.append(field("user_label").is_valid() if filters.has_user_label else field("user_label").is_null())
+        if filters.date_from:
+            conditions.append(field("analyzed_at") >= _timestamp(pa, filters.date_from))
+        if filters.date_to:
+            conditions.append(field("analyzed_at") <= _timestamp(pa, filters.date_to))
+        if filters.min_confidence is not None:
+            conditions.append(field("confidence") >= filters.min_confidence)
+        if filters.max_confidence is not None:
+            conditions.append(field("confidence") <= filters.max_confidence)
+
+    if since is not None:
+        conditions.append(field("analyzed_at") >= _timestamp(pa, since))
+    if until is not None:
+        conditions.append(field("analyzed_at") < _timestamp(pa, until))
+
+    if after is not None:
+        analyzed_at, row_id = after
+        at = _timestamp(pa, analyzed_at)
+        conditions.append((field("analyzed_at") < at) | ((field("analyzed_at") == at) & (field("id") < row_id)))
+
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+
+def _day_range(filters=None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               after: Optional[Tuple[datetime, int]] = None) -> Tuple[Optional[date], Optional[date]]:
+    """First and last partition day that can hold matching rows (None = unbounded)."""
+    lower = [value for value in (getattr(filters, "date_from", None), since) if value]
+    upper = [value for value in (getattr(filters, "date_to", None), until, after and after[0]) if value]
+    first = max(_utc(value).date() for value in lower) if lower else None
+    last = min(_utc(value).date() for value in upper) if upper else None
+    return first, last
+
+
+def _columns(rows: Sequence[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Rows as column lists; the drivers return BOOLEAN columns as integers."""
+    columns = {name: [row[name] for row in rows] for name, _ in ARCHIVE_COLUMNS}
+    for name in _BOOLEANS:
+        columns[name] = [None if value is None else bool(value) for value in columns[name]]
+    return columns
+
+
+def _dataset(pa, files: Sequence[str]):
+    """Dataset over archive files with the current schema (columns missing from older files read as null)."""
+    return pa.dataset.dataset(files, format="parquet", schema=_schema(pa))
+
+
+def _matrix(table) -> np.ndarray:
+    X = np.empty((table.num_rows, N_FEATURES), dtype=np.float32)
+    for i, name in enumerate(FEATURE_COLUMNS):
+        X[:, i] = table[name].to_numpy()
+    return X
+
+
+@contextmanager
+def _exclusive(path: str):
+    """Non-blocking exclusive file lock; yields False if another process holds it."""
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RequestArchive:
+    """
+    Cold tier of analyzed_requests: zstd-compressed Parquet files partitioned by day.
+
+    Layout: <directory>/date=YYYY-MM-DD/part-<HHMMSSffffff>-<first id>.parquet.
+    Each run moves the rows analyzed more than `after_days` ago out of the
+    database, oldest first, `batch_size` rows per transaction: the batch is
+    selected with row locks, written (one file per day it touches), deleted,
+    and the files are renamed into place once the DELETE has committed. A
+    crash in between leaves `.tmp` files that the next run publishes or
+    discards, depending on whether their rows are still in the database.
+    Runs are serialized across worker processes by a lock file in the
+    archive directory.
+
+    Rows inside a file are sorted by (analyzed_at, id) and file names sort
+    in time order, so newest-first reads walk partitions and files backwards
+    without sorting. Reads prune partitions by day and row groups by the
+    Parquet statistics. Archived rows are read-only: labels can only be
+    changed while a row is still in the database.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.ARCHIVE_DIR,
+        after_days: float = settings.ARCHIVE_AFTER_DAYS,
+        interval: float = settings.ARCHIVE_INTERVAL_SECONDS,
+        batch_size: int = settings.ARCHIVE_BATCH_SIZE,
+        compression: str = settings.ARCHIVE_COMPRESSION,
+    ):
+        self.directory = directory
+        self.after_days = after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.compression = compression
+
+        self._counts: Dict[Tuple[Any, Tuple[str, ...]], int] = {}
+        self._lock = threading.Lock()   # guards _counts
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics
+        self._runs = 0
+        self._failures = 0
+        self._rows_archived = 0
+        self._files_written = 0
+        self._bytes_written = 0
+        self._recovered_files = 0
+        self._last_run_seconds: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.after_days > 0
+
+    # ==============================================================
+    # Lifecycle
+    # ==============================================================
+
+    def start(self):
+        """Start the archiving thread when ARCHIVE_AFTER_DAYS is set (idempotent)."""
+        if not self.enabled:
+            return
+        _pyarrow()   # fail at startup rather than on the first run
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="request-archive", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the archiving thread; a running batch is finished first."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # ==============================================================
+    # Archiving
+    # ==============================================================
+
+    def archive(self, before: Optional[datetime] = None) -> int:
+        """Move rows analyzed before `before` (default: now - after_days) to the archive; returns rows moved."""
+        if before is None:
+            before = datetime.utcnow() - timedelta(days=self.after_days)
+        pa = _pyarrow()
+        os.makedirs(self.directory, exist_ok=True)
+
+        started = time.perf_counter()
+        moved = 0
+        with _exclusive(os.path.join(self.directory, ".lock")) as acquired:
+            if not acquired:
+                return 0   # another worker is archiving
+            self._recover(pa)
+            while True:
+                n = self._archive_batch(pa, before)
+                moved += n
+                self._rows_archived += n
+                if n < self.batch_size or self._stop.is_set():
+                    break
+
+        elapsed = time.perf_counter() - started
+        self._runs += 1
+        self._last_run_seconds = elapsed
+        if moved:
+            logger.info("Archived %d analyzed requests from before %s in %.1fs", moved, f"{before:%Y-%m-%d %H:%M}", elapsed)
+        return moved
+
+    def _archive_batch(self, pa, before: datetime) -> int:
+        written: List[str] = []
+        with db.transaction() as cursor:
+            cursor.execute(
+                f"SELECT {_SELECT} FROM analyzed_requests WHERE analyzed_at < %s "
+                f"ORDER BY analyzed_at, id LIMIT %s{_FOR_UPDATE}",
+                (before, self.batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            for day, day_rows in itertools.groupby(rows, key=lambda row: row["analyzed_at"].date()):
+                written.append(self._write(pa, day, list(day_rows)))
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), _DELETE_CHUNK):
+                chunk = ids[start:start + _DELETE_CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"DELETE FROM analyzed_requests WHERE id IN ({placeholders})", tuple(chunk))
+
+        # Committed: publish the files (if this fails, _recover publishes them on the next run)
+        for path in written:
+            os.replace(path + ".tmp", path)
+            self._files_written += 1
+            self._bytes_written += os.path.getsize(path)
+        return len(rows)
+
+    def _write(self, pa, day: date, rows: List[Dict[str, Any]]) -> str:
+        """Write one day's rows to `<file>.tmp` (flushed to disk) and return the final file name."""
+        partition = os.path.join(self.directory, f"date={day.isoformat()}")
+        os.makedirs(partition, exist_ok=True)
+        first = rows[0]
+        path = os.path.join(partition, f"part-{first['analyzed_at']:%H%M%S%f}-{first['id']:012d}.parquet")
+        table = pa.Table.from_pydict(_columns(rows), schema=_schema(pa))
+        pa.parquet.write_table(table, path + ".tmp", compression=self.compression)
+        with open(path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        return path
+
+    def _recover(self, pa):
+        """Publish or discard the `.tmp` files of a run that stopped between writing and renaming."""
+        for tmp in glob.glob(os.path.join(self.directory, "date=*", "*.parquet.tmp")):
+            try:
+                ids = pa.parquet.read_table(tmp, columns=["id"]).column("id")
+                first_id = ids[0].as_py() if len(ids) else None
+            except Exception:
+                first_id = None   # incomplete file: the batch failed before its DELETE
+            # A batch is deleted atomically, so one of its rows tells whether it was committed
+            if first_id is None or db.fetch_one("SELECT id FROM analyzed_requests WHERE id = %s", (first_id,)):
+                os.remove(tmp)
+            else:
+                os.replace(tmp, tmp[:-len(".tmp")])
+                self._recovered_files += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.archive()
+            except Exception as e:
+                self._failures += 1
+                logger.warning("Archiving analyzed requests failed: %s", e)
+
+    # ==============================================================
+    # Reading
+    # ==============================================================
+
+    def _files(self, first: Optional[date] = None, last: Optional[date] = None) -> List[str]:
+        """Published files of the partitions in [first, last], newest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        partitions = []
+        for name in names:
+            if not name.startswith("date="):
+                continue
+            try:
+                day = date.fromisoformat(name[len("date="):])
+            except ValueError:
+                continue
+            if (first is None or day >= first) and (last is None or day <= last):
+                partitions.append((day, os.path.join(self.directory, name)))
+
+        files = []
+        for _, partition in sorted(partitions, reverse=True):
+            names = sorted((name for name in os.listdir(partition) if name.endswith(".parquet")), reverse=True)
+            files.extend(os.path.join(partition, name) for name in names)
+        return files
+
+    def has_data(self) -> bool:
+        return bool(self._files())
+
+    def count(self, filters) -> int:
+        """
+        Archived rows matching `filters` (an AuditFilters). Exact; cached per
+        filter until the set of archive files changes.
+        """
+        files = self._files(*_day_range(filters))
+        if not files:
+            return 0
+        key = (filters, tuple(files))
+        with self._lock:
+            total = self._counts.get(key)
+        if total is not None:
+            return total
+
+        pa = _pyarrow()
+        total = _dataset(pa, files).count_rows(filter=_filter_expression(pa, filters))
+        with self._lock:
+            if len(self._counts) >= 1_000:
+                self._counts.clear()
+            self._counts[key] = total
+        return total
+
+    def page(self, filters, limit: int, columns: Sequence[str], after: Optional[Tuple[datetime, int]] = None,
+             offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` archived rows matching `filters`, ordered by (analyzed_at, id)
+        descending, starting after the keyset position `after` and skipping `offset`.
+        """
+        files = self._files(*_day_range(filters, after=after))
+        if not files or limit <= 0:
+            return []
+        pa = _pyarrow()
+        expression = _filter_expression(pa, filters, after=after)
+
+        rows: List[Dict[str, Any]] = []
+        for path in files:
+            table = pa.parquet.read_table(path, columns=list(columns), filters=expression)
+            if offset >= table.num_rows:
+                offset -= table.num_rows
+                continue
+            # The file is in ascending order: take the slice that is next in descending order
+            stop = table.num_rows - offset
+            start = max(stop - (limit - len(rows)), 0)
+            rows.extend(reversed(table.slice(start, stop - start).to_pylist()))
+            offset = 0
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def feature_chunks(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       chunk_size: int = settings.TRAINING_CHUNK_SIZE, newest_first: bool = False,
+                       limit: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        float32 feature vectors (FEATURE_COLUMNS order) of the archived rows of
+        the current feature schema analyzed in [since, until), in chunks of at most `chunk_size` rows;
+        no more than `limit` rows in total when given.
+        """
+        files = self._files(*_day_range(since=since, until=until))
+        if not files or (limit is not None and limit <= 0):
+            return
+        pa = _pyarrow()
+        # Only rows of the current feature schema (older files have no version column: v1)
+        expression = pa.dataset.field("feature_schema_version") == FEATURE_SCHEMA_VERSION
+        window = _filter_expression(pa, since=since, until=until)
+        if window is not None:
+            expression = expression & window
+        columns = list(FEATURE_COLUMNS)
+
+        if newest_first:
+            # One file at a time, so memory stays bounded by ARCHIVE_BATCH_SIZE rows
+            chunks = (
+                X[start:start + chunk_size]
+                for path in files
+                for X in [_matrix(_dataset(pa, [path]).to_table(columns=columns, filter=expression))[::-1]]
+                for start in range(0, len(X), chunk_size)
+            )
+        else:
+            batches = _dataset(pa, files).to_batches(columns=columns, filter=expression, batch_size=chunk_size)
+            chunks = (_matrix(batch) for batch in batches if batch.num_rows)
+
+        remaining = limit
+        for chunk in chunks:
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            yield chunk
+            if remaining == 0:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "after_days": self.after_days,
+            "runs": self._runs,
+            "failures": self._failures,
+            "rows_archived": self._rows_archived,
+            "files_written": self._files_written,
+            "bytes_written": self._bytes_written,
+            "recovered_files": self._recovered_files,
+            "last_run_seconds": round(self._last_run_seconds, 3) if self._last_run_seconds is not None else None,
+        }
+
+
+# Global archive of analyzed requests
+request_archive = RequestArchive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old analyzed requests to the Parquet archive")
+    parser.add_argument("--days", type=float, default=settings.ARCHIVE_AFTER_DAYS,
+                        help="Archive rows analyzed more than this many days ago (default: ARCHIVE_AFTER_DAYS)")
+    args = parser.parse_args()
+    if args.days <= 0:
+        parser.error("Set --days or ARCHIVE_AFTER_DAYS to a positive number of days")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    db.connect()
+    try:
+        moved = request_archive.archive(datetime.utcnow() - timedelta(days=args.days))
+        print(f"{moved} request(s) archived to {request_archive.directory}")
+    finally:
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.database import db
+from app.services.archive import request_archive
+
+COUNT_MODES = ("exact", "cached", "approximate", "none")
+
+# Columns of one /audit/requests row, read from the database or the archive
+PAGE_COLUMNS = (
+    "id", "request_id", "ip_address", "endpoint", "http_method",
+    "is_anomaly", "confidence", "model_version", "user_label", "analyzed_at",
+)
+
+
+class AuditFilters(NamedTuple):
+    """Filters over analyzed_requests supported by the audit and bulk labeling endpoints."""
+    ip_address: Optional[str] = None
+    is_anomaly: Optional[bool] = None
+    min_confidence: Optional[float] = None
+    max_confidence: Optional[float] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    has_user_label: Optional[bool] = None
+
+    def where(self) -> Tuple[str, List[Any]]:
+        """
+        WHERE clause and parameters. Equality filters come first, matching the
+        (ip_address, ...), (is_anomaly, ...) and (user_label, ...) composite
+        indexes of migrations/004_audit_indexes.sql, which all end in analyzed_at.
+        """
+        conditions = []
+        params: List[Any] = []
+
+        if self.ip_address:
+            conditions.append("ip_address = %s")
+            params.append(self.ip_address)
+
+        if self.is_anomaly is not None:
+            conditions.append("is_anomaly = %s")
+            params.append(self.is_anomaly)
+
+        if self.has_user_label is not None:
+            conditions.append("user_label IS NOT NULL" if self.has_user_label else "user_label IS NULL")
+
+        if self.date_from:
+            conditions.append("analyzed_at >= %s")
+            params.append(self.date_from)
+
+        if self.date_to:
+            conditions.append("analyzed_at <= %s")
+            params.append(self.date_to)
+
+        if self.min_confidence is not None:
+            conditions.append("confidence >= %s")
+            params.append(self.min_confidence)
+
+        if self.max_confidence is not None:
+            conditions.append("confidence <= %s")
+            params.append(self.max_confidence)
+
+        return (" AND ".join(conditions) if conditions else "1=1"), params
+
+
+# ==============================================================
+# Keyset cursors
+# ==============================================================
+
+def encode_cursor(analyzed_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just after the row (analyzed_at, id) in newest-first order."""
+    raw = json.dumps([analyzed_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything that is not a valid cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        analyzed_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(analyzed_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_condition(cursor: str) -> Tuple[str, List[Any]]:
+    """Rows strictly after the cursor in ORDER BY analyzed_at DESC, id DESC."""
+    analyzed_at, row_id = decode_cursor(cursor)
+    # Expanded OR form: MySQL turns it into an index range scan on (..., analyzed_at, id)
+    return "(analyzed_at < %s OR (analyzed_at = %s AND id < %s))", [analyzed_at, analyzed_at, row_id]
+
+
+# ==============================================================
+# Total counts
+# ==============================================================
+
+class CountCache:
+    """
+    Exact COUNT(*) results per filter, reused for `ttl` seconds.
+
+    Paging through one result set issues the same count on every page; with
+    the cache only the first page pays for it. Bounded LRU, per process.
+    """
+
+    def __init__(self, ttl: float = settings.AUDIT_COUNT_CACHE_SECONDS, max_entries: int = 1_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Tuple[Any, ...]], Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, where: str, params: List[Any]) -> Optional[int]:
+        key = (where, tuple(params))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, where: str, params: List[Any], total: int):
+        with self._lock:
+            self._entries[(where, tuple(params))] = (time.monotonic() + self.ttl, total)
+            self._entries.move_to_end((where, tuple(params)))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"entries": len(self._entries), "ttl_seconds": self.ttl, "hits": self._hits, "misses": self._misses}
+
+
+def count_requests(where: str, params: List[Any], mode: str, filters: Optional[AuditFilters] = None) -> Optional[int]:
+    """
+    Total rows matching `where` according to `mode` (see COUNT_MODES); None for "none" (blocking).
+    With `filters` (the same filter as `where`), matching archived rows are added (always exact).
+    """
+    if mode == "none":
+        return None
+    archived = request_archive.count(filters) if filters is not None else 0
+    return _count_database(where, params, mode) + archived
+
+
+def _count_database(where: str, params: List[Any], mode: str) -> int:
+    if mode == "approximate" and db.dialect == "mysql":
+        return estimate_rows(where, params)
+    # SQLite's planner keeps no row estimates: "approximate" is served like "cached"
+    if mode in ("cached", "approximate"):
+        total = count_cache.get(where, params)
+        if total is not None:
+            return total
+    result = db.fetch_one(f"SELECT COUNT(*) AS total FROM analyzed_requests WHERE {where}", tuple(params))
+    total = result["total"] if result else 0
+    count_cache.put(where, params, total)
+    return total
+
+
+def estimate_rows(where: str, params: List[Any]) -> int:
+    """Optimizer row estimate for the filter (EXPLAIN; no rows are read)."""
+    plan = db.fetch_one(f"EXPLAIN SELECT id FROM analyzed_requests WHERE {where}", tuple(params))
+    if not plan or plan.get("rows") is None:
+        return 0
+    return int(plan["rows"] * float(plan.get("filtered") or 100.0) / 100.0)
+
+
+# ==============================================================
+# Archived rows
+# ==============================================================
+
+def archived_page(filters: AuditFilters, where: str, params: List[Any], rows_found: int, page_size: int,
+                  cursor: Optional[str] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Archived rows that complete a page of `rows_found` database rows (blocking).
+
+    The archive only holds rows older than the retention cutoff, so they
+    follow every database row in newest-first order: a short page continues
+    in the archive at the cursor position, or at whatever OFFSET is left once
+    all matching database rows have been skipped.
+    """
+    missing = page_size - rows_found
+    if missing <= 0 or not request_archive.has_data():
+        return []
+    if cursor:
+        return request_archive.page(filters, missing, PAGE_COLUMNS, after=decode_cursor(cursor))
+    skip = 0
+    if rows_found == 0 and offset > 0:
+        skip = max(offset - _count_database(where, params, "exact"), 0)
+    return request_archive.page(filters, missing, PAGE_COLUMNS, offset=skip)
+
+
+# Global exact-count cache of the audit endpoint
+count_cache = CountCache()
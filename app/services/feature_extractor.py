@@ -1,16 +1,43 @@
-import json
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Sequence
 from datetime import datetime
 
+import numpy as np
+
+from app.config import settings
+from app.executors import run_in_inference
+from app.services.ip_reputation import ip_reputation
+from app.services.rate_tracker import rate_tracker, frequency_score
+from app.services.rule_engine import rule_engine
+from app.services.feature_schema import FEATURE_COLUMNS, N_FEATURES
+
+EXPECTED_HEADERS = frozenset({'user-agent', 'content-type', 'accept', 'host'})
+
+
+class PayloadStats(NamedTuple):
+    """Structure of a JSON payload, gathered in one traversal."""
+    size: int                   # estimated length of json.dumps(payload)
+    max_depth: int              # deepest container nesting
+    key_count: int
+    string_count: int
+    string_total_length: int
+    max_string_length: int
+    node_count: int
+    truncated: bool             # traversal stopped at a configured limit
+
+
+EMPTY_PAYLOAD_STATS = PayloadStats(0, 0, 0, 0, 0, 0, 0, False)
+
 
 class FeatureExtractor:
     """Extracts numerical features from HTTP request data for the Isolation Forest model"""
 
     @staticmethod
-    def extract_features(request_data: Dict[str, Any]) -> Dict[str, float]:
+    def extract_features(request_data: Dict[str, Any],
+                         payload_stats: Optional[PayloadStats] = None) -> Dict[str, float]:
         """
         Extract numerical features from request data for ML model.
         Returns a dictionary of feature names → float values.
+        Pass `payload_stats` when the caller already measured the payload.
         """
         features: Dict[str, float] = {}
 
@@ -21,7 +48,7 @@ class FeatureExtractor:
 
         # Payload Complexity Score
         features['payload_complexity_score'] = FeatureExtractor._calculate_payload_complexity(
-            request_data.get('payload')
+            request_data.get('payload'), payload_stats
         )
 
         # Header Anomaly Score
@@ -34,90 +61,188 @@ class FeatureExtractor:
             request_data['endpoint']
         )
 
-        # Request Frequency Score (simplified — in prod: query DB/cache)
+        # Request Frequency Score (per-IP sliding window)
         features['frequency_score'] = FeatureExtractor._calculate_frequency_score(
             request_data['ip_address']
         )
 
         return features
 
+    @staticmethod
+    def extract_batch(requests: Sequence[Any],
+                      payload_stats: Optional[Sequence[PayloadStats]] = None) -> np.ndarray:
+        """
+        Extract features for many requests straight into the model input matrix.
+
+        `requests` are objects with `ip_address`, `endpoint`, `headers` and
+        `payload` attributes (e.g. AnalyzeRequest). Returns a preallocated
+        (n_requests, N_FEATURES) float32 array whose columns follow
+        FEATURE_COLUMNS; each column is filled in one assignment, with no
+        per-request dicts in between. Blocks on the network when the rate
+        tracker does (`rate_tracker.blocking`); async callers use
+        `extract_batch_async`.
+        """
+        n = len(requests)
+        if payload_stats is None:
+            payload_stats = [None] * n
+        X = np.empty((n, N_FEATURES), dtype=np.float32)
+        for j, name in enumerate(FEATURE_COLUMNS):
+            X[:, j] = _COLUMN_EXTRACTORS[name](requests, payload_stats)
+        return X
+
+    @staticmethod
+    async def extract_batch_async(requests: Sequence[Any],
+                                  payload_stats: Optional[Sequence[PayloadStats]] = None) -> np.ndarray:
+        """extract_batch for the event loop: moved to the inference pool only if the rate tracker blocks."""
+        if rate_tracker.blocking:
+            return await run_in_inference(FeatureExtractor.extract_batch, requests, payload_stats)
+        return FeatureExtractor.extract_batch(requests, payload_stats)
+
     # ==============================================================
     # Individual Feature Calculators
     # ==============================================================
 
     @staticmethod
     def _calculate_ip_reputation(ip_address: str) -> float:
-        """Return score 0.0 (trusted) → 1.0 (suspicious)."""
-        if ip_address in {'127.0.0.1', '::1', 'localhost'}:
-            return 0.0
-        if ip_address.startswith(('192.168.', '10.', '172.')):
-            return 0.1  # Private networks usually trusted
-        # In production: query AbuseIPDB, VirusTotal, etc.
-        return 0.5  # Default moderate score for public IPs
+        """Return score 0.0 (trusted) → 1.0 (suspicious) from block/allow lists and address class."""
+        return ip_reputation.score(ip_address)
 
     @staticmethod
-    def _calculate_payload_complexity(payload: Dict[str, Any] | None) -> float:
+    def _calculate_payload_complexity(payload: Dict[str, Any] | None,
+                                      stats: Optional[PayloadStats] = None) -> float:
         """Higher = more complex/suspicious payload."""
         if not payload:
             return 0.0
 
         try:
-            payload_str = json.dumps(payload)
-            size = len(payload_str)
-            nesting_level = FeatureExtractor._get_max_nesting_level(payload)
+            if stats is None:
+                stats = FeatureExtractor.measure_payload(payload)
 
-            size_score = min(size / 10_000, 1.0)        # Normalize over ~10KB
-            nesting_score = min(nesting_level / 10, 1.0)  # Deep nesting is suspicious
+            size_score = min(stats.size / 10_000, 1.0)        # Normalize over ~10KB
+            nesting_score = min(stats.max_depth / 10, 1.0)    # Deep nesting is suspicious
 
             return (size_score + nesting_score) / 2
         except Exception:
             return 1.0  # Malformed payload → highly suspicious
 
     @staticmethod
-    def _get_max_nesting_level(obj: Any, level: int = 0) -> int:
-        """Recursively calculate maximum nesting depth in JSON-like object."""
-        if isinstance(obj, dict):
-            if not obj:
-                return level
-            return max(FeatureExtractor._get_max_nesting_level(v, level + 1) for v in obj.values())
-        elif isinstance(obj, list):
-            if not obj:
-                return level
-            return max(FeatureExtractor._get_max_nesting_level(item, level + 1) for item in obj)
-        else:
-            return level
+    def measure_payload(
+        payload: Any,
+        max_nodes: int = settings.PAYLOAD_MAX_NODES,
+        max_depth: int = settings.PAYLOAD_MAX_DEPTH,
+        max_size: int = settings.PAYLOAD_MAX_SIZE,
+    ) -> PayloadStats:
+        """
+        Measure a JSON-like payload in a single iterative pass (no serialization,
+        no recursion, so hostile nesting cannot hit the recursion limit).
+
+        `size` estimates len(json.dumps(payload)) with default separators; it is
+        exact unless strings contain control characters. Nesting depth follows
+        the original definition: the number of non-empty containers around the
+        deepest value. The walk stops early once `max_nodes`, `max_depth` or
+        `max_size` is exceeded.
+        """
+        if not payload:
+            return EMPTY_PAYLOAD_STATS
+
+        size = deepest = keys = strings = string_total = string_max = nodes = 0
+        truncated = False
+        stack = [(payload, 0)]
+        while stack:
+            obj, level = stack.pop()
+            nodes += 1
+            if nodes > max_nodes or size > max_size:
+                truncated = True
+                break
+
+            if isinstance(obj, (dict, list, tuple)):
+                n = len(obj)
+                size += 2 + 2 * (n - 1) if n else 2          # brackets and ", " separators
+                if not n:
+                    deepest = max(deepest, level)
+                    continue
+                if level >= max_depth:
+                    deepest = max(deepest, level)
+                    truncated = True
+                    continue
+                if isinstance(obj, dict):
+                    keys += n
+                    for key, value in obj.items():
+                        size += _json_string_size(key if isinstance(key, str) else str(key)) + 2   # ": "
+                        stack.append((value, level + 1))
+                else:
+                    stack.extend((item, level + 1) for item in obj)
+                continue
+
+            deepest = max(deepest, level)
+            if isinstance(obj, str):
+                length = len(obj)
+                strings += 1
+                string_total += length
+                if length > string_max:
+                    string_max = length
+                size += _json_string_size(obj)
+            elif obj is None or obj is True:
+                size += 4
+            elif obj is False:
+                size += 5
+            elif isinstance(obj, (int, float)):
+                size += len(repr(obj))
+            else:
+                size += len(str(obj)) + 2
+
+        return PayloadStats(size, deepest, keys, strings, string_total, string_max, nodes, truncated)
 
     @staticmethod
     def _calculate_header_anomaly(headers: Dict[str, str]) -> float:
         """Score based on missing expected headers and suspicious User-Agent."""
-        expected = {'user-agent', 'content-type', 'accept', 'host'}
         present = {k.lower() for k in headers.keys()}
-        missing_score = len(expected - present) / len(expected)
+        missing_score = len(EXPECTED_HEADERS - present) / len(EXPECTED_HEADERS)
 
         user_agent = headers.get('User-Agent') or headers.get('user-agent', '')
-        ua_score = 0.0
-        if not user_agent:
-            ua_score = 1.0
-        elif any(bot in user_agent.lower() for bot in ['bot', 'crawler', 'spider', 'scraper', 'headless']):
-            ua_score = 0.8
+        # Bot/crawler keywords come from the rule engine (memoized per User-Agent)
+        ua_score = rule_engine.user_agent.score(user_agent) if user_agent else 1.0
 
         return (missing_score + ua_score) / 2
 
     @staticmethod
     def _calculate_endpoint_risk(endpoint: str) -> float:
-        """Higher score for sensitive/administrative endpoints."""
-        endpoint_lower = endpoint.lower()
-        high_risk = ['admin', 'delete', 'drop', 'execute', 'eval', 'password', 'token', 'login', 'auth']
-        medium_risk = ['update', 'modify', 'change', 'edit', 'upload']
-
-        if any(k in endpoint_lower for k in high_risk):
-            return 0.9
-        if any(k in endpoint_lower for k in medium_risk):
-            return 0.5
-        return 0.2
+        """Higher score for sensitive/administrative endpoints (weighted rules, memoized per endpoint)."""
+        return rule_engine.endpoint.score(endpoint)
 
     @staticmethod
     def _calculate_frequency_score(ip_address: str) -> float:
-        """In production: query recent request count from Redis/DB."""
-        # Placeholder — real implementation would check rate per IP
-        return 0.3
\ No newline at end of file
+        """Record this request and score the IP's request rate over the sliding window."""
+        return frequency_score(rate_tracker.hit(ip_address))
+
+
+# One batch calculator per schema column; extract_batch fills columns in FEATURE_COLUMNS order
+_COLUMN_EXTRACTORS: Dict[str, Callable[[Sequence[Any], Sequence[Optional[PayloadStats]]], List[float]]] = {
+    'ip_reputation_score': lambda requests, _: [
+        FeatureExtractor._calculate_ip_reputation(r.ip_address) for r in requests
+    ],
+    'payload_complexity_score': lambda requests, stats: [
+        FeatureExtractor._calculate_payload_complexity(r.payload, s) for r, s in zip(requests, stats)
+    ],
+    'header_anomaly_score': lambda requests, _: [
+        FeatureExtractor._calculate_header_anomaly(r.headers) for r in requests
+    ],
+    'endpoint_risk_score': lambda requests, _: [
+        FeatureExtractor._calculate_endpoint_risk(r.endpoint) for r in requests
+    ],
+    # All hits of the batch are recorded together (one round trip on the redis backend)
+    'frequency_score': lambda requests, _: [
+        frequency_score(count) for count in rate_tracker.hit_many([r.ip_address for r in requests])
+    ],
+}
+assert set(_COLUMN_EXTRACTORS) == set(FEATURE_COLUMNS), "feature schema and extractors disagree"
+
+
+def _json_string_size(s: str) -> int:
+    """Length of `s` as a JSON string literal (quotes and escapes included)."""
+    if s.isascii():
+        return len(s) + 2 + s.count('"') + s.count('\\')
+    # With ensure_ascii every non-ASCII UTF-16 code unit becomes a 6-char \uXXXX escape
+    ascii_chars = len(s.encode('ascii', 'ignore'))
+    utf16_units = len(s.encode('utf-16-le')) // 2
+    return ascii_chars + 6 * (utf16_units - ascii_chars) + 2 + s.count('"') + s.count('\\')
@@ -0,0 +1,46 @@
+from typing import Any, Sequence
+
+# Bump whenever a column is added, removed, reordered or its meaning changes.
+# Models record the version they were trained with and are refused on mismatch;
+# stored rows record it too (analyzed_requests.feature_schema_version) and
+# training only reads rows of the current version.
+#   v1: frequency_score was a constant 0.3, ip_reputation_score only classed the address
+#   v2: per-IP sliding-window frequency_score, block/allow list ip_reputation_score
+FEATURE_SCHEMA_VERSION = 2
+
+# Column order of the model input matrix, shared by inference and training
+FEATURE_COLUMNS = (
+    'ip_reputation_score',
+    'payload_complexity_score',
+    'header_anomaly_score',
+    'endpoint_risk_score',
+    'frequency_score',
+)
+
+N_FEATURES = len(FEATURE_COLUMNS)
+
+# SELECT list for reading training vectors back from analyzed_requests
+FEATURE_SELECT = ", ".join(FEATURE_COLUMNS)
+
+
+def tag_model(model: Any) -> Any:
+    """Record the feature schema a freshly fitted model was trained with."""
+    model.feature_schema_version_ = FEATURE_SCHEMA_VERSION
+    model.feature_columns_ = FEATURE_COLUMNS
+    return model
+
+
+def check_model_schema(model: Any):
+    """Raise ValueError if `model` was trained on a different feature schema."""
+    # Models trained before the schema was versioned used v1 (and are therefore refused)
+    check_schema(getattr(model, "feature_schema_version_", 1), getattr(model, "feature_columns_", FEATURE_COLUMNS))
+
+
+def check_schema(version: int, columns: Sequence[str]):
+    """Raise ValueError unless (version, columns) match the schema this service extracts."""
+    columns = tuple(columns)
+    if version != FEATURE_SCHEMA_VERSION or columns != FEATURE_COLUMNS:
+        raise ValueError(
+            f"Model was trained with feature schema v{version} {list(columns)}, "
+            f"but this service extracts v{FEATURE_SCHEMA_VERSION} {list(FEATURE_COLUMNS)}. Retrain the model."
+        )
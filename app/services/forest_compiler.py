@@ -0,0 +1,193 @@
+import logging
+from typing import Any, Optional
+
+import numpy as np
+from sklearn.ensemble._iforest import _average_path_length
+
+logger = logging.getLogger(__name__)
+
+# Number of (tree, sample) pairs traversed at once; bounds temporary memory
+_TRAVERSAL_BLOCK = 1 << 20
+
+
+class CompiledForest:
+    """
+    A fitted IsolationForest flattened into NumPy node arrays.
+
+    All trees are concatenated into one set of arrays (feature, threshold,
+    left, right, leaf value) indexed by a global node id. Leaves point to
+    themselves, so a whole batch is scored by walking every (tree, sample)
+    pair one level per step for `max_depth` steps, with no Python loop over
+    estimators and none of sklearn's per-call validation overhead.
+
+    Scores are bit-for-bit equal to `IsolationForest.score_samples`: features
+    are compared in float32 against the float64 thresholds exactly like
+    sklearn's tree `apply`, leaf values are the same
+    `depth + c(n_node_samples) - 1.0` terms sklearn uses, and they are summed
+    tree by tree in estimator order.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        leaf_value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        max_samples: float,
+        offset: float,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.max_samples = max_samples
+        self.offset = float(offset)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "CompiledForest":
+        """Compile a fitted sklearn IsolationForest."""
+        path_lengths = getattr(model, "_decision_path_lengths", None)
+        average_path_lengths = getattr(model, "_average_path_length_per_tree", None)
+        # Trees only see a column subset (estimators_features_) when max_features < n_features
+        subsample_features = getattr(model, "_max_features", model.n_features_in_) != model.n_features_in_
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        n_nodes = 0
+        max_depth = 0
+        for tree_idx, (estimator, tree_features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            local_ids = np.arange(tree.node_count)
+
+            depths = path_lengths[tree_idx] if path_lengths is not None else _node_depths(tree)
+            avg_lengths = (
+                average_path_lengths[tree_idx] if average_path_lengths is not None
+                else _average_path_length(tree.n_node_samples)
+            )
+
+            # Map the tree's feature ids back to columns of the full input matrix
+            feature = np.maximum(tree.feature, 0)
+            if subsample_features:
+                feature = np.asarray(tree_features)[feature]
+            feature = np.where(is_leaf, 0, feature)
+            features.append(feature.astype(np.intp))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, local_ids, tree.children_left) + n_nodes)
+            rights.append(np.where(is_leaf, local_ids, tree.children_right) + n_nodes)
+            values.append(depths + avg_lengths - 1.0)
+            roots.append(n_nodes)
+
+            max_depth = max(max_depth, int(tree.max_depth))
+            n_nodes += tree.node_count
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            max_samples=getattr(model, "_max_samples", model.max_samples_),
+            offset=model.offset_,
+        )
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Equivalent of IsolationForest.score_samples (lower = more abnormal)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"X has shape {X.shape}, but the compiled forest expects {self.n_features} features"
+            )
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+
+        n_samples = X.shape[0]
+        depths = np.zeros(n_samples, dtype=np.float64)
+        block = max(1, _TRAVERSAL_BLOCK // max(self.n_trees, 1))
+        for start in range(0, n_samples, block):
+            stop = min(start + block, n_samples)
+            depths[start:stop] = self._path_lengths(X[start:stop])
+
+        average_path_length_max_samples = _average_path_length([self.max_samples])
+        denominator = self.n_trees * average_path_length_max_samples
+        scores = 2 ** (
+            -np.divide(depths, denominator, out=np.ones_like(depths), where=denominator != 0)
+        )
+        return -scores
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Equivalent of IsolationForest.decision_function (negative = anomaly)."""
+        return self.score_samples(X) - self.offset
+
+    def _path_lengths(self, X: np.ndarray) -> np.ndarray:
+        n_samples = X.shape[0]
+        n_trees = self.n_trees
+
+        # One cursor per (tree, sample), tree-major
+        node = np.repeat(self.roots, n_samples)
+        row_base = np.tile(np.arange(n_samples, dtype=np.intp) * self.n_features, n_trees)
+        flat_X = X.ravel()
+
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_base + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaf_values = self.leaf_value[node].reshape(n_trees, n_samples)
+        depths = np.zeros(n_samples, dtype=np.float64)
+        # Accumulate in estimator order, exactly as sklearn does
+        for tree_idx in range(n_trees):
+            depths += leaf_values[tree_idx]
+        return depths
+
+
+def _node_depths(tree: Any) -> np.ndarray:
+    """Depth of every node with the root at 1 (same as Tree.compute_node_depths)."""
+    if hasattr(tree, "compute_node_depths"):
+        return tree.compute_node_depths()
+    depths = np.empty(tree.node_count, dtype=np.int64)
+    depths[0] = 1
+    # sklearn stores children after their parent, so one forward pass suffices
+    for node_id in range(tree.node_count):
+        left = tree.children_left[node_id]
+        if left != -1:
+            depths[left] = depths[node_id] + 1
+            depths[tree.children_right[node_id]] = depths[node_id] + 1
+    return depths
+
+
+def compile_forest(model: Any, probe: Optional[np.ndarray] = None) -> Optional[CompiledForest]:
+    """
+    Compile `model` and verify it against sklearn on a probe matrix.
+    Returns None (caller falls back to sklearn) if the scores are not identical.
+    """
+    try:
+        forest = CompiledForest.from_sklearn(model)
+    except Exception as e:
+        logger.warning("Could not compile model, using sklearn scoring: %s", e)
+        return None
+
+    if probe is None:
+        rng = np.random.default_rng(0)
+        probe = rng.random((256, forest.n_features), dtype=np.float32)
+    if not np.array_equal(forest.score_samples(probe), model.score_samples(probe)):
+        logger.warning("Compiled forest disagrees with sklearn, using sklearn scoring")
+        return None
+    return forest
@@ -0,0 +1,257 @@
+import ipaddress
+import logging
+import math
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_NO_VALUE = float("nan")
+
+
+class PrefixTrie:
+    """
+    Binary prefix trie over fixed-width integer addresses (32 bits for IPv4, 128 for IPv6).
+
+    Nodes live in flat typed arrays (child ids and a value per node, NaN = no
+    entry), so millions of prefixes stay compact. A lookup walks at most one
+    node per bit of the longest stored prefix and returns the value of the
+    longest matching prefix.
+    """
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self._zero = array("i", [0])
+        self._one = array("i", [0])
+        self._value = array("d", [_NO_VALUE])
+        self.entries = 0
+
+    def __len__(self) -> int:
+        return len(self._value)
+
+    def insert(self, network: int, prefix_len: int, value: float):
+        node = 0
+        for shift in range(self.bits - 1, self.bits - 1 - prefix_len, -1):
+            children = self._one if (network >> shift) & 1 else self._zero
+            child = children[node]
+            if not child:
+                child = len(self._value)
+                self._zero.append(0)
+                self._one.append(0)
+                self._value.append(_NO_VALUE)
+                children[node] = child
+            node = child
+        if math.isnan(self._value[node]):
+            self.entries += 1
+        self._value[node] = value
+
+    def longest_match(self, address: int) -> float:
+        """Value of the longest prefix containing `address` (NaN if none)."""
+        zero, one, value = self._zero, self._one, self._value
+        best = value[0]
+        node = 0
+        shift = self.bits - 1
+        while shift >= 0:
+            node = one[node] if (address >> shift) & 1 else zero[node]
+            if not node:
+                break
+            v = value[node]
+            if v == v:   # not NaN
+                best = v
+            shift -= 1
+        return best
+
+
+class _ReputationState:
+    """Tries and result cache for one version of the lists; replaced wholesale on reload."""
+
+    def __init__(self, ipv4: PrefixTrie, ipv6: PrefixTrie, sources: Dict[str, float], cache_size: int):
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+        self.sources = sources          # path → mtime at load time
+        self.cache: "OrderedDict[str, float]" = OrderedDict()
+        self.cache_size = cache_size
+        self.loaded_at = datetime.utcnow()
+
+
+class IPReputationEngine:
+    """
+    Scores client IPs 0.0 (trusted) → 1.0 (suspicious).
+
+    Blocklist/allowlist files (one IP or CIDR per line, optional score after
+    it, `#` comments) are loaded into IPv4/IPv6 prefix tries. The longest
+    matching prefix wins; at equal length the allowlist wins. Addresses that
+    match no list fall back to loopback → 0.0, private/link-local → 0.1 and
+    the configured default for public addresses.
+
+    Results are cached per address in an LRU. A background thread watches the
+    list files and rebuilds the tries off the scoring path; the new tries and
+    an empty cache are swapped in with one reference assignment.
+    """
+
+    def __init__(
+        self,
+        blocklist_paths: List[str] = settings.IP_BLOCKLIST_PATHS,
+        allowlist_paths: List[str] = settings.IP_ALLOWLIST_PATHS,
+        default_score: float = settings.IP_REPUTATION_DEFAULT_SCORE,
+        cache_size: int = settings.IP_REPUTATION_CACHE_SIZE,
+        reload_interval: float = settings.IP_LISTS_RELOAD_SECONDS,
+    ):
+        self.blocklist_paths = blocklist_paths
+        self.allowlist_paths = allowlist_paths
+        self.default_score = default_score
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        self._state = self._build()
+
+    # ==============================================================
+    # Scoring
+    # ==============================================================
+
+    def score(self, ip_address: str) -> float:
+        state = self._state
+        with self._lock:
+            cached = state.cache.get(ip_address)
+            if cached is not None:
+                state.cache.move_to_end(ip_address)
+                self._hits += 1
+                return cached
+
+        score = self._lookup(state, ip_address)
+
+        with self._lock:
+            self._misses += 1
+            state.cache[ip_address] = score
+            if len(state.cache) > state.cache_size:
+                state.cache.popitem(last=False)
+        return score
+
+    def _lookup(self, state: _ReputationState, ip_address: str) -> float:
+        if ip_address == 'localhost':
+            return 0.0
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return self.default_score
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        trie = state.ipv4 if address.version == 4 else state.ipv6
+        listed = trie.longest_match(int(address))
+        if listed == listed:   # not NaN
+            return listed
+
+        if address.is_loopback:
+            return 0.0
+        if address.is_private or address.is_link_local:
+            return 0.1  # Private networks usually trusted
+        return self.default_score
+
+    # ==============================================================
+    # Loading / hot reload
+    # ==============================================================
+
+    def start(self):
+        """Start watching the list files for changes (idempotent)."""
+        if self.reload_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="ip-reputation-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reload(self):
+        """Rebuild the tries from the current files and swap them in."""
+        self._state = self._build()
+        self._reloads += 1
+        logger.info("Reloaded IP reputation lists (%d prefixes)", self._state.ipv4.entries + self._state.ipv6.entries)
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        return {
+            "ipv4_prefixes": state.ipv4.entries,
+            "ipv6_prefixes": state.ipv6.entries,
+            "trie_nodes": len(state.ipv4) + len(state.ipv6),
+            "cache_entries": len(state.cache),
+            "cache_size": state.cache_size,
+            "cache_hits": self._hits,
+            "cache_misses": self._misses,
+            "reloads": self._reloads,
+            "loaded_at": state.loaded_at.isoformat() + "Z",
+        }
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                if self._current_mtimes() != self._state.sources:
+                    self.reload()
+            except Exception as e:
+                logger.error("Error reloading IP reputation lists: %s", e)
+
+    def _current_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for path in self.blocklist_paths + self.allowlist_paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = 0.0
+        return mtimes
+
+    def _build(self) -> _ReputationState:
+        sources = self._current_mtimes()
+        ipv4, ipv6 = PrefixTrie(32), PrefixTrie(128)
+        # Allowlists go last so they win over blocklist entries of the same prefix
+        for paths, default in ((self.blocklist_paths, 1.0), (self.allowlist_paths, 0.0)):
+            for path in paths:
+                for network, value in _read_list(path, default):
+                    trie = ipv4 if network.version == 4 else ipv6
+                    trie.insert(int(network.network_address), network.prefixlen, value)
+        return _ReputationState(ipv4, ipv6, sources, self.cache_size)
+
+
+def _read_list(path: str, default_score: float) -> List[Tuple[Any, float]]:
+    """Parse `<ip-or-cidr> [score]` lines; unreadable files and bad lines are skipped."""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning("Skipping unreadable IP reputation list %s: %s", path, e)
+        return []
+    entries = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        try:
+            network = ipaddress.ip_network(parts[0], strict=False)
+            value = min(max(float(parts[1]), 0.0), 1.0) if len(parts) > 1 else default_score
+        except ValueError:
+            logger.warning("%s:%d: skipping invalid entry '%s'", path, line_no, line)
+            continue
+        entries.append((network, value))
+    return entries
+
+
+# Global reputation engine used by FeatureExtractor
+ip_reputation = IPReputationEngine()
@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import settings
+from app.database import db
+from app.services.audit_query import AuditFilters
+from app.services.request_stats import request_stats
+
+_STATE_COLUMNS = "id, is_anomaly, user_label, model_version, analyzed_at"
+# SQLite has no row locks; its write transaction already holds the database write lock
+_FOR_UPDATE = " FOR UPDATE" if db.dialect == "mysql" else ""
+
+
+def update_labels(
+    user_label: bool,
+    changed_by: str,
+    ids: Optional[Sequence[int]] = None,
+    filters: Optional[AuditFilters] = None,
+    chunk_size: int = settings.LABELING_BULK_CHUNK_SIZE,
+    max_rows: int = settings.LABELING_BULK_MAX_ROWS,
+) -> Dict[str, Any]:
+    """
+    Set `user_label` on the requests given by `ids` or matching `filters` (blocking).
+
+    Everything happens in one transaction. Per chunk of `chunk_size` ids, one
+    locking SELECT reads the previous state of all rows at once, and one
+    UPDATE ... WHERE id IN (...) writes the label. MySQL has no UPDATE ...
+    RETURNING, and the locking read keeps the reported old labels and the
+    statistics deltas exact. Statistics are only applied after the commit.
+    Returns {"changes": [...], "not_found": [...]}.
+
+    Only the rows being changed are locked. A filter is first resolved to
+    ids with a plain (non-locking) read; a locking read over the filter
+    itself would take next-key locks on every scanned index entry and gap,
+    blocking concurrent INSERTs of new analysis results until the commit.
+    The locking reads then go by primary key and re-check the filter, so a
+    row that stopped matching in between is left alone.
+    """
+    if (ids is None) == (filters is None):
+        raise ValueError("Give either ids or a filter")
+
+    changed_at = datetime.utcnow()
+    previous: List[Dict[str, Any]] = []
+    not_found: List[int] = []
+
+    with db.transaction() as cursor:
+        if ids is not None:
+            wanted = list(dict.fromkeys(ids))   # de-duplicated, order kept
+            if len(wanted) > max_rows:
+                raise ValueError(f"At most {max_rows} ids per call, got {len(wanted)}")
+            for start in range(0, len(wanted), chunk_size):
+                chunk = wanted[start:start + chunk_size]
+                rows = _lock_rows(cursor, chunk)
+                not_found.extend(row_id for row_id in chunk if row_id not in rows)
+                previous.extend(rows[row_id] for row_id in chunk if row_id in rows)
+        else:
+            where, params = filters.where()
+            cursor.execute(
+                f"SELECT id FROM analyzed_requests WHERE {where} ORDER BY id LIMIT %s",
+                tuple(params) + (max_rows + 1,)
+            )
+            matched = [row["id"] for row in cursor.fetchall()]
+            if len(matched) > max_rows:
+                raise ValueError(f"Filter matches more than {max_rows} requests; narrow it down")
+            for start in range(0, len(matched), chunk_size):
+                chunk = matched[start:start + chunk_size]
+                rows = _lock_rows(cursor, chunk, where, params)
+                previous.extend(rows[row_id] for row_id in chunk if row_id in rows)
+
+        for start in range(0, len(previous), chunk_size):
+            chunk = [row["id"] for row in previous[start:start + chunk_size]]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"""
+                UPDATE analyzed_requests
+                SET user_label = %s,
+                    label_changed_at = %s,
+                    label_changed_by = %s
+                WHERE id IN ({placeholders})
+                """,
+                (user_label, changed_at, changed_by, *chunk)
+            )
+
+    changes = []
+    for row in previous:
+        old_user_label = bool(row["user_label"]) if row["user_label"] is not None else None
+        is_anomaly = bool(row["is_anomaly"])
+        request_stats.record_label(row["analyzed_at"], row["model_version"], is_anomaly, old_user_label, user_label)
+        changes.append({
+            "request_id": row["id"],
+            "is_anomaly": is_anomaly,
+            "old_label": old_user_label,
+            "new_label": user_label,
+        })
+    return {"changes": changes, "not_found": not_found}
+
+
+def _lock_rows(cursor, ids: Sequence[int], where: str = "", params: Sequence[Any] = ()) -> Dict[int, Dict[str, Any]]:
+    """Lock the rows with these ids (primary key lookups, no gap locks) and return their state by id."""
+    placeholders = ", ".join(["%s"] * len(ids))
+    condition = f" AND {where}" if where else ""
+    cursor.execute(
+        f"SELECT {_STATE_COLUMNS} FROM analyzed_requests WHERE id IN ({placeholders}){condition}{_FOR_UPDATE}",
+        tuple(ids) + tuple(params)
+    )
+    return {row["id"]: row for row in cursor.fetchall()}
@@ -0,0 +1,177 @@
+import functools
+import re
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+# Latency bucket upper bounds in seconds: 10µs .. 10s, roughly 1-2.5-5 steps per decade
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (Prometheus semantics: a value counts in every
+    bucket whose upper bound is >= the value).
+
+    Each thread records into its own shard of counters, so an observation is
+    one bisect over the bounds plus two additions with no lock (a shard has a
+    single writer, no increment is lost). Shards are summed when scraped.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(per-bucket counts with +Inf last, sum of observed values)."""
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-1]
+        return counts, total
+
+    def _new_shard(self) -> List[float]:
+        # Bucket counts, the +Inf count, then the running sum
+        shard = self._local.shard = [0] * (len(self.bounds) + 1) + [0.0]
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+
+class HistogramFamily:
+    """Histograms sharing a name, one per value of a single label."""
+
+    def __init__(self, name: str, help: str, label: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._children: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value: str) -> Histogram:
+        """The child histogram for `value`; resolve once and keep it for hot paths."""
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(value, Histogram(self.buckets))
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(child.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {total!r}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics exposed on /metrics in the Prometheus text format: latency
+    histogram families plus gauges read from the components' stats() dicts
+    at scrape time (numeric values only, nested dicts flattened with `_`).
+    """
+
+    def __init__(self, prefix: str = "ifs"):
+        self.prefix = prefix
+        self._families: List[HistogramFamily] = []
+        self._collectors: List[Tuple[str, Callable[[], Optional[Dict[str, Any]]]]] = []
+
+    def histogram(self, name: str, help: str, label: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> HistogramFamily:
+        family = HistogramFamily(f"{self.prefix}_{name}", help, label, buckets)
+        self._families.append(family)
+        return family
+
+    def add_collector(self, component: str, stats: Callable[[], Optional[Dict[str, Any]]]):
+        self._collectors.append((component, stats))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self._families:
+            lines.extend(family.render())
+        for component, stats in self._collectors:
+            try:
+                values = stats() or {}
+            except Exception:
+                continue   # a failing component must not break the scrape
+            for key, value in _flatten(values):
+                name = _NAME.sub("_", f"{self.prefix}_{component}_{key}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(values: Dict[str, Any], prefix: str = ""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}{key}", value
+
+
+def timed(histogram: Histogram) -> Callable:
+    """Decorator recording the call duration in `histogram` (returns `fn` unchanged if metrics are off)."""
+    def decorator(fn):
+        if not settings.METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# ==============================================================
+# Global registry and the hot-path histograms
+# ==============================================================
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "stage_duration_seconds", "Time spent per processing stage", "stage"
+)
+db_seconds = metrics.histogram(
+    "db_call_duration_seconds", "Duration of Database calls, including the pool checkout", "operation"
+)
+
+ANALYZE = stage_seconds.labels("analyze")
+ANALYZE_BATCH = stage_seconds.labels("analyze_batch")
+FEATURE_EXTRACTION = stage_seconds.labels("feature_extraction")
+SCORING = stage_seconds.labels("scoring")
+MODEL_LOAD = stage_seconds.labels("model_load")
+RESULT_PERSIST = stage_seconds.labels("result_persist")
+POOL_WAIT = db_seconds.labels("pool_checkout")
@@ -0,0 +1,192 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.executors import run_in_inference
+from app.services.ml_service import ml_service
+
+# Upper bounds of the batch size histogram buckets (last bucket is "+Inf")
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row scoring calls into one matrix.
+
+    Callers submit a feature row and await a future. A background task takes
+    the first pending row, waits up to `window_ms` (or until `max_batch_size`
+    rows are pending), scores everything it collected with one call to
+    `score_fn` and resolves each caller's future with its own
+    (is_anomaly, score, model_version).
+
+    The dispatcher runs between start() and stop(). Rows submitted while it
+    is not running (before startup, or once stop() has begun) are scored
+    on their own instead of being queued.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, str]],
+        window_ms: float = settings.MICROBATCH_WINDOW_MS,
+        max_batch_size: int = settings.MICROBATCH_MAX_SIZE,
+    ):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[np.ndarray, asyncio.Future, float]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._wait_seconds_sum = 0.0
+        self._wait_seconds_max = 0.0
+
+    # ==============================================================
+    # Lifecycle
+    # ==============================================================
+
+    def start(self):
+        """Start the dispatcher task on the running event loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Let the dispatcher score whatever is still pending, then stop it."""
+        # Stays set until the next start(): later submits bypass the queue
+        self._stopping = True
+        task = self._task
+        if task is not None:
+            # Not cancelled: a batch being scored would never resolve its callers
+            self._wakeup.set()
+            self._full.set()
+            await task
+            self._task = None
+        while self._pending:
+            await self._dispatch(self._take_batch())
+
+    # ==============================================================
+    # Public API
+    # ==============================================================
+
+    async def submit(self, row: np.ndarray) -> Tuple[bool, float, str]:
+        """Queue one feature row and wait for its (is_anomaly, score, model_version)."""
+        if self._stopping or self._task is None or self._task.done():
+            labels, scores, model_version = await run_in_inference(self.score_fn, row.reshape(1, -1))
+            return bool(labels[0]), float(scores[0]), model_version
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future, time.perf_counter()))
+
+        depth = len(self._pending)
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        if depth == 1:
+            self._wakeup.set()
+        if depth >= self.max_batch_size:
+            self._full.set()
+
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in BATCH_SIZE_BUCKETS] + ["le_inf"]
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "items": self._items,
+            "average_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": dict(zip(labels, self._batch_size_counts)),
+            "average_wait_ms": round(self._wait_seconds_sum / self._items * 1000.0, 4) if self._items else 0.0,
+            "max_wait_ms": round(self._wait_seconds_max * 1000.0, 4),
+        }
+
+    # ==============================================================
+    # Dispatcher
+    # ==============================================================
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                if not self._pending:
+                    continue
+
+            # Give concurrent callers one window to join the batch
+            if len(self._pending) < self.max_batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+
+            await self._dispatch(self._take_batch())
+
+    def _take_batch(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+        if len(self._pending) < self.max_batch_size and not self._stopping:
+            self._full.clear()
+        return batch
+
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        try:
+            X = np.vstack([row for row, _, _ in batch])
+            labels, scores, model_version = await run_in_inference(self.score_fn, X)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except asyncio.CancelledError:
+            # Cancelled mid-batch (event loop shutdown): don't leave the callers waiting forever
+            for _, future, _ in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        finally:
+            self._record(batch, started)
+
+        for i, (_, future, _) in enumerate(batch):
+            if not future.done():
+                future.set_result((bool(labels[i]), float(scores[i]), model_version))
+
+    def _record(self, batch, dispatched_at: float):
+        size = len(batch)
+        self._batches += 1
+        self._items += size
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self._batch_size_counts[i] += 1
+                break
+        else:
+            self._batch_size_counts[-1] += 1
+
+        for _, _, enqueued_at in batch:
+            waited = dispatched_at - enqueued_at
+            self._wait_seconds_sum += waited
+            if waited > self._wait_seconds_max:
+                self._wait_seconds_max = waited
+
+
+# Global coalescer in front of ml_service
+micro_batcher = MicroBatcher(ml_service.score)
@@ -1,57 +1,383 @@
+import json
+import logging
+import os
 import pickle
+import threading
+import uuid
+import time
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, Optional, Tuple, Any
 
+from app.config import settings
 from app.database import db
+from app.services.archive import request_archive
+from app.services.audit_query import AuditFilters
+from app.services.feature_schema import FEATURE_COLUMNS, check_model_schema, tag_model
+from app.services.forest_compiler import CompiledForest, compile_forest
+from app.services.model_artifact import (
+    ModelArtifact, export_artifact, is_artifact, load_artifact, open_artifact, prune_artifacts, store_artifact
+)
+from app.services.metrics import MODEL_LOAD, SCORING, timed
+from app.services.rolling_forest import compare_models, fit_rolling
+from app.services.training_data import TrainingSet, load_training_data
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveModel:
+    """Immutable snapshot of the active model."""
+
+    def __init__(self, version: str, stamp: Tuple[Any, ...], forest: Optional[CompiledForest] = None,
+                 artifact: Optional[ModelArtifact] = None, model: Any = None):
+        self.version = version
+        self.stamp = stamp
+        self.loaded_at = datetime.utcnow()
+        # Flattened node arrays used by the "compiled" scoring engine (None = score with sklearn)
+        self.forest = forest
+        # Memory-mapped artifact the forest arrays live in (None for legacy pickled models)
+        self.artifact = artifact
+        self._model = model
+        self._estimator_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    @property
+    def has_estimator(self) -> bool:
+        return self._model is not None or (self.artifact is not None and self.artifact.has_estimator)
+
+    @property
+    def model(self) -> Any:
+        """The sklearn estimator, unpickled from the artifact on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self.artifact is None:
+                        raise ValueError("No model loaded. Please train a model first.")
+                    self._model = self.artifact.load_estimator()
+        return self._model
+
+    def optional_model(self) -> Any:
+        """The sklearn estimator, or None if it cannot be loaded (the failure is logged once)."""
+        if self._estimator_error is None:
+            try:
+                return self.model
+            except ValueError as e:
+                self._estimator_error = e
+                logger.warning("Scoring model %s with the compiled forest only: %s", self.version, e)
+        return None
+
+
+@timed(MODEL_LOAD)
+def _load_snapshot(model_data: bytes, version: str, stamp: Tuple[Any, ...], model: Any = None) -> ActiveModel:
+    """Build the snapshot for a stored model: an array artifact or a legacy pickle BLOB."""
+    use_compiled = settings.SCORING_ENGINE == "compiled"
+    if not is_artifact(model_data):
+        model = model if model is not None else pickle.loads(model_data)
+        check_model_schema(model)
+        forest = compile_forest(model) if use_compiled else None
+        return ActiveModel(version, stamp, forest=forest, model=model)
+
+    return _artifact_snapshot(_map_artifact(model_data, version), version, stamp, model)
+
+
+def _artifact_snapshot(artifact: ModelArtifact, version: str, stamp: Tuple[Any, ...], model: Any = None) -> ActiveModel:
+    """Build the snapshot for an already opened artifact."""
+    artifact.check_schema()
+    forest = artifact.forest if settings.SCORING_ENGINE == "compiled" else None
+    snapshot = ActiveModel(version, stamp, forest=forest, artifact=artifact, model=model)
+    if forest is None:
+        snapshot.model  # scoring needs the estimator; fail at load time rather than on the first request
+    return snapshot
+
+
+def _map_artifact(model_data: bytes, version: str) -> ModelArtifact:
+    """Memory-map the artifact from MODEL_ARTIFACT_DIR (shared pages), or read it from memory if that fails."""
+    try:
+        return open_artifact(store_artifact(model_data, version))
+    except OSError as e:
+        logger.warning("Could not memory-map model artifact, loading it in memory: %s", e)
+        return load_artifact(model_data)
+
+
+# File in MODEL_ARTIFACT_DIR naming the artifact of the most recently activated model
+ACTIVE_POINTER = "ACTIVE"
+
+
+class ModelRegistry:
+    """
+    In-process cache of the active model.
+
+    The loaded model is held as a single ActiveModel snapshot, so readers
+    always see a consistent (model, version) pair and a swap is one reference
+    assignment. At most once per refresh interval a metadata-only query compares
+    the active row's (model_version, training_date) stamp with the cached one.
+
+    When the stamp changes, the ACTIVE pointer file is consulted first: the
+    process that activated or loaded a model publishes its stamp and artifact
+    path there, so other workers on the host map the same file (sharing its
+    pages) instead of fetching the BLOB. Only when the pointer does not match
+    the database stamp is the BLOB fetched, stored and published. Every worker
+    therefore serves a newly activated model within one refresh interval.
+    """
+
+    STAMP_QUERY = "SELECT model_version, training_date FROM models WHERE is_active = TRUE LIMIT 1"
+    LOAD_QUERY = "SELECT model_version, training_date, model_data FROM models WHERE is_active = TRUE LIMIT 1"
+
+    def __init__(self, refresh_interval: float = settings.MODEL_REFRESH_INTERVAL_SECONDS,
+                 artifact_dir: str = settings.MODEL_ARTIFACT_DIR):
+        self.refresh_interval = refresh_interval
+        self.artifact_dir = artifact_dir
+        self.pointer_path = os.path.join(artifact_dir, ACTIVE_POINTER)
+        self._snapshot: Optional[ActiveModel] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._checks = 0
+        self._reloads = 0
+        self._reload_failures = 0
+        self._pointer_loads = 0
+        self._pruned = 0
+
+    @property
+    def snapshot(self) -> Optional[ActiveModel]:
+        return self._snapshot
+
+    def get(self) -> Optional[ActiveModel]:
+        """Return the active model, re-checking the version stamp when the interval has elapsed."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            self._hits += 1
+            return snapshot
+        return self._check()
+
+    def refresh(self) -> Optional[ActiveModel]:
+        """Force a version check on the next access and perform it now."""
+        self._next_check = 0.0
+        return self._check()
+
+    def activate(self, model_data: bytes, version: str, stamp: Tuple[Any, ...], model: Any = None) -> ActiveModel:
+        """Install a model that was just trained/activated in this process (`model` skips unpickling)."""
+        snapshot = _load_snapshot(model_data, version, stamp, model)
+        with self._lock:
+            self._snapshot = snapshot
+            self._next_check = time.monotonic() + self.refresh_interval
+            self._publish(snapshot)
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "model_version": snapshot.version if snapshot else None,
+            "scoring_engine": ("compiled" if snapshot.forest is not None else "sklearn") if snapshot else None,
+            "loaded_at": snapshot.loaded_at.isoformat() + "Z" if snapshot else None,
+            "artifact": snapshot.artifact.stats() if snapshot and snapshot.artifact else None,
+            "refresh_interval_seconds": self.refresh_interval,
+            "hits": self._hits,
+            "version_checks": self._checks,
+            "reloads": self._reloads,
+            "reload_failures": self._reload_failures,
+            "pointer_loads": self._pointer_loads,
+            "pruned_artifacts": self._pruned,
+        }
+
+    def prune(self) -> int:
+        """
+        Delete artifacts in the artifact directory that no `models` row, the
+        ACTIVE pointer or this process's snapshot refers to. Returns the count.
+        """
+        keep_paths = []
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.artifact is not None and snapshot.artifact.path:
+            keep_paths.append(snapshot.artifact.path)
+        try:
+            with open(self.pointer_path) as f:
+                keep_paths.append(json.load(f)["path"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Not pruning model artifacts, unreadable active model pointer: %s", e)
+            return 0
+
+        versions = [row["model_version"] for row in db.fetch_all("SELECT DISTINCT model_version FROM models")]
+        deleted = prune_artifacts(versions, keep_paths, self.artifact_dir)
+        self._pruned += len(deleted)
+        if deleted:
+            logger.info("Pruned %d unreferenced model artifact(s)", len(deleted))
+        return len(deleted)
+
+    def _check(self) -> Optional[ActiveModel]:
+        with self._lock:
+            now = time.monotonic()
+            snapshot = self._snapshot
+            if snapshot is not None and now < self._next_check:
+                # Another caller refreshed while we waited for the lock
+                self._hits += 1
+                return snapshot
+
+            self._checks += 1
+            row = db.fetch_one(self.STAMP_QUERY)
+            self._next_check = now + self.refresh_interval
+
+            if not row:
+                if snapshot is not None:
+                    logger.warning("Active model was deactivated in the database.")
+                self._snapshot = None
+                return None
+
+            stamp = (row["model_version"], row["training_date"])
+            if snapshot is not None and snapshot.stamp == stamp:
+                self._hits += 1
+                return snapshot
+
+            published = self._load_published(stamp)
+            if published is not None:
+                self._snapshot = published
+                self._pointer_loads += 1
+                logger.info("Mapped active model %s published by another worker", published.version)
+                return published
+
+            try:
+                result = db.fetch_one(self.LOAD_QUERY)
+                if not result:
+                    self._snapshot = None
+                    return None
+                self._snapshot = _load_snapshot(
+                    result["model_data"],
+                    result["model_version"],
+                    (result["model_version"], result["training_date"]),
+                )
+            except Exception:
+                self._reload_failures += 1
+                raise
+
+            self._reloads += 1
+            self._publish(self._snapshot)
+            logger.info("Loaded active model: %s", self._snapshot.version)
+            return self._snapshot
+
+    @timed(MODEL_LOAD)
+    def _load_published(self, stamp: Tuple[Any, ...]) -> Optional[ActiveModel]:
+        """Map the artifact named by the ACTIVE pointer if it is the model with `stamp`."""
+        try:
+            with open(self.pointer_path) as f:
+                pointer = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable active model pointer: %s", e)
+            return None
+
+        version, training_date = stamp
+        if pointer.get("model_version") != version or pointer.get("training_date") != _stamp_date(training_date):
+            return None
+        try:
+            return _artifact_snapshot(open_artifact(pointer["path"]), version, stamp)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Could not map published model artifact, loading it from the database: %s", e)
+            return None
+
+    def _publish(self, snapshot: ActiveModel):
+        """Point the ACTIVE file at this snapshot's artifact so other workers can map it."""
+        if snapshot.artifact is None or snapshot.artifact.path is None:
+            return   # legacy pickle or in-memory artifact: other workers load the BLOB themselves
+        version, training_date = snapshot.stamp
+        pointer = {
+            "model_version": version,
+            "training_date": _stamp_date(training_date),
+            "path": os.path.abspath(snapshot.artifact.path),
+            "published_by": os.getpid(),
+            "published_at": datetime.utcnow().isoformat() + "Z",
+        }
+        tmp_path = f"{self.pointer_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(pointer, f)
+            os.replace(tmp_path, self.pointer_path)
+        except OSError as e:
+            logger.warning("Could not publish active model pointer: %s", e)
+
+
+def _stamp_date(training_date: Any) -> str:
+    return training_date.isoformat() if isinstance(training_date, datetime) else str(training_date)
 
 
 class MLService:
    def __init__(self):
+        self.registry = ModelRegistry()
         # Only load model when DB is actually connected
         if not hasattr(self, '_initialized'):
             self._initialized = True
-            if db.connection is not None:  # DB already connected?
+            if db.is_connected():  # DB already connected?
                 self.load_active_model()
             else:
-                print("DB not connected yet. Model will be loaded on first use.")
+                logger.info("DB not connected yet. Model will be loaded on first use.")
+
+   @property
+   def model(self):
+        snapshot = self.registry.snapshot
+        return snapshot.model if snapshot else None
+
+   @property
+   def model_version(self) -> Optional[str]:
+        snapshot = self.registry.snapshot
+        return snapshot.version if snapshot else None
+
    def load_active_model(self):
         """Load the currently active model from database."""
         try:
-            query = "SELECT model_version, model_data FROM models WHERE is_active = TRUE LIMIT 1"
-            result = db.fetch_one(query)
-            
-            if result:
-                self.model_version = result['model_version']
-                self.model = pickle.loads(result['model_data'])
-                print(f"✓ Loaded active model: {self.model_version}")
-            else:
-                print("⚠ No active model found. Please train a model first.")
+            if self.registry.refresh() is None:
+                logger.warning("No active model found. Please train a model first.")
         except Exception as e:
-            print(f"✗ Error loading model: {e}")
+            logger.error("Error loading model: %s", e)
             raise
+
+   def get_active_model(self) -> ActiveModel:
+        """Return the cached active model, reloading only if the active version changed."""
+        snapshot = self.registry.get()
+        if snapshot is None:
+            raise ValueError("No model loaded. Please train a model first.")
+        return snapshot
+   @timed(SCORING)
+   def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, str]:
+        """
+        Score an (n_samples, n_features) matrix in a single pass over the forest.
+        Returns (is_anomaly, decision_scores, model_version). The scores equal
+        IsolationForest.decision_function and a sample is anomalous exactly when
+        its score is negative, matching predict() without a second tree walk.
+
+        The compiled engine wins on small batches; above COMPILED_MAX_BATCH rows
+        sklearn's per-tree vectorization is faster, so large batches go to the
+        estimator whenever the model has one (both give identical scores). If
+        the embedded estimator cannot be unpickled, the forest scores them too.
+        """
+        active = self.get_active_model()
+        model = None
+        if active.forest is None:
+            model = active.model
+        elif len(X) > settings.COMPILED_MAX_BATCH > 0 and active.has_estimator:
+            model = active.optional_model()
+
+        if model is None:
+            decision = active.forest.decision_function(X)
+        else:
+            decision = model.score_samples(X) - model.offset_
+        return decision < 0, decision, active.version
+
    def predict(self, features: Dict[str, float]) -> Tuple[bool, float]:
         """
         Predict if a request is anomalous.
         Returns: (is_anomaly: bool, confidence: float [0.0-1.0])
         """
-        if self.model is None:
-            raise ValueError("No model loaded. Please train a model first.")
+        model = self.get_active_model().model
 
         # Ensure consistent feature order
-        feature_array = np.array([[
-            features['ip_reputation_score'],
-            features['payload_complexity_score'],
-            features['header_anomaly_score'],
-            features['endpoint_risk_score'],
-            features['frequency_score']
-        ]])
+        feature_array = np.array([[features[name] for name in FEATURE_COLUMNS]], dtype=np.float32)
 
         # -1 = anomaly, 1 = normal
-        prediction = self.model.predict(feature_array)[0]
+        prediction = model.predict(feature_array)[0]
         # Lower score = more anomalous
-        anomaly_score = self.model.score_samples(feature_array)[0]
+        anomaly_score = model.score_samples(feature_array)[0]
 
         # Convert to confidence (0 = normal, 1 = highly anomalous)
         confidence = float(-anomaly_score)  # score_samples returns negative values for anomalies
@@ -65,116 +391,241 @@ class MLService:
         model_version: str,
         contamination: float = 0.1,
         n_estimators: int = 100,
-        use_corrected_labels: bool = True
+        use_corrected_labels: bool = True,
+        data_options: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Train a new Isolation Forest model and activate it."""
+        """
+        Train a new Isolation Forest model and activate it.
+        `data_options` override the training data loader settings
+        (max_samples, sampling, since, until, chunk_size, memmap_dir, seed).
+        """
         start_time = datetime.now()
 
-        training_data = self._fetch_training_data(use_corrected_labels)
-        if len(training_data) < 100:
-            raise ValueError(f"Insufficient training data. Need at least 100 samples, got {len(training_data)}")
+        fitted = self.fit_model(contamination, n_estimators, use_corrected_labels, data_options)
+        duration = (datetime.now() - start_time).total_seconds()
+        self.activate_model(fitted["model_data"], model_version, fitted["training_samples"], fitted["model"])
 
-        X = np.array(training_data)
+        return self.training_summary(model_version, fitted, duration)
 
-        model = IsolationForest(
-            contamination=contamination,
-            n_estimators=n_estimators,
-            random_state=42,
-            n_jobs=-1
+   def fit_model(
+        self,
+        contamination: float = 0.1,
+        n_estimators: int = 100,
+        use_corrected_labels: bool = True,
+        data_options: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Load training data and fit a new forest without touching the active model.
+
+        When a `progress` callback is given, trees are grown in warm-start steps
+        of TRAINING_PROGRESS_TREES and progress(trees_fitted=...) is reported
+        after each step. Warm starting draws the same per-tree seeds as a single
+        fit, so the resulting forest is identical.
+        """
+        report = progress or (lambda **fields: None)
+        report(state="loading")
+        training_set = self._fetch_training_data(
+            use_corrected_labels,
+            progress=lambda rows: report(samples_loaded=rows),
+            **(data_options or {})
         )
-        model.fit(X)
+        training_data = training_set.X
+        try:
+            if len(training_data) < 100:
+                raise ValueError(f"Insufficient training data. Need at least 100 samples, got {len(training_data)}")
 
-        model_data = pickle.dumps(model)
-        duration = (datetime.now() - start_time).total_seconds()
+            X = training_data
+            report(state="fitting", samples_loaded=len(X), trees_fitted=0, trees_total=n_estimators)
+
+            step = settings.TRAINING_PROGRESS_TREES if progress else n_estimators
+            model = IsolationForest(
+                contamination=contamination,
+                n_estimators=n_estimators,
+                random_state=42,
+                n_jobs=-1,
+                warm_start=step < n_estimators
+            )
+            trees = 0
+            while trees < n_estimators:
+                trees = min(trees + max(step, 1), n_estimators)
+                # The contamination threshold needs a scoring pass over X; only pay for it once
+                model.set_params(n_estimators=trees,
+                                 contamination=contamination if trees == n_estimators else "auto")
+                model.fit(X)
+                report(trees_fitted=trees)
+            model.set_params(warm_start=False)
+            tag_model(model)
+        finally:
+            training_set.discard()
+
+        return {
+            "model": model,
+            "model_data": export_artifact(model),
+            "training_samples": len(training_data),
+            "data_loading": training_set.stats(),
+        }
+
+   def fit_incremental(
+        self,
+        new_trees: Optional[int] = None,
+        contamination: Optional[float] = None,
+        use_corrected_labels: bool = True,
+        data_options: Optional[Dict[str, Any]] = None,
+        compare_full: bool = False,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Rolling-forest update of the active model: fit only `new_trees` trees on
+        recent data and retire the same number of the oldest ones, keeping the
+        ensemble size fixed. With `compare_full` a full refit on the same data is
+        also timed (not activated) and compared against the incremental model.
+        """
+        report = progress or (lambda **fields: None)
+        base = self.get_active_model().model
+        new_trees = new_trees or settings.INCREMENTAL_NEW_TREES
+
+        report(state="loading")
+        training_set = self._fetch_training_data(
+            use_corrected_labels,
+            progress=lambda rows: report(samples_loaded=rows),
+            **(data_options or {})
+        )
+        try:
+            X = training_set.X
+            report(state="fitting", samples_loaded=len(X), trees_fitted=0, trees_total=new_trees)
+
+            started = time.perf_counter()
+            model = fit_rolling(base, X, new_trees, contamination)
+            incremental_seconds = time.perf_counter() - started
+            report(trees_fitted=new_trees)
 
-        # Deactivate all old models
-        db.execute_query("UPDATE models SET is_active = FALSE")
+            comparison: Dict[str, Any] = {
+                "mode": "incremental",
+                "trees_replaced": new_trees,
+                "ensemble_size": len(model.estimators_),
+                "rolling_updates": model.rolling_updates_,
+                "incremental_fit_seconds": round(incremental_seconds, 4),
+                "vs_previous_model": compare_models(base, model, X),
+            }
+            if compare_full:
+                started = time.perf_counter()
+                full = IsolationForest(
+                    contamination=model.contamination,
+                    n_estimators=len(model.estimators_),
+                    max_samples=base.max_samples,
+                    random_state=42,
+                    n_jobs=-1
+                ).fit(X)
+                full_seconds = time.perf_counter() - started
+                comparison.update({
+                    "full_fit_seconds": round(full_seconds, 4),
+                    "speedup": round(full_seconds / incremental_seconds, 2) if incremental_seconds else None,
+                    "vs_full_refit": compare_models(full, model, X),
+                })
+        finally:
+            training_set.discard()
+
+        # A rolling forest is updated again later, which needs its estimator (unless explicitly disabled)
+        include_estimator = settings.MODEL_ARTIFACT_INCLUDE_ESTIMATOR != "false"
+        return {
+            "model": model,
+            "model_data": export_artifact(model, include_estimator=include_estimator),
+            "training_samples": len(X),
+            "data_loading": training_set.stats(),
+            "comparison": comparison,
+        }
+
+   def activate_model(self, model_data: bytes, model_version: str, training_samples: int,
+                      model: Any = None) -> datetime:
+        """
+        Store an exported model artifact as the only active one and swap it in.
+        Deactivation and insert commit in one transaction; in memory the new
+        model replaces the old one with a single reference assignment, so
+        scoring never waits for it.
+        """
+        # DATETIME columns drop microseconds; keep the stamp identical to what is stored
+        training_date = datetime.now().replace(microsecond=0)
 
-        # Insert new active model
         insert_query = """
             INSERT INTO models (model_version, model_data, training_date, training_samples, is_active)
             VALUES (%s, %s, %s, %s, %s)
         """
-        db.execute_query(insert_query, (
-            model_version,
-            model_data,
-            datetime.now(),
-            len(training_data),
-            True
-        ))
+        with db.transaction() as cursor:
+            # Deactivate all old models
+            cursor.execute("UPDATE models SET is_active = FALSE WHERE is_active = TRUE")
+            # Insert new active model
+            cursor.execute(insert_query, (
+                model_version,
+                model_data,
+                training_date,
+                training_samples,
+                True
+            ))
 
         # Update in-memory model
-        self.model = model
-        self.model_version = model_version
+        self.registry.activate(model_data, model_version, (model_version, training_date), model)
+        try:
+            self.registry.prune()
+        except Exception as e:
+            logger.warning("Could not prune model artifacts: %s", e)
+        return training_date
 
-        return {
+   @staticmethod
+   def training_summary(model_version: str, fitted: Dict[str, Any], duration: float) -> Dict[str, Any]:
+        summary = {
             "success": True,
             "model_version": model_version,
-            "training_samples": len(training_data),
+            "training_samples": fitted["training_samples"],
             "training_duration_seconds": round(duration, 2),
+            "data_loading": fitted["data_loading"],
             "message": "Model trained and activated successfully"
         }
+        if "comparison" in fitted:
+            summary["comparison"] = fitted["comparison"]
+        return summary
 
-   def retrain_model(self, new_model_version: str) -> Dict[str, Any]:
-        """Retrain model using corrected user labels."""
-        old_version = self.model_version or "none"
-
+   def count_corrected_labels(self) -> int:
+        """Number of analyzed requests with a user-corrected label; retraining needs at least 10."""
         count_query = "SELECT COUNT(*) as count FROM analyzed_requests WHERE user_label IS NOT NULL"
         result = db.fetch_one(count_query)
         corrected_count = result["count"] if result else 0
+        # Archived rows keep their labels and are part of the training data too
+        corrected_count += request_archive.count(AuditFilters(has_user_label=True))
 
         if corrected_count < 10:
             raise ValueError(f"Insufficient corrected labels. Need at least 10, got {corrected_count}")
+        return corrected_count
+
+   def retrain_model(self, new_model_version: str) -> Dict[str, Any]:
+        """Retrain model using corrected user labels."""
+        old_version = self.model_version or "none"
+        corrected_count = self.count_corrected_labels()
 
         training_result = self.train_model(
             model_version=new_model_version,
             use_corrected_labels=True
         )
 
+        return self.retraining_summary(old_version, new_model_version, training_result, corrected_count)
+
+   @staticmethod
+   def retraining_summary(old_version: str, new_model_version: str, training_result: Dict[str, Any],
+                          corrected_count: int) -> Dict[str, Any]:
         return {
             "success": True,
             "old_model_version": old_version,
             "new_model_version": new_model_version,
             "training_samples": training_result["training_samples"],
             "corrected_labels_used": corrected_count,
+            "comparison": training_result.get("comparison"),
             "message": "Model successfully retrained with user feedback"
         }
 
-   def _fetch_training_data(self, use_corrected_labels: bool) -> List[List[float]]:
-        """Fetch feature vectors from past analyzed requests."""
-        if use_corrected_labels:
-            query = """
-                SELECT 
-                    ip_reputation_score, payload_complexity_score, 
-                    header_anomaly_score, endpoint_risk_score, frequency_score
-                FROM analyzed_requests
-                WHERE user_label IS NOT NULL OR is_anomaly IS NOT NULL
-                ORDER BY analyzed_at DESC
-                LIMIT 10000
-            """
-        else:
-            query = """
-                SELECT 
-                    ip_reputation_score, payload_complexity_score, 
-                    header_anomaly_score, endpoint_risk_score, frequency_score
-                FROM analyzed_requests
-                WHERE is_anomaly IS NOT NULL
-                ORDER BY analyzed_at DESC
-                LIMIT 10000
-            """
-
-        results = db.fetch_all(query)
-        training_data = [
-            [
-                row["ip_reputation_score"],
-                row["payload_complexity_score"],
-                row["header_anomaly_score"],
-                row["endpoint_risk_score"],
-                row["frequency_score"]
-            ]
-            for row in results
-        ]
-        return training_data
+   def _fetch_training_data(self, use_corrected_labels: bool, progress: Optional[Callable[[int], None]] = None,
+                            **options) -> TrainingSet:
+        """Stream feature vectors from past analyzed requests into a float32 matrix in FEATURE_COLUMNS order."""
+        return load_training_data(use_corrected_labels, progress=progress, **options)
 
 
 # Global singleton instanc
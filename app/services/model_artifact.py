@@ -0,0 +1,273 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import sklearn
+
+from app.config import settings
+from app.services.feature_schema import FEATURE_COLUMNS, check_schema
+from app.services.forest_compiler import CompiledForest, compile_forest
+
+# File layout: MAGIC | uint32 header length | JSON header | padding | aligned array blobs [| estimator pickle]
+MAGIC = b"IFSA\x00\x01\r\n"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sI")
+_ALIGN = 64
+
+# CompiledForest node arrays and their on-disk dtypes (int32 ids keep the artifact compact)
+_FOREST_ARRAYS = (
+    ("feature", np.int32),
+    ("threshold", np.float64),
+    ("left", np.int32),
+    ("right", np.int32),
+    ("leaf_value", np.float64),
+    ("roots", np.int32),
+)
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def is_artifact(data: Buffer) -> bool:
+    """True for artifact bytes, False for legacy pickled models."""
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class ModelArtifact:
+    """
+    A loaded model artifact: the header, the compiled forest viewing the
+    array blobs in place (no copies) and, optionally, the sklearn estimator
+    as an embedded pickle that is only deserialized on demand.
+
+    When opened from a file the buffer is a read-only mmap, so every process
+    that maps the same file shares its pages through the OS page cache.
+    """
+
+    def __init__(self, header: Dict[str, Any], buffer: Buffer, forest: Optional[CompiledForest],
+                 path: Optional[str] = None):
+        self.header = header
+        self.buffer = buffer
+        self.forest = forest
+        self.path = path
+
+    @property
+    def has_estimator(self) -> bool:
+        return self.header.get("estimator") is not None
+
+    @property
+    def size(self) -> int:
+        return len(self.buffer)
+
+    def load_estimator(self) -> Any:
+        """Unpickle the embedded sklearn estimator."""
+        entry = self.header.get("estimator")
+        if entry is None:
+            raise ValueError(
+                "Model artifact was exported without the sklearn estimator; retrain with "
+                "MODEL_ARTIFACT_INCLUDE_ESTIMATOR=true to use the sklearn engine or incremental retraining"
+            )
+        start = self.header["data_offset"] + entry["offset"]
+        try:
+            return pickle.loads(memoryview(self.buffer)[start:start + entry["length"]])
+        except Exception as e:
+            raise ValueError(
+                f"Could not load the embedded estimator (exported with scikit-learn "
+                f"{self.header['sklearn_version']}, running {sklearn.__version__}): {e}"
+            )
+
+    def check_schema(self):
+        check_schema(self.header["feature_schema_version"], self.header["feature_columns"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "format_version": self.header["format_version"],
+            "bytes": self.size,
+            "memory_mapped": self.path is not None,
+            "path": self.path,
+            "sklearn_version": self.header["sklearn_version"],
+            "has_estimator": self.has_estimator,
+            "n_trees": self.header["forest"]["n_trees"] if self.header.get("forest") else None,
+        }
+
+
+def embeds_estimator() -> bool:
+    """Whether artifacts embed the estimator by default (MODEL_ARTIFACT_INCLUDE_ESTIMATOR)."""
+    mode = settings.MODEL_ARTIFACT_INCLUDE_ESTIMATOR
+    if mode == "auto":
+        return settings.SCORING_ENGINE == "sklearn"
+    return mode == "true"
+
+
+def export_artifact(model: Any, forest: Optional[CompiledForest] = None,
+                    include_estimator: Optional[bool] = None) -> bytes:
+    """
+    Serialize a fitted IsolationForest into the artifact format.
+
+    The forest is compiled (and verified against sklearn) unless given. The
+    estimator pickle is embedded when `include_estimator` is true (default:
+    embeds_estimator()), and regardless of it if the forest cannot be
+    compiled, since the sklearn engine is then the only way to score.
+    """
+    if include_estimator is None:
+        include_estimator = embeds_estimator()
+    if forest is None:
+        forest = compile_forest(model)
+    if forest is None:
+        include_estimator = True
+
+    blobs = []
+    offset = 0
+
+    def add(data: bytes) -> int:
+        nonlocal offset
+        start = offset
+        blobs.append(data)
+        offset += len(data)
+        padding = -offset % _ALIGN
+        blobs.append(b"\0" * padding)
+        offset += padding
+        return start
+
+    header: Dict[str, Any] = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "feature_schema_version": getattr(model, "feature_schema_version_", 1),   # untagged = pre-versioning
+        "feature_columns": list(getattr(model, "feature_columns_", FEATURE_COLUMNS)),
+        "sklearn_version": sklearn.__version__,
+        "numpy_version": np.__version__,
+        "contamination": model.contamination,
+        "forest": None,
+        "arrays": {},
+        "estimator": None,
+    }
+    if forest is not None:
+        header["forest"] = {
+            "n_trees": forest.n_trees,
+            "max_depth": forest.max_depth,
+            "n_features": forest.n_features,
+            "max_samples": float(forest.max_samples),
+            "offset": forest.offset,
+        }
+        for name, dtype in _FOREST_ARRAYS:
+            array = np.ascontiguousarray(getattr(forest, name), dtype=dtype)
+            header["arrays"][name] = {
+                "dtype": np.dtype(dtype).str,
+                "shape": list(array.shape),
+                "offset": add(array.tobytes()),
+            }
+    if include_estimator:
+        data = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        header["estimator"] = {"offset": add(data), "length": len(data)}
+
+    # The data section starts at the first aligned offset after the header
+    encoded = json.dumps(header).encode("utf-8")
+    data_offset = _aligned(_PREFIX.size + len(encoded) + 32)
+    header["data_offset"] = data_offset
+    encoded = json.dumps(header).encode("utf-8").ljust(data_offset - _PREFIX.size, b" ")
+    if len(encoded) != data_offset - _PREFIX.size:
+        raise RuntimeError("Artifact header does not fit its reserved space")
+
+    return b"".join([_PREFIX.pack(MAGIC, len(encoded)), encoded] + blobs)
+
+
+def load_artifact(buffer: Buffer, path: Optional[str] = None) -> ModelArtifact:
+    """Parse an artifact from bytes or an mmap; arrays are zero-copy views of `buffer`."""
+    magic, header_length = _PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a model artifact")
+    header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_length]))
+    if header["format_version"] > FORMAT_VERSION:
+        raise ValueError(f"Model artifact format v{header['format_version']} is newer than supported v{FORMAT_VERSION}")
+
+    forest = None
+    if header.get("forest"):
+        arrays = {}
+        for name, entry in header["arrays"].items():
+            dtype = np.dtype(entry["dtype"])
+            count = int(np.prod(entry["shape"]))
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=header["data_offset"] + entry["offset"]
+            ).reshape(entry["shape"])
+        info = header["forest"]
+        forest = CompiledForest(
+            max_depth=info["max_depth"],
+            n_features=info["n_features"],
+            max_samples=info["max_samples"],
+            offset=info["offset"],
+            **arrays,
+        )
+    return ModelArtifact(header, buffer, forest, path)
+
+
+def open_artifact(path: str) -> ModelArtifact:
+    """Memory-map an artifact file read-only."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return load_artifact(buffer, path)
+
+
+def store_artifact(data: bytes, model_version: str, directory: str = settings.MODEL_ARTIFACT_DIR) -> str:
+    """
+    Write artifact bytes to `directory` under a content-addressed name and
+    return the path. Existing files are reused; new ones appear atomically.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    safe_version = _safe_version(model_version)
+    path = os.path.join(directory, f"{safe_version}-{digest}.ifsa")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+def prune_artifacts(keep_versions: Iterable[str], keep_paths: Iterable[str],
+                    directory: str = settings.MODEL_ARTIFACT_DIR, min_age: float = 3600.0) -> List[str]:
+    """
+    Delete artifact files that belong to none of `keep_versions` (model_version
+    values) and are not in `keep_paths`, plus abandoned temporary files.
+    Files modified within `min_age` seconds are left alone, since another
+    worker may be about to map them. Processes that still map a deleted file
+    keep their pages until they unmap it. Returns the deleted paths.
+    """
+    keep_names = {_safe_version(version) for version in keep_versions}
+    keep = {os.path.abspath(path) for path in keep_paths}
+    cutoff = time.time() - min_age
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    deleted = []
+    for name in names:
+        path = os.path.join(directory, name)
+        if name.endswith(".ifsa"):
+            if os.path.abspath(path) in keep or name[:-len(".ifsa")].rsplit("-", 1)[0] in keep_names:
+                continue
+        elif not name.endswith(".tmp"):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                deleted.append(path)
+        except FileNotFoundError:
+            pass   # pruned concurrently by another worker
+    return deleted
+
+
+def _safe_version(model_version: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", model_version)
+
+
+def _aligned(n: int) -> int:
+    return n + (-n % _ALIGN)
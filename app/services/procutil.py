@@ -0,0 +1,12 @@
+import os
+
+
+def process_alive(pid: int) -> bool:
+    """True if a process with this pid exists on the host (owners of spill and job status files)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass   # exists, owned by another user
+    return True
@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Window:
+    """Ring buffer of per-bucket request counts for one IP."""
+    __slots__ = ("counts", "last_bucket", "total")
+
+    def __init__(self, n_buckets: int, bucket: int):
+        self.counts = [0] * n_buckets
+        self.last_bucket = bucket
+        self.total = 0
+
+
+class RateTracker:
+    """
+    Per-IP sliding-window request counter with bounded memory.
+
+    Each IP owns a ring of `window_seconds / bucket_seconds` counters plus a
+    running total. Recording a request advances the ring (clearing only the
+    buckets that expired since the IP was last seen, so the cost is amortized
+    O(1)) and increments the current bucket. IPs are kept in LRU order: idle
+    IPs whose whole window has expired are evicted from the front on every
+    hit, and the least recently seen IP is evicted once `max_ips` is reached.
+    """
+
+    blocking = False   # hits never leave the process, safe to call on the event loop
+
+    def __init__(
+        self,
+        window_seconds: float = settings.RATE_WINDOW_SECONDS,
+        bucket_seconds: float = settings.RATE_BUCKET_SECONDS,
+        max_ips: int = settings.RATE_TRACKER_MAX_IPS,
+    ):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, int(round(window_seconds / bucket_seconds)))
+        self.max_ips = max_ips
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._evictions = 0
+
+    def hit(self, ip_address: str, now: Optional[float] = None) -> int:
+        """Record one request and return the IP's request count in the window (including it)."""
+        bucket = int((time.time() if now is None else now) // self.bucket_seconds)
+        n_buckets = self.n_buckets
+
+        with self._lock:
+            self._hits += 1
+            windows = self._windows
+            window = windows.get(ip_address)
+            if window is None:
+                window = _Window(n_buckets, bucket)
+                windows[ip_address] = window
+                self._evict(bucket)
+            else:
+                windows.move_to_end(ip_address)
+                self._advance(window, bucket)
+
+            window.counts[bucket % n_buckets] += 1
+            window.total += 1
+            return window.total
+
+    def hit_many(self, ip_addresses: Sequence[str], now: Optional[float] = None) -> List[int]:
+        """Record one request per entry (in order) and return each IP's window count after it."""
+        now = time.time() if now is None else now
+        return [self.hit(ip_address, now) for ip_address in ip_addresses]
+
+    def count(self, ip_address: str, now: Optional[float] = None) -> int:
+        """Requests seen from `ip_address` in the current window (does not record a hit)."""
+        bucket = int((time.time() if now is None else now) // self.bucket_seconds)
+        with self._lock:
+            window = self._windows.get(ip_address)
+            if window is None:
+                return 0
+            self._advance(window, bucket)
+            return window.total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "tracked_ips": len(self._windows),
+            "max_ips": self.max_ips,
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "hits": self._hits,
+            "evictions": self._evictions,
+        }
+
+    def _advance(self, window: _Window, bucket: int):
+        elapsed = bucket - window.last_bucket
+        if elapsed <= 0:
+            return
+        if elapsed >= self.n_buckets:
+            window.counts = [0] * self.n_buckets
+            window.total = 0
+        else:
+            counts = window.counts
+            for b in range(window.last_bucket + 1, bucket + 1):
+                slot = b % self.n_buckets
+                window.total -= counts[slot]
+                counts[slot] = 0
+        window.last_bucket = bucket
+
+    def _evict(self, bucket: int):
+        windows = self._windows
+        # Drop IPs at the cold end whose whole window has expired (at most two per hit)
+        for _ in range(2):
+            oldest_ip = next(iter(windows))
+            if bucket - windows[oldest_ip].last_bucket < self.n_buckets:
+                break
+            del windows[oldest_ip]
+            self._evictions += 1
+        while len(windows) > self.max_ips:
+            windows.popitem(last=False)
+            self._evictions += 1
+
+
+class RedisRateTracker:
+    """
+    Sliding-window counter shared by all workers through a Redis-compatible server.
+
+    Every (IP, bucket) pair is one key that expires after the window, so a
+    single pipelined round trip of INCR + EXPIRE + MGET per IP records the
+    hits of a whole batch and reads their windows. Calls block on the network,
+    so callers on the event loop run them in an executor (see `blocking`).
+    If the server fails, the local in-memory tracker is used instead and
+    Redis is left alone for `backoff_seconds` before it is tried again.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        url: str = settings.RATE_TRACKER_REDIS_URL,
+        window_seconds: float = settings.RATE_WINDOW_SECONDS,
+        bucket_seconds: float = settings.RATE_BUCKET_SECONDS,
+        backoff_seconds: float = settings.RATE_TRACKER_REDIS_BACKOFF_SECONDS,
+        key_prefix: str = "ifs:rate:",
+    ):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, int(round(window_seconds / bucket_seconds)))
+        self.backoff_seconds = backoff_seconds
+        self.key_prefix = key_prefix
+        self.fallback = RateTracker(window_seconds, bucket_seconds)
+        self._errors = 0
+        self._skipped = 0
+        self._retry_at = 0.0   # time.monotonic() before which Redis is not tried
+
+    def hit(self, ip_address: str, now: Optional[float] = None) -> int:
+        return self.hit_many([ip_address], now)[0]
+
+    def hit_many(self, ip_addresses: Sequence[str], now: Optional[float] = None) -> List[int]:
+        """Record one request per entry and return each IP's window count, in one round trip."""
+        if not ip_addresses:
+            return []
+        if time.monotonic() < self._retry_at:
+            self._skipped += len(ip_addresses)
+            return self.fallback.hit_many(ip_addresses, now)
+
+        bucket = int((time.time() if now is None else now) // self.bucket_seconds)
+        ttl = int(self.window_seconds + self.bucket_seconds)
+        earlier = range(bucket - self.n_buckets + 1, bucket)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for ip_address in ip_addresses:
+                prefix = f"{self.key_prefix}{ip_address}:"
+                pipe.incr(f"{prefix}{bucket}")
+                pipe.expire(f"{prefix}{bucket}", ttl)
+                pipe.mget([f"{prefix}{b}" for b in earlier])
+            replies = pipe.execute()
+        except Exception as e:
+            if self._errors == 0:
+                logger.warning("Rate tracker Redis unavailable, counting locally for %gs: %s", self.backoff_seconds, e)
+            self._errors += 1
+            self._retry_at = time.monotonic() + self.backoff_seconds
+            return self.fallback.hit_many(ip_addresses, now)
+
+        # Each INCR reply already includes the hits recorded before it in this pipeline
+        return [
+            int(replies[i]) + sum(int(v) for v in replies[i + 2] if v is not None)
+            for i in range(0, len(replies), 3)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "redis_errors": self._errors,
+            "redis_skipped_hits": self._skipped,
+            "redis_backing_off": time.monotonic() < self._retry_at,
+            "fallback": self.fallback.stats(),
+        }
+
+
+def create_rate_tracker():
+    if settings.RATE_TRACKER_BACKEND == "redis":
+        return RedisRateTracker()
+    return RateTracker()
+
+
+def frequency_score(request_count: int) -> float:
+    """Map a window request count to 0.0 (rare) → 1.0 (at or above the saturation rate)."""
+    return min(request_count / settings.RATE_SATURATION_COUNT, 1.0)
+
+
+# Global per-IP tracker (per process unless the redis backend is configured)
+rate_tracker = create_rate_tracker()
@@ -0,0 +1,432 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+# Counter columns of the rollup tables, in the order of the in-memory delta lists
+COUNTERS = (
+    "requests",
+    "anomalies",
+    "confidence_sum",
+    "corrections",
+    "false_positives_corrected",
+    "false_negatives_corrected",
+)
+
+# Confidence histogram: equal-width bins over [HISTOGRAM_MIN, HISTOGRAM_MAX), edges clamp.
+# Must match the backfill in migrations/003_timeseries_rollups.sql.
+HISTOGRAM_MIN = -0.5
+HISTOGRAM_MAX = 0.5
+HISTOGRAM_BINS = 50
+_BIN_WIDTH = (HISTOGRAM_MAX - HISTOGRAM_MIN) / HISTOGRAM_BINS
+
+PERCENTILES = (50, 90, 99)
+
+# Timeseries bucket sizes: (rollup table resolution, bucket length)
+BUCKETS = {
+    "1m": ("minutely", timedelta(minutes=1)),
+    "1h": ("hourly", timedelta(hours=1)),
+    "1d": ("hourly", timedelta(days=1)),
+}
+
+
+def _upsert_counters(table: str, dialect: str) -> str:
+    insert = f"""
+        INSERT INTO {table} (bucket_start, model_version, {", ".join(COUNTERS)})
+        VALUES ({", ".join(["%s"] * (2 + len(COUNTERS)))})
+    """
+    if dialect == "sqlite":
+        return insert + f"""
+        ON CONFLICT (bucket_start, model_version)
+        DO UPDATE SET {", ".join(f"{name} = {name} + excluded.{name}" for name in COUNTERS)}
+    """
+    return insert + f"""
+        ON DUPLICATE KEY UPDATE {", ".join(f"{name} = {name} + VALUES({name})" for name in COUNTERS)}
+    """
+
+
+def _upsert_histogram(table: str, dialect: str) -> str:
+    insert = f"""
+        INSERT INTO {table} (bucket_start, model_version, bin, requests)
+        VALUES (%s, %s, %s, %s)
+    """
+    if dialect == "sqlite":
+        return insert + """
+        ON CONFLICT (bucket_start, model_version, bin) DO UPDATE SET requests = requests + excluded.requests
+    """
+    return insert + """
+        ON DUPLICATE KEY UPDATE requests = requests + VALUES(requests)
+    """
+
+
+UPSERT_MINUTELY = _upsert_counters("request_stats_minutely", db.dialect)
+UPSERT_HOURLY = _upsert_counters("request_stats_hourly", db.dialect)
+UPSERT_HISTOGRAM_MINUTELY = _upsert_histogram("confidence_histogram_minutely", db.dialect)
+UPSERT_HISTOGRAM_HOURLY = _upsert_histogram("confidence_histogram_hourly", db.dialect)
+
+TOTALS_QUERY = f"""
+    SELECT {", ".join(f"COALESCE(SUM({name}), 0) AS {name}" for name in COUNTERS)}
+    FROM request_stats_hourly
+"""
+
+ACTIVE_MODEL_QUERY = """
+    SELECT model_version, training_date, training_samples, accuracy_score
+    FROM models WHERE is_active = TRUE LIMIT 1
+"""
+
+Key = Tuple[datetime, str]
+
+
+def _minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+def _hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+_TRUNCATE = {"1m": _minute, "1h": _hour, "1d": _day}
+
+
+def _bin(confidence: float) -> int:
+    return min(max(int(math.floor((confidence - HISTOGRAM_MIN) / _BIN_WIDTH)), 0), HISTOGRAM_BINS - 1)
+
+
+def histogram_percentile(bins: Sequence[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) of a confidence histogram, interpolated linearly within its bin."""
+    total = sum(bins)
+    if total <= 0:
+        return None
+    rank = total * q / 100.0
+    seen = 0.0
+    for i, count in enumerate(bins):
+        if count and seen + count >= rank:
+            fraction = (rank - seen) / count
+            return round(HISTOGRAM_MIN + (i + fraction) * _BIN_WIDTH, 4)
+        seen += count
+    return HISTOGRAM_MAX
+
+
+def _corrections(is_anomaly: bool, user_label: Optional[bool]) -> Tuple[int, int, int]:
+    """(corrected, false positive corrected, false negative corrected) for one row's label state."""
+    if user_label is None:
+        return 0, 0, 0
+    return 1, int(is_anomaly and not user_label), int(not is_anomaly and user_label)
+
+
+class RequestStatistics:
+    """
+    Pre-aggregated request statistics.
+
+    Every persisted analysis result and every label change updates running
+    counters in memory, keyed by (minute, model_version), together with a
+    histogram of confidences. A background thread adds them to the minute and
+    hourly rollup tables every `flush_interval` seconds, one upsert per key,
+    all in one transaction. /statistics sums the hourly table (a few rows per
+    hour) at most once per `max_staleness` seconds and otherwise answers from
+    memory: the cached totals plus this process's counters that have not been
+    flushed yet. Counts of this process are therefore always current; those
+    of other workers lag by at most flush_interval + max_staleness.
+    /statistics/timeseries reads the rollups for the requested range and adds
+    the unflushed counters the same way.
+    """
+
+    def __init__(self, flush_interval: float = settings.STATS_FLUSH_INTERVAL_SECONDS,
+                 max_staleness: float = settings.STATS_MAX_STALENESS_SECONDS,
+                 minute_retention_hours: float = settings.STATS_MINUTE_RETENTION_HOURS):
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self.minute_retention = timedelta(hours=minute_retention_hours)
+
+        self._pending: Dict[Key, List[float]] = {}
+        self._pending_bins: Dict[Key, List[int]] = {}
+        self._lock = threading.Lock()          # guards _pending and _totals
+        self._io_lock = threading.Lock()       # one flush or totals read at a time
+        self._totals: Optional[Dict[str, float]] = None
+        self._active_model: Optional[Dict[str, Any]] = None
+        self._refreshed = 0.0
+        self._next_purge = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics
+        self._flushes = 0
+        self._flush_failures = 0
+        self._flushed_keys = 0
+        self._refreshes = 0
+        self._purged_rows = 0
+
+    # ==============================================================
+    # Lifecycle
+    # ==============================================================
+
+    def start(self):
+        """Start the flusher thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stats-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher thread and write out the remaining counters."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    # ==============================================================
+    # Recording
+    # ==============================================================
+
+    def record_requests(self, results: Iterable[Tuple[datetime, str, bool, float]]):
+        """Count persisted analysis results given as (analyzed_at, model_version, is_anomaly, confidence)."""
+        with self._lock:
+            for analyzed_at, model_version, is_anomaly, confidence in results:
+                key = (_minute(analyzed_at), model_version or "")
+                counters = self._counters(key)
+                counters[0] += 1
+                counters[1] += 1 if is_anomaly else 0
+                counters[2] += confidence
+                bins = self._pending_bins.get(key)
+                if bins is None:
+                    bins = self._pending_bins[key] = [0] * HISTOGRAM_BINS
+                bins[_bin(confidence)] += 1
+
+    def record_label(self, analyzed_at: datetime, model_version: Optional[str], is_anomaly: bool,
+                     old_label: Optional[bool], new_label: Optional[bool]):
+        """Apply a label change of one analyzed request to the correction counters."""
+        before = _corrections(is_anomaly, old_label)
+        after = _corrections(is_anomaly, new_label)
+        if before == after:
+            return
+        with self._lock:
+            counters = self._counters((_minute(analyzed_at), model_version or ""))
+            for i, (old, new) in enumerate(zip(before, after), start=3):
+                counters[i] += new - old
+
+    # ==============================================================
+    # Reading
+    # ==============================================================
+
+    def is_stale(self) -> bool:
+        return self._totals is None or time.monotonic() - self._refreshed > self.max_staleness
+
+    def refresh(self):
+        """Re-read the rollup totals and the active model (blocking; a few small queries)."""
+        with self._io_lock:
+            totals = db.fetch_one(TOTALS_QUERY) or {}
+            active_model = db.fetch_one(ACTIVE_MODEL_QUERY)
+            with self._lock:
+                self._totals = {name: float(totals.get(name) or 0) for name in COUNTERS}
+                self._active_model = active_model
+                self._refreshed = time.monotonic()
+            self._refreshes += 1
+
+    def totals(self) -> Dict[str, float]:
+        """Rollup totals as of the last refresh plus this process's unflushed counters."""
+        with self._lock:
+            totals = dict(self._totals or {name: 0.0 for name in COUNTERS})
+            for counters in self._pending.values():
+                for name, value in zip(COUNTERS, counters):
+                    totals[name] += value
+        return totals
+
+    @property
+    def active_model(self) -> Optional[Dict[str, Any]]:
+        return self._active_model
+
+    def timeseries(self, bucket: str, start: datetime, end: datetime,
+                   model_version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Per-bucket request counts, anomaly rate, confidence percentiles and
+        label corrections for buckets starting in [start, end) (blocking).
+        Only buckets with data are returned, oldest first.
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket '{bucket}'. Use one of {list(BUCKETS)}")
+        resolution, length = BUCKETS[bucket]
+        truncate = _TRUNCATE[bucket]
+        start = truncate(start)
+        if end <= start:
+            raise ValueError("'to' must be after 'from'")
+        if (end - start) / length > settings.STATS_TIMESERIES_MAX_POINTS:
+            raise ValueError(
+                f"Range spans more than {settings.STATS_TIMESERIES_MAX_POINTS} {bucket} buckets; "
+                f"use a larger bucket or a shorter range"
+            )
+        if resolution == "minutely" and start < datetime.utcnow() - self.minute_retention:
+            raise ValueError(
+                f"Minute buckets are kept for {self.minute_retention.total_seconds() / 3600:g} hours; "
+                f"use bucket=1h for older ranges"
+            )
+
+        where = "bucket_start >= %s AND bucket_start < %s"
+        params: List[Any] = [start, end]
+        if model_version is not None:
+            where += " AND model_version = %s"
+            params.append(model_version)
+
+        counters: Dict[datetime, List[float]] = defaultdict(lambda: [0.0] * len(COUNTERS))
+        bins: Dict[datetime, List[float]] = defaultdict(lambda: [0.0] * HISTOGRAM_BINS)
+        # Rows come at the rollup resolution; 1d buckets are summed from hours here
+        for row in db.fetch_all(
+            f"SELECT bucket_start, {', '.join(COUNTERS)} FROM request_stats_{resolution} WHERE {where}",
+            tuple(params)
+        ):
+            merged = counters[truncate(row["bucket_start"])]
+            for i, name in enumerate(COUNTERS):
+                merged[i] += float(row[name])
+        for row in db.fetch_all(
+            f"SELECT bucket_start, bin, requests FROM confidence_histogram_{resolution} WHERE {where}",
+            tuple(params)
+        ):
+            bins[truncate(row["bucket_start"])][row["bin"]] += row["requests"]
+
+        # Add what this process has counted but not flushed yet
+        with self._lock:
+            for (minute, version), pending in self._pending.items():
+                if start <= minute < end and (model_version is None or version == model_version):
+                    merged = counters[truncate(minute)]
+                    for i, value in enumerate(pending):
+                        merged[i] += value
+                    for i, value in enumerate(self._pending_bins.get((minute, version), ())):
+                        bins[truncate(minute)][i] += value
+
+        points = []
+        for bucket_start in sorted(counters):
+            values = dict(zip(COUNTERS, counters[bucket_start]))
+            requests = int(values["requests"])
+            point = {
+                "bucket_start": bucket_start,
+                "requests": requests,
+                "anomalies": int(values["anomalies"]),
+                "anomaly_rate": round(values["anomalies"] / requests, 4) if requests else 0.0,
+                "average_confidence": round(values["confidence_sum"] / requests, 4) if requests else None,
+                "label_corrections": int(values["corrections"]),
+                "false_positives_corrected": int(values["false_positives_corrected"]),
+                "false_negatives_corrected": int(values["false_negatives_corrected"]),
+            }
+            for q in PERCENTILES:
+                point[f"confidence_p{q}"] = histogram_percentile(bins.get(bucket_start, ()), q)
+            if requests or point["label_corrections"]:
+                points.append(point)
+        return points
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_keys": len(self._pending),
+            "flush_interval_seconds": self.flush_interval,
+            "max_staleness_seconds": self.max_staleness,
+            "totals_age_seconds": round(time.monotonic() - self._refreshed, 3) if self._totals else None,
+            "flushes": self._flushes,
+            "flush_failures": self._flush_failures,
+            "flushed_keys": self._flushed_keys,
+            "refreshes": self._refreshes,
+            "purged_minute_rows": self._purged_rows,
+        }
+
+    # ==============================================================
+    # Flushing
+    # ==============================================================
+
+    def flush(self):
+        """Add the pending counters to the minute and hourly rollups (one transaction)."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                pending_bins, self._pending_bins = self._pending_bins, {}
+            if not pending:
+                return
+
+            hourly: Dict[Key, List[float]] = defaultdict(lambda: [0] * len(COUNTERS))
+            hourly_bins: Dict[Key, List[int]] = defaultdict(lambda: [0] * HISTOGRAM_BINS)
+            for (minute, version), counters in pending.items():
+                merged = hourly[(_hour(minute), version)]
+                for i, value in enumerate(counters):
+                    merged[i] += value
+            for (minute, version), minute_bins in pending_bins.items():
+                merged = hourly_bins[(_hour(minute), version)]
+                for i, value in enumerate(minute_bins):
+                    merged[i] += value
+
+            try:
+                with db.transaction() as cursor:
+                    cursor.executemany(UPSERT_MINUTELY, _counter_rows(pending))
+                    cursor.executemany(UPSERT_HOURLY, _counter_rows(hourly))
+                    if pending_bins:
+                        cursor.executemany(UPSERT_HISTOGRAM_MINUTELY, _histogram_rows(pending_bins))
+                        cursor.executemany(UPSERT_HISTOGRAM_HOURLY, _histogram_rows(hourly_bins))
+            except Exception as e:
+                self._flush_failures += 1
+                logger.error("Flushing request statistics failed, will retry: %s", e)
+                with self._lock:
+                    for key, counters in pending.items():
+                        merged = self._counters(key)
+                        for i, value in enumerate(counters):
+                            merged[i] += value
+                    for key, minute_bins in pending_bins.items():
+                        merged = self._pending_bins.setdefault(key, [0] * HISTOGRAM_BINS)
+                        for i, value in enumerate(minute_bins):
+                            merged[i] += value
+                return
+
+            with self._lock:
+                # The cached totals were read before this flush; keep them in step without a re-read
+                if self._totals is not None:
+                    for counters in pending.values():
+                        for name, value in zip(COUNTERS, counters):
+                            self._totals[name] += value
+            self._flushes += 1
+            self._flushed_keys += len(pending)
+
+    def purge(self):
+        """Delete minute rollups older than the retention (hourly rows are kept)."""
+        cutoff = _minute(datetime.utcnow() - self.minute_retention)
+        for table in ("request_stats_minutely", "confidence_histogram_minutely"):
+            cursor = db.execute_query(f"DELETE FROM {table} WHERE bucket_start < %s", (cutoff,))
+            self._purged_rows += max(cursor.rowcount, 0)
+
+    def _counters(self, key: Key) -> List[float]:
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = [0] * len(COUNTERS)
+        return counters
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + 600
+                try:
+                    self.purge()
+                except Exception as e:
+                    logger.warning("Purging minute statistics failed: %s", e)
+
+
+def _counter_rows(counters: Dict[Key, List[float]]) -> List[tuple]:
+    return [(bucket, version, *values) for (bucket, version), values in counters.items()]
+
+
+def _histogram_rows(histograms: Dict[Key, List[int]]) -> List[tuple]:
+    return [
+        (bucket, version, i, count)
+        for (bucket, version), bins in histograms.items()
+        for i, count in enumerate(bins) if count
+    ]
+
+
+# Global statistics counters
+request_stats = RequestStatistics()
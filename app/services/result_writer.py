@@ -0,0 +1,386 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.config import settings
+from app.database import TRANSIENT_ERRORS, db
+from app.services.feature_schema import FEATURE_SCHEMA_VERSION, FEATURE_SELECT, N_FEATURES
+from app.services.procutil import process_alive
+from app.services.request_stats import request_stats
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop", "spill")
+
+# Feature columns come from the feature schema, in the same order as the rows of X
+# Rows are stamped with the feature schema they were extracted with (a constant, not a row field)
+INSERT_ANALYZED_REQUEST = f"""
+    INSERT INTO analyzed_requests (
+        request_id, ip_address, endpoint, http_method,
+        payload_size, headers_json,
+        {FEATURE_SELECT},
+        is_anomaly, confidence, model_version, analyzed_at, feature_schema_version
+    ) VALUES ({", ".join(["%s"] * (10 + N_FEATURES))}, {FEATURE_SCHEMA_VERSION})
+"""
+
+# Spill files are named spill-<writer pid>-<id>.jsonl; a worker claims one for
+# replay by renaming it to <name>.replaying-<its pid>
+_SPILL_FILE = re.compile(r"spill-(\d+)-[0-9a-f]+\.jsonl(?:\.replaying-(\d+))?$")
+
+# Positions of the prediction fields in an analyzed_requests row
+_IS_ANOMALY, _CONFIDENCE, _MODEL_VERSION, _ANALYZED_AT = range(6 + N_FEATURES, 10 + N_FEATURES)
+
+
+def record_statistics(rows: Sequence[tuple]):
+    """Count persisted analyzed_requests rows in the pre-aggregated statistics."""
+    request_stats.record_requests(
+        (row[_ANALYZED_AT], row[_MODEL_VERSION], row[_IS_ANOMALY], row[_CONFIDENCE]) for row in rows
+    )
+
+
+class ResultWriter:
+    """
+    Write-behind buffer for analyzed_requests rows.
+
+    `submit` only appends to a bounded in-memory queue; a background thread
+    flushes it with multi-row INSERTs whenever `batch_size` rows are waiting or
+    `flush_interval_ms` has passed. When the queue is full the configured policy
+    applies: "block" waits (up to `block_timeout` seconds) for room, "drop"
+    discards the rows, and "spill" appends them to JSON-lines files that are
+    replayed once the database catches up. `on_flushed` is called with every
+    batch that was committed.
+
+    Only connection-level (transient) errors put a batch back in the queue.
+    A batch the database rejects (DataError, IntegrityError, ...) is inserted
+    row by row instead, and the rows that still fail are appended to
+    `dead-*.jsonl` files in `spill_dir`, so one bad row never blocks the rows
+    behind it. Each worker replays its own spill files and those of workers
+    that no longer run, claiming a file by renaming it first.
+    """
+
+    def __init__(
+        self,
+        query: str = INSERT_ANALYZED_REQUEST,
+        batch_size: int = settings.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval_ms: float = settings.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+        max_queue: int = settings.WRITE_BEHIND_MAX_QUEUE,
+        policy: str = settings.WRITE_BEHIND_POLICY,
+        block_timeout: float = settings.WRITE_BEHIND_BLOCK_TIMEOUT_SECONDS,
+        spill_dir: str = settings.WRITE_BEHIND_SPILL_DIR,
+        on_flushed: Optional[Callable[[List[tuple]], None]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown write-behind policy '{policy}'. Use one of {POLICIES}")
+
+        self.query = query
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_dir = spill_dir
+        self.on_flushed = on_flushed
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._spill_lock = threading.Lock()
+        self._spill_file: Optional[str] = None
+        self._spill_file_rows = 0
+
+        # Statistics
+        self._enqueued = 0
+        self._flushed = 0
+        self._flushes = 0
+        self._flush_failures = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._replayed = 0
+        self._dead_lettered = 0
+        self._max_depth = 0
+        self._last_flush_ms = 0.0
+
+    # ==============================================================
+    # Lifecycle
+    # ==============================================================
+
+    def start(self):
+        """Start the flusher thread (idempotent)."""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything still queued and stop the flusher thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ==============================================================
+    # Public API
+    # ==============================================================
+
+    async def submit(self, rows: Sequence[tuple]):
+        """Queue rows for persistence; returns as soon as they are buffered (or rejected)."""
+        self.start()
+        if self._offer(rows):
+            return
+
+        if self.policy == "block":
+            deadline = time.monotonic() + self.block_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.flush_interval / 10 or 0.001)
+                if self._offer(rows):
+                    return
+            self._dropped += len(rows)
+            logger.warning("Write-behind queue full for %ss, dropped %d rows", self.block_timeout, len(rows))
+        elif self.policy == "spill":
+            self._spill(rows)
+        else:
+            self._dropped += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "max_queue_depth": self._max_depth,
+            "enqueued_rows": self._enqueued,
+            "flushed_rows": self._flushed,
+            "flushes": self._flushes,
+            "flush_failures": self._flush_failures,
+            "dropped_rows": self._dropped,
+            "spilled_rows": self._spilled,
+            "replayed_rows": self._replayed,
+            "dead_lettered_rows": self._dead_lettered,
+            "pending_spill_files": len(self._spill_files()),
+            "last_flush_ms": round(self._last_flush_ms, 3),
+        }
+
+    # ==============================================================
+    # Queue handling
+    # ==============================================================
+
+    def _offer(self, rows: Sequence[tuple]) -> bool:
+        with self._cond:
+            if len(self._queue) + len(rows) > self.max_queue:
+                return False
+            self._queue.extend(rows)
+            self._enqueued += len(rows)
+            depth = len(self._queue)
+            if depth > self._max_depth:
+                self._max_depth = depth
+            if depth >= self.batch_size:
+                self._cond.notify()
+            return True
+
+    def _take(self) -> List[tuple]:
+        count = min(self.batch_size, len(self._queue))
+        return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take()
+                stopping = self._stopping and not self._queue
+
+            if batch:
+                self._flush(batch)
+            elif not stopping:
+                self._replay_spill()
+
+            if stopping and not batch:
+                return
+
+    def _flush(self, batch: List[tuple]):
+        started = time.perf_counter()
+        try:
+            db.execute_many(self.query, batch)
+        except TRANSIENT_ERRORS as e:
+            self._flush_failures += 1
+            logger.error("Write-behind flush of %d rows failed: %s", len(batch), e)
+            self._requeue(batch)
+            if not self._stopping:
+                time.sleep(min(self.flush_interval * 10, 5.0))
+            return
+        except Exception as e:
+            self._flush_failures += 1
+            logger.error("Write-behind flush of %d rows rejected, inserting row by row: %s", len(batch), e)
+            batch = self._insert_rows(batch)
+            if not batch:
+                return
+        self._flushes += 1
+        self._flushed += len(batch)
+        self._last_flush_ms = (time.perf_counter() - started) * 1000.0
+        if self.on_flushed is not None:
+            self.on_flushed(batch)
+
+    def _insert_rows(self, rows: List[tuple]) -> List[tuple]:
+        """Insert a rejected batch one row at a time; returns the rows that were written."""
+        written: List[tuple] = []
+        rejected: List[tuple] = []
+        for i, row in enumerate(rows):
+            try:
+                db.execute_many(self.query, [row])
+            except TRANSIENT_ERRORS:
+                self._requeue(rows[i:])
+                break
+            except Exception:
+                rejected.append(row)
+            else:
+                written.append(row)
+        if rejected:
+            self._dead_letter(rejected)
+        return written
+
+    def _requeue(self, batch: List[tuple]):
+        """Put a failed batch back in front; anything that no longer fits follows the policy."""
+        if self._stopping or self.policy == "spill":
+            # Nobody will retry an in-memory batch after shutdown
+            self._spill(batch)
+            return
+        with self._cond:
+            room = max(self.max_queue - len(self._queue), 0)
+            keep = batch[:room]
+            self._queue.extendleft(reversed(keep))
+        self._dropped += len(batch) - len(keep)
+
+    # ==============================================================
+    # Spill files
+    # ==============================================================
+
+    def _spill(self, rows: Sequence[tuple]):
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            if self._spill_file is None or self._spill_file_rows >= self.batch_size * 20:
+                self._spill_file = os.path.join(self.spill_dir, f"spill-{os.getpid()}-{uuid.uuid4().hex}.jsonl")
+                self._spill_file_rows = 0
+            _append_rows(self._spill_file, rows)
+            self._spill_file_rows += len(rows)
+            self._spilled += len(rows)
+
+    def _dead_letter(self, rows: Sequence[tuple]):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"dead-{os.getpid()}-{uuid.uuid4().hex}.jsonl")
+        _append_rows(path, rows)
+        self._dead_lettered += len(rows)
+        logger.error("%d analysis results rejected by the database, kept in %s", len(rows), path)
+
+    def _spill_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spill_dir, "spill-*.jsonl*")))
+
+    def _replayable(self) -> List[str]:
+        """Closed spill files of this process, and files left by processes that no longer run."""
+        pid = os.getpid()
+        files = []
+        for path in self._spill_files():
+            match = _SPILL_FILE.search(os.path.basename(path))
+            if match is None or path == self._spill_file:
+                continue
+            owner = int(match.group(2) or match.group(1))
+            if owner == pid or not process_alive(owner):
+                files.append(path)
+        return files
+
+    def _replay_spill(self):
+        """Re-insert one spill file once the in-memory queue has drained."""
+        with self._spill_lock:
+            files = self._replayable()
+            if not files:
+                if self._spill_file is None or not os.path.exists(self._spill_file):
+                    return
+                # Close the active file so it can be replayed
+                files, self._spill_file = [self._spill_file], None
+
+        for path in files:
+            claimed = f"{path.split('.replaying-')[0]}.replaying-{os.getpid()}"
+            try:
+                if path != claimed:
+                    os.rename(path, claimed)   # atomic: another worker that got there first wins
+                rows = self._read_spill(claimed)
+            except FileNotFoundError:
+                continue
+            break
+        else:
+            return
+
+        try:
+            # One execute_many = one transaction, so a file is replayed all-or-nothing
+            db.execute_many(self.query, rows)
+        except TRANSIENT_ERRORS as e:
+            self._flush_failures += 1
+            logger.error("Replaying spill file %s failed: %s", path, e)
+            time.sleep(min(self.flush_interval * 10, 5.0))
+            return
+        except Exception as e:
+            self._flush_failures += 1
+            logger.error("Replaying spill file %s rejected, inserting row by row: %s", path, e)
+            # Transient failures half-way are requeued in memory, so the file is done either way
+            rows = self._insert_rows(rows)
+        try:
+            os.remove(claimed)
+        except OSError as e:
+            logger.warning("Could not remove replayed spill file %s: %s", claimed, e)
+        self._replayed += len(rows)
+        if rows and self.on_flushed is not None:
+            self.on_flushed(rows)
+
+    def _read_spill(self, path: str) -> List[tuple]:
+        """Rows of a spill file; lines that do not parse (a write cut short by a crash) are dead-lettered."""
+        rows: List[tuple] = []
+        broken: List[str] = []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(tuple(_decode(value) for value in json.loads(line)))
+                except ValueError:
+                    broken.append(line if line.endswith("\n") else line + "\n")
+        if broken:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            dead = os.path.join(self.spill_dir, f"dead-{os.getpid()}-{uuid.uuid4().hex}.jsonl")
+            with open(dead, "a", encoding="utf-8") as f:
+                f.writelines(broken)
+            self._dead_lettered += len(broken)
+            logger.error("%d unreadable lines in spill file %s, kept in %s", len(broken), path, dead)
+        return rows
+
+
+def _append_rows(path: str, rows: Sequence[tuple]):
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps([_encode(value) for value in row]) + "\n")
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+# Global write-behind buffer for analysis results
+result_writer = ResultWriter(on_flushed=record_statistics)
@@ -0,0 +1,89 @@
+import copy
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+# Per-tree fitted attributes of IsolationForest that must stay aligned with estimators_
+_PER_TREE_LISTS = ("estimators_", "estimators_features_", "_seeds")
+_PER_TREE_CACHES = ("_decision_path_lengths", "_average_path_length_per_tree")
+
+
+def fit_rolling(
+    base: Any,
+    X: np.ndarray,
+    new_trees: int,
+    contamination: Optional[Any] = None,
+    random_state: Optional[int] = None,
+) -> Any:
+    """
+    Refresh a fitted IsolationForest by replacing its `new_trees` oldest trees.
+
+    Only `new_trees` trees are grown, on `X` (recent data), with the base
+    model's subsample size so path-length normalization stays valid for the
+    whole ensemble. They are appended after the surviving trees, so the
+    ensemble size is constant and every tree is retired after
+    n_estimators / new_trees rounds. The decision threshold (offset_) is
+    recomputed on `X`. The base model is not modified.
+    """
+    n_trees = len(base.estimators_)
+    if not 0 < new_trees < n_trees:
+        raise ValueError(f"new_trees must be between 1 and {n_trees - 1} (got {new_trees}); use a full retrain instead")
+    if X.shape[1] != base.n_features_in_:
+        raise ValueError(f"X has {X.shape[1]} features, the model expects {base.n_features_in_}")
+    max_samples = int(getattr(base, "_max_samples", base.max_samples_))
+    if len(X) < max_samples:
+        raise ValueError(f"Need at least {max_samples} recent samples (the model's subsample size), got {len(X)}")
+
+    if random_state is None:
+        random_state = int(np.random.default_rng().integers(2 ** 31 - 1))
+    fresh = IsolationForest(
+        n_estimators=new_trees,
+        max_samples=max_samples,
+        max_features=base.max_features,
+        bootstrap=base.bootstrap,
+        contamination="auto",     # threshold is recomputed on the merged forest below
+        random_state=random_state,
+        n_jobs=base.n_jobs,
+    ).fit(X)
+
+    model = copy.copy(base)
+    for name in _PER_TREE_LISTS + _PER_TREE_CACHES:
+        if hasattr(base, name) and hasattr(fresh, name):
+            merged = list(getattr(base, name))[new_trees:] + list(getattr(fresh, name))
+            setattr(model, name, np.asarray(merged) if isinstance(getattr(base, name), np.ndarray) else merged)
+    # estimators_samples_ is derived from _seeds and _n_samples; only the new trees' sample count is known
+    model._n_samples = getattr(fresh, "_n_samples", getattr(base, "_n_samples", None))
+    model.n_estimators = n_trees
+    model.warm_start = False
+
+    contamination = base.contamination if contamination is None else contamination
+    model.contamination = contamination
+    if contamination == "auto":
+        model.offset_ = -0.5
+    else:
+        model.offset_ = np.percentile(model.score_samples(X), 100.0 * contamination)
+
+    model.rolling_updates_ = getattr(base, "rolling_updates_", 0) + 1
+    return model
+
+
+def compare_models(reference: Any, candidate: Any, X: np.ndarray) -> Dict[str, float]:
+    """Agreement of two fitted forests on X: anomaly labels, score correlation and rank correlation."""
+    ref_scores = reference.score_samples(X)
+    cand_scores = candidate.score_samples(X)
+    ref_labels = ref_scores - reference.offset_ < 0
+    cand_labels = cand_scores - candidate.offset_ < 0
+    return {
+        "label_agreement": round(float(np.mean(ref_labels == cand_labels)), 4),
+        "anomaly_rate_reference": round(float(ref_labels.mean()), 4),
+        "anomaly_rate_candidate": round(float(cand_labels.mean()), 4),
+        "score_correlation": round(float(np.corrcoef(ref_scores, cand_scores)[0, 1]), 4),
+        "rank_correlation": round(float(np.corrcoef(_ranks(ref_scores), _ranks(cand_scores))[0, 1]), 4),
+    }
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return ranks
@@ -0,0 +1,112 @@
+import json
+import os
+import re
+from functools import lru_cache
+from itertools import groupby
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from app.config import settings
+
+
+class Rule(NamedTuple):
+    pattern: str
+    weight: float
+    regex: bool = False   # False = plain case-insensitive substring; regexes run on the lowercased input
+
+
+# Built-in rules (same keywords and weights the feature extractor always used)
+DEFAULT_RULES: Dict[str, Dict[str, Any]] = {
+    "endpoint": {
+        "default": 0.2,
+        "rules": [Rule(k, 0.9) for k in ('admin', 'delete', 'drop', 'execute', 'eval', 'password', 'token', 'login', 'auth')]
+               + [Rule(k, 0.5) for k in ('update', 'modify', 'change', 'edit', 'upload')],
+    },
+    "user_agent": {
+        "default": 0.0,
+        "rules": [Rule(k, 0.8) for k in ('bot', 'crawler', 'spider', 'scraper', 'headless')],
+    },
+}
+
+
+class WeightedMatcher:
+    """
+    Scores a string by the highest-weighted rule it matches.
+
+    Rules are grouped by weight and each group is compiled once into a single
+    alternation, so scoring lowercases the input once and runs at most one
+    regex search per distinct weight (highest first) instead of one substring
+    test per keyword.
+    Results are memoized in a bounded LRU, which makes repeated endpoints and
+    User-Agents a dictionary lookup.
+    """
+
+    def __init__(self, rules: Iterable[Rule], default: float, cache_size: int = settings.RULE_CACHE_SIZE):
+        self.default = default
+        self.rules = sorted(rules, key=lambda r: r.weight, reverse=True)
+        self.tiers = [
+            (weight, re.compile("|".join(r.pattern if r.regex else re.escape(r.pattern.lower()) for r in group)))
+            for weight, group in ((w, list(g)) for w, g in groupby(self.rules, key=lambda r: r.weight))
+        ]
+        self.score = lru_cache(maxsize=cache_size)(self._score)
+
+    def _score(self, text: str) -> float:
+        text = text.lower()
+        for weight, pattern in self.tiers:
+            if pattern.search(text):
+                return weight
+        return self.default
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.score.cache_info()
+        return {
+            "rules": len(self.rules),
+            "tiers": len(self.tiers),
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_entries": info.currsize,
+            "cache_size": info.maxsize,
+        }
+
+
+class RuleEngine:
+    """Endpoint-risk and User-Agent matchers built from the defaults plus an optional rules file."""
+
+    def __init__(self, sections: Dict[str, Dict[str, Any]], cache_size: int = settings.RULE_CACHE_SIZE):
+        self.endpoint = WeightedMatcher(sections["endpoint"]["rules"], sections["endpoint"]["default"], cache_size)
+        self.user_agent = WeightedMatcher(sections["user_agent"]["rules"], sections["user_agent"]["default"], cache_size)
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = settings.RULES_PATH) -> "RuleEngine":
+        """
+        Load custom rules from a JSON file:
+
+            {"endpoint": {"default": 0.2, "replace": false,
+                          "rules": [{"pattern": "internal", "weight": 0.7},
+                                    {"pattern": "^/v[0-9]+/debug", "weight": 0.95, "regex": true}]},
+             "user_agent": {"rules": [{"pattern": "sqlmap", "weight": 1.0}]}}
+
+        Custom rules are added to the built-in ones unless "replace" is true.
+        """
+        sections = {name: {"default": spec["default"], "rules": list(spec["rules"])}
+                    for name, spec in DEFAULT_RULES.items()}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                custom = json.load(f)
+            for name, spec in custom.items():
+                if name not in sections:
+                    raise ValueError(f"Unknown rule section '{name}' in {path}. Use one of {list(sections)}")
+                rules = [Rule(r["pattern"], float(r["weight"]), bool(r.get("regex", False))) for r in spec.get("rules", [])]
+                if spec.get("replace", False):
+                    sections[name]["rules"] = rules
+                else:
+                    sections[name]["rules"].extend(rules)
+                if "default" in spec:
+                    sections[name]["default"] = float(spec["default"])
+        return cls(sections)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"endpoint": self.endpoint.stats(), "user_agent": self.user_agent.stats()}
+
+
+# Global rule engine used by FeatureExtractor
+rule_engine = RuleEngine.from_file()
@@ -0,0 +1,215 @@
+import itertools
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.database import db
+from app.services.archive import request_archive
+from app.services.feature_schema import FEATURE_SCHEMA_VERSION, FEATURE_SELECT, N_FEATURES
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_MODES = ("latest", "reservoir")
+
+
+class TrainingSet(NamedTuple):
+    """Feature matrix loaded for one training run plus loader statistics."""
+    X: np.ndarray                   # (rows_selected, N_FEATURES) float32, possibly a memmap view
+    rows_scanned: int
+    sampling: str
+    load_seconds: float
+    path: Optional[str] = None      # backing .npy file when memory-mapped
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_scanned / self.load_seconds if self.load_seconds > 0 else 0.0
+
+    def discard(self):
+        """Delete the backing .npy file (if any) once the model has been fitted."""
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows_scanned": self.rows_scanned,
+            "rows_selected": len(self.X),
+            "sampling": self.sampling,
+            "load_seconds": round(self.load_seconds, 4),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "memory_mapped": self.path is not None,
+        }
+
+
+class TrainingDataLoader:
+    """
+    Streams feature vectors out of analyzed_requests into a preallocated float32 matrix.
+
+    Rows are read in `chunk_size` chunks through an unbuffered cursor and
+    converted chunk by chunk, so memory is bounded by the output matrix and
+    never holds a Python object per row of the whole table. The output can be
+    an in-memory array or a memory-mapped `.npy` file in `memmap_dir`.
+
+    Sampling modes:
+      - "latest":    the `max_samples` most recent rows (ORDER BY analyzed_at DESC)
+      - "reservoir": a uniform random sample of `max_samples` rows from a single
+                     unordered scan of every matching row (Algorithm R, applied
+                     per chunk with NumPy)
+    Both can be restricted to a time window on analyzed_at. Only rows
+    extracted with the current FEATURE_SCHEMA_VERSION are read.
+
+    Rows moved to the Parquet archive are read after the database rows: they
+    are all older, so "latest" continues there newest first once the
+    database is exhausted, and "reservoir" samples both tiers alike.
+    """
+
+    def __init__(
+        self,
+        max_samples: int = settings.TRAINING_MAX_SAMPLES,
+        sampling: str = settings.TRAINING_SAMPLING,
+        chunk_size: int = settings.TRAINING_CHUNK_SIZE,
+        memmap_dir: Optional[str] = settings.TRAINING_MEMMAP_DIR or None,
+        seed: Optional[int] = None,
+    ):
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}'. Use one of {list(SAMPLING_MODES)}")
+        if max_samples < 1:
+            raise ValueError("max_samples must be at least 1")
+        self.max_samples = max_samples
+        self.sampling = sampling
+        self.chunk_size = chunk_size
+        self.memmap_dir = memmap_dir
+        self.seed = seed
+
+    def load(
+        self,
+        use_corrected_labels: bool = True,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> TrainingSet:
+        """
+        Load the training matrix for rows analyzed in [since, until).
+        `progress(rows_scanned)` is called after every chunk.
+        """
+        if since is None and settings.TRAINING_WINDOW_DAYS > 0:
+            since = datetime.utcnow() - timedelta(days=settings.TRAINING_WINDOW_DAYS)
+
+        query, params = self._build_query(use_corrected_labels, since, until)
+        out, path = self._allocate()
+
+        started = time.perf_counter()
+        try:
+            if self.sampling == "latest":
+                scanned = self._fill(out, self._chunks(query, params), progress)
+                if scanned < len(out):
+                    archived = request_archive.feature_chunks(
+                        since, until, self.chunk_size, newest_first=True, limit=len(out) - scanned
+                    )
+                    scanned = self._fill(out, archived, progress, scanned)
+                selected = scanned
+            else:
+                chunks = itertools.chain(
+                    self._chunks(query, params), request_archive.feature_chunks(since, until, self.chunk_size)
+                )
+                scanned, selected = self._reservoir(out, chunks, progress)
+        except Exception:
+            if path is not None:
+                del out
+                os.remove(path)
+            raise
+        elapsed = time.perf_counter() - started
+
+        if path is not None:
+            out.flush()
+        training_set = TrainingSet(out[:selected], scanned, self.sampling, elapsed, path)
+        logger.info(
+            "Loaded %d training rows (%s, %d scanned) in %.2fs (%s rows/s)",
+            selected, self.sampling, scanned, elapsed, f"{training_set.rows_per_second:,.0f}"
+        )
+        return training_set
+
+    # ==============================================================
+    # Internals
+    # ==============================================================
+
+    def _build_query(self, use_corrected_labels: bool, since: Optional[datetime], until: Optional[datetime]):
+        if use_corrected_labels:
+            conditions = ["(user_label IS NOT NULL OR is_anomaly IS NOT NULL)"]
+        else:
+            conditions = ["is_anomaly IS NOT NULL"]
+        # Rows extracted under an older feature schema have different feature meanings
+        conditions.append("feature_schema_version = %s")
+        params: List[Any] = [FEATURE_SCHEMA_VERSION]
+        if since is not None:
+            conditions.append("analyzed_at >= %s")
+            params.append(since)
+        if until is not None:
+            conditions.append("analyzed_at < %s")
+            params.append(until)
+
+        query = f"SELECT {FEATURE_SELECT} FROM analyzed_requests WHERE {' AND '.join(conditions)}"
+        if self.sampling == "latest":
+            query += " ORDER BY analyzed_at DESC LIMIT %s"
+            params.append(self.max_samples)
+        return query, tuple(params)
+
+    def _allocate(self):
+        shape = (self.max_samples, N_FEATURES)
+        if not self.memmap_dir:
+            return np.empty(shape, dtype=np.float32), None
+        os.makedirs(self.memmap_dir, exist_ok=True)
+        path = os.path.join(self.memmap_dir, f"training-{uuid.uuid4().hex}.npy")
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape), path
+
+    def _chunks(self, query: str, params: tuple):
+        for rows in db.stream(query, params, self.chunk_size):
+            yield np.asarray(rows, dtype=np.float32).reshape(-1, N_FEATURES)
+
+    def _fill(self, out: np.ndarray, chunks, progress=None, n: int = 0) -> int:
+        for chunk in chunks:
+            take = min(len(chunk), len(out) - n)
+            out[n:n + take] = chunk[:take]
+            n += take
+            if progress:
+                progress(n)
+        return n
+
+    def _reservoir(self, out: np.ndarray, chunks, progress=None):
+        k = len(out)
+        rng = np.random.default_rng(self.seed)
+        seen = 0
+        for chunk in chunks:
+            # Fill the reservoir first
+            take = max(0, min(len(chunk), k - seen))
+            if take:
+                out[seen:seen + take] = chunk[:take]
+            rest = chunk[take:]
+            if len(rest):
+                # Row number t (1-based) replaces a uniform slot in [0, t) when that slot is < k
+                t = np.arange(seen + take + 1, seen + len(chunk) + 1)
+                slots = rng.integers(0, t)
+                accepted = slots < k
+                slots, rows = slots[accepted], rest[accepted]
+                # Later rows overwrite earlier ones in the same slot, as in the sequential algorithm
+                _, last_in_reversed = np.unique(slots[::-1], return_index=True)
+                last = len(slots) - 1 - last_in_reversed
+                out[slots[last]] = rows[last]
+            seen += len(chunk)
+            if progress:
+                progress(seen)
+        return seen, min(seen, k)
+
+
+def load_training_data(use_corrected_labels: bool = True, **options) -> TrainingSet:
+    """Build a TrainingDataLoader from settings (overridden by `options`) and load one training set."""
+    window = {key: options.pop(key) for key in ("since", "until", "progress") if key in options}
+    return TrainingDataLoader(**options).load(use_corrected_labels, **window)
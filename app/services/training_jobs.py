@@ -0,0 +1,389 @@
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.executors import training_executor
+from app.services.ml_service import ml_service
+from app.services.procutil import process_alive
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("queued", "loading", "fitting", "activating", "succeeded", "failed")
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+# Progress queue of the training worker process (set by _init_worker)
+_worker_progress = None
+
+
+class TrainingJob:
+    """State of one background training run, updated from the worker's progress reports."""
+
+    def __init__(self, kind: str, model_version: str, params: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind                    # "train" | "retrain"
+        self.model_version = model_version
+        self.params = params
+        self.state = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started = 0.0
+        self._finished = 0.0
+        self.samples_loaded = 0
+        self.trees_fitted = 0
+        self.trees_total = int(params.get("new_trees") or params.get("n_estimators", 0))
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+    def update(self, **fields):
+        state = fields.pop("state", None)
+        # Progress arrives asynchronously; never move a job back to an earlier state
+        if state is not None and JOB_STATES.index(state) > JOB_STATES.index(self.state) and not self.done:
+            if self.started_at is None:
+                self.started_at = datetime.utcnow()
+                self._started = time.monotonic()
+            self.state = state
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def finish(self, state: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.state = state
+        self.result = result
+        self.error = error
+        self.finished_at = datetime.utcnow()
+        self._finished = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished if self.done else time.monotonic()) - self._started
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "model_version": self.model_version,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 2),
+            "samples_loaded": self.samples_loaded,
+            "trees_fitted": self.trees_fitted,
+            "trees_total": self.trees_total,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class TrainingJobManager:
+    """
+    Runs model training as background jobs.
+
+    Data loading and fitting happen in a separate process pool, so neither
+    the GIL nor the CPU time of `IsolationForest.fit` competes with request
+    handling. Workers report progress through a queue that a listener
+    thread applies to the job records. The fitted model comes back as
+    artifact bytes; activation (one database transaction plus a snapshot swap
+    in the registry) happens in this process, so the cached model used for
+    scoring changes with a single reference assignment.
+
+    With several API workers a status request may reach a worker that did
+    not run the job, so every state change is also written to `state_dir`
+    as one JSON file per job (with the pid of the owning worker) and status
+    lookups fall back to those files. An unfinished job whose owner has
+    exited is reported, and rewritten, as failed. Finished files older than
+    `max_age_days` are deleted whichever worker wrote them, and parsed files
+    are cached by mtime so listing jobs only re-reads files that changed.
+    """
+
+    def __init__(self, processes: int = settings.TRAINING_PROCESSES,
+                 retained: int = settings.TRAINING_JOBS_RETAINED,
+                 state_dir: str = settings.TRAINING_JOBS_DIR,
+                 max_age_days: float = settings.TRAINING_JOBS_MAX_AGE_DAYS):
+        self.processes = processes
+        self.retained = retained
+        self.state_dir = state_dir
+        self.max_age_days = max_age_days
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, Dict[str, Any]]] = {}   # job_id -> (mtime_ns, parsed file)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._progress = None
+        self._listener: Optional[threading.Thread] = None
+
+    def submit(self, kind: str, model_version: str, **params) -> TrainingJob:
+        """Queue a training job and return immediately."""
+        if kind not in ("train", "retrain"):
+            raise ValueError(f"Unknown training job kind '{kind}'")
+        job = TrainingJob(kind, model_version, params)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._save(job)
+        self._ensure_pool()
+        training_executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job started by any worker (None if unknown)."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not self.state_dir or not _JOB_ID.fullmatch(job_id):
+            return None
+        return self._load(os.path.join(self.state_dir, f"{job_id}.json"))
+
+    def statuses(self) -> List[Dict[str, Any]]:
+        """Recent jobs of all workers, newest first."""
+        statuses = {job.job_id: job.to_dict() for job in self.list()}
+        for job_id, status in self._scan().items():
+            statuses.setdefault(job_id, status)
+        ordered = sorted(statuses.values(), key=lambda status: _isoformat(status["created_at"]), reverse=True)
+        return ordered[:self.retained]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._progress is not None:
+            self._progress.put(None)   # stops the listener
+            self._progress = None
+
+    # ==============================================================
+    # Internals
+    # ==============================================================
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                return
+            # spawn: never fork a process that holds DB connections and running threads
+            context = multiprocessing.get_context("spawn")
+            self._progress = context.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._progress,),
+            )
+            self._listener = threading.Thread(
+                target=self._listen, args=(self._progress,), name="training-progress", daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, progress):
+        while True:
+            message = progress.get()
+            if message is None:
+                return
+            job_id, fields = message
+            job = self.get(job_id)
+            if job is not None:
+                job.update(**fields)
+                self._save(job)
+
+    def _run(self, job: TrainingJob):
+        """Wait for the worker process, then activate the model here (training executor thread)."""
+        try:
+            old_version = ml_service.model_version or "none"
+            future = self._pool.submit(_fit_in_worker, job.job_id, job.kind, job.params)
+            fitted = future.result()
+
+            job.update(state="activating")
+            self._save(job)
+            # The artifact is memory-mapped as is; the estimator is only unpickled if something needs it
+            ml_service.activate_model(fitted["model_data"], job.model_version, fitted["training_samples"])
+
+            result = ml_service.training_summary(job.model_version, fitted, fitted["duration"])
+            if job.kind == "retrain":
+                result = ml_service.retraining_summary(
+                    old_version, job.model_version, result, fitted["corrected_labels_used"]
+                )
+            job.finish("succeeded", result=result)
+            logger.info("Training job %s activated model %s", job.job_id, job.model_version)
+        except Exception as e:
+            job.finish("failed", error=str(e))
+            logger.error("Training job %s failed: %s", job.job_id, e)
+        self._save(job)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - self.retained, 0)]:
+            del self._jobs[job_id]
+            if self.state_dir:
+                try:
+                    os.remove(os.path.join(self.state_dir, f"{job_id}.json"))
+                except OSError:
+                    pass
+
+    def _save(self, job: TrainingJob):
+        """Write the job's status file atomically (readers never see a partial file)."""
+        if not self.state_dir:
+            return
+        path = os.path.join(self.state_dir, f"{job.job_id}.json")
+        try:
+            with self._save_lock:
+                os.makedirs(self.state_dir, exist_ok=True)
+                _write_status(path, dict(job.to_dict(), owner_pid=os.getpid()))
+        except OSError as e:
+            logger.warning("Could not save status of training job %s: %s", job.job_id, e)
+
+    def _scan(self) -> Dict[str, Dict[str, Any]]:
+        """Statuses from all status files; only files changed since the last scan are parsed."""
+        if not self.state_dir:
+            return {}
+        try:
+            names = os.listdir(self.state_dir)
+        except FileNotFoundError:
+            return {}
+
+        cutoff = time.time() - self.max_age_days * 86400
+        files = {}
+        statuses = {}
+        for name in names:
+            job_id, ext = os.path.splitext(name)
+            if ext != ".json" or not _JOB_ID.fullmatch(job_id):
+                continue
+            path = os.path.join(self.state_dir, name)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            cached = self._files.get(job_id)
+            raw = cached[1] if cached is not None and cached[0] == mtime_ns else _read_status(path)
+            if raw is None:
+                continue
+            status = self._present(path, raw)
+            if self.max_age_days > 0 and mtime_ns / 1e9 < cutoff and status["state"] in ("succeeded", "failed"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            files[job_id] = (mtime_ns, raw)
+            statuses[job_id] = status
+        self._files = files
+        return statuses
+
+    def _load(self, path: str) -> Optional[Dict[str, Any]]:
+        raw = _read_status(path)
+        return None if raw is None else self._present(path, raw)
+
+    def _present(self, path: str, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """API view of a parsed status file; an unfinished job of an exited worker is marked failed."""
+        status = dict(raw)
+        owner = status.pop("owner_pid", None)
+        if status["state"] in ("succeeded", "failed"):
+            return status
+
+        # A pid equal to ours that we do not know is a previous process that had the same pid
+        if owner is not None and (
+            (owner == os.getpid() and self.get(status["job_id"]) is None) or not process_alive(owner)
+        ):
+            status.update(
+                state="failed",
+                finished_at=datetime.utcnow().isoformat(),
+                error=f"Worker process {owner} exited before the job finished",
+            )
+            try:
+                _write_status(path, dict(status, owner_pid=owner))
+            except OSError:
+                pass
+            return status
+
+        # The file holds the elapsed time of its last write; a running job keeps counting
+        if status["started_at"]:
+            started_at = datetime.fromisoformat(status["started_at"])
+            status["elapsed_seconds"] = round((datetime.utcnow() - started_at).total_seconds(), 2)
+        return status
+
+
+def _read_status(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_status(path: str, status: Dict[str, Any]):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f, default=_isoformat)
+    os.replace(tmp_path, path)
+
+
+def _isoformat(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# ==============================================================
+# Worker process side
+# ==============================================================
+
+def _init_worker(progress):
+    global _worker_progress
+    _worker_progress = progress
+    from app.database import db
+    db.connect()
+
+
+def _fit_in_worker(job_id: str, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Load data and fit a forest; returns picklable results (the model as bytes)."""
+    def report(**fields):
+        _worker_progress.put((job_id, fields))
+
+    started = time.monotonic()
+    report(state="loading")
+    corrected_count = ml_service.count_corrected_labels() if kind == "retrain" else None
+    if params.get("mode") == "incremental":
+        fitted = ml_service.fit_incremental(
+            new_trees=params.get("new_trees"),
+            use_corrected_labels=params.get("use_corrected_labels", True),
+            data_options=params.get("data_options"),
+            compare_full=params.get("compare_full", False),
+            progress=report,
+        )
+    else:
+        fitted = ml_service.fit_model(
+            contamination=params.get("contamination", settings.DEFAULT_CONTAMINATION),
+            n_estimators=params.get("n_estimators", settings.DEFAULT_N_ESTIMATORS),
+            use_corrected_labels=params.get("use_corrected_labels", True),
+            data_options=params.get("data_options"),
+            progress=report,
+        )
+    del fitted["model"]   # only the bytes cross the process boundary
+    fitted["duration"] = time.monotonic() - started
+    fitted["corrected_labels_used"] = corrected_count
+    return fitted
+
+
+# Global job manager used by the training routes
+training_jobs = TrainingJobManager()
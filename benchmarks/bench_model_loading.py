@@ -0,0 +1,110 @@
+"""
+Compare loading a pickled IsolationForest with loading the array artifact.
+
+    python -m benchmarks.bench_model_loading
+    python -m benchmarks.bench_model_loading --n-estimators 100 300 --json results.json
+
+For each forest size it reports the stored size and best-of-N load time of
+the legacy pickle BLOB, the artifact from bytes (as fetched from MySQL),
+the artifact memory-mapped from disk (what workers do), and the artifact
+without the embedded estimator. It also times the first scoring call after
+each load and checks that artifact scores are identical to sklearn's.
+"""
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from app.services.forest_compiler import compile_forest
+from app.services.model_artifact import export_artifact, load_artifact, open_artifact
+
+
+def _best_time(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _first_score_ms(score_fn, X):
+    started = time.perf_counter()
+    score_fn(X)
+    return round((time.perf_counter() - started) * 1000, 4)
+
+
+def run(train_samples=10_000, estimator_counts=(100, 300), repeat=5, seed=42):
+    rng = np.random.default_rng(seed)
+    X_train = rng.random((train_samples, 5), dtype=np.float32)
+    X = rng.random((1_000, 5), dtype=np.float32)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n_estimators in estimator_counts:
+            model = IsolationForest(n_estimators=n_estimators, contamination=0.1, random_state=seed).fit(X_train)
+            forest = compile_forest(model)
+            pickled = pickle.dumps(model)
+            artifact = export_artifact(model, forest, include_estimator=True)
+            compact = export_artifact(model, forest, include_estimator=False)
+            path = os.path.join(directory, f"model-{n_estimators}.ifsa")
+            with open(path, "wb") as f:
+                f.write(compact)
+
+            pickle_s, loaded_model = _best_time(lambda: pickle.loads(pickled), repeat)
+            bytes_s, from_bytes = _best_time(lambda: load_artifact(artifact), repeat)
+            mmap_s, from_file = _best_time(lambda: open_artifact(path), repeat)
+            estimator_s, _ = _best_time(from_bytes.load_estimator, repeat)
+
+            identical = bool(np.array_equal(model.score_samples(X), from_file.forest.score_samples(X)))
+            results.append({
+                "n_estimators": n_estimators,
+                "pickle_bytes": len(pickled),
+                "artifact_bytes": len(artifact),
+                "compact_artifact_bytes": len(compact),
+                "pickle_load_ms": round(pickle_s * 1000, 4),
+                "artifact_load_ms": round(bytes_s * 1000, 4),
+                "mmap_load_ms": round(mmap_s * 1000, 4),
+                "embedded_estimator_load_ms": round(estimator_s * 1000, 4),
+                "speedup_mmap_vs_pickle": round(pickle_s / mmap_s, 1),
+                "first_score_ms_pickle": _first_score_ms(loaded_model.score_samples, X),
+                "first_score_ms_mmap": _first_score_ms(from_file.forest.score_samples, X),
+                "identical": identical,
+            })
+    return {
+        "benchmark": "model_loading",
+        "train_samples": train_samples,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train-samples", type=int, default=10_000)
+    parser.add_argument("--n-estimators", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.train_samples, args.n_estimators, args.repeat)
+
+    print(f"{'trees':>6} {'pickle KB':>10} {'artifact KB':>12} {'compact KB':>11} "
+          f"{'pickle ms':>10} {'bytes ms':>9} {'mmap ms':>8} {'speedup':>8} {'identical':>9}")
+    for r in report["results"]:
+        print(f"{r['n_estimators']:>6} {r['pickle_bytes'] / 1024:>10.1f} {r['artifact_bytes'] / 1024:>12.1f} "
+              f"{r['compact_artifact_bytes'] / 1024:>11.1f} {r['pickle_load_ms']:>10.3f} "
+              f"{r['artifact_load_ms']:>9.3f} {r['mmap_load_ms']:>8.3f} {r['speedup_mmap_vs_pickle']:>7.1f}x "
+              f"{str(r['identical']):>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
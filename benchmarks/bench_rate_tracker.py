@@ -0,0 +1,63 @@
+"""
+Throughput of the per-IP sliding-window rate tracker.
+
+    python -m benchmarks.bench_rate_tracker
+    python -m benchmarks.bench_rate_tracker --hits 2000000 --ips 500000 --max-ips 100000
+
+Replays a Zipf-distributed stream of client IPs (a few heavy hitters, a long
+tail of rare clients) spread over simulated time, and reports hits/second,
+nanoseconds per hit and how many IPs the LRU kept in memory.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.rate_tracker import RateTracker
+
+
+def run(hits=1_000_000, ips=200_000, max_ips=100_000, duration_seconds=600.0, seed=42):
+    rng = np.random.default_rng(seed)
+    ip_ids = np.minimum(rng.zipf(1.3, hits), ips) - 1
+    addresses = [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(ips)]
+    stream = [addresses[i] for i in ip_ids]
+    timestamps = np.linspace(0.0, duration_seconds, hits).tolist()
+
+    tracker = RateTracker(max_ips=max_ips)
+    started = time.perf_counter()
+    for ip, now in zip(stream, timestamps):
+        tracker.hit(ip, now)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "benchmark": "rate_tracker",
+        "hits": hits,
+        "distinct_ips": int(len(set(ip_ids.tolist()))),
+        "elapsed_s": round(elapsed, 4),
+        "hits_per_s": round(hits / elapsed),
+        "ns_per_hit": round(elapsed / hits * 1e9, 1),
+        **{k: v for k, v in tracker.stats().items() if k in ("tracked_ips", "max_ips", "evictions")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hits", type=int, default=1_000_000)
+    parser.add_argument("--ips", type=int, default=200_000)
+    parser.add_argument("--max-ips", type=int, default=100_000)
+    parser.add_argument("--duration", type=float, default=600.0, help="Simulated seconds covered by the stream")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.hits, args.ips, args.max_ips, args.duration)
+    for key, value in report.items():
+        print(f"{key:>14}: {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compiled rule engine vs the original keyword loops.
+
+    python -m benchmarks.bench_rule_engine
+    python -m benchmarks.bench_rule_engine --requests 500000 --distinct 5000
+
+Scores a stream of endpoints and User-Agents drawn from a pool of distinct
+values (repeats are what real traffic looks like). The engine is run cold
+(cache disabled) and warm (memoized), and checked for identical scores.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.rule_engine import DEFAULT_RULES, WeightedMatcher
+
+HIGH_RISK = ['admin', 'delete', 'drop', 'execute', 'eval', 'password', 'token', 'login', 'auth']
+MEDIUM_RISK = ['update', 'modify', 'change', 'edit', 'upload']
+BOTS = ['bot', 'crawler', 'spider', 'scraper', 'headless']
+
+
+def legacy_endpoint_risk(endpoint):
+    endpoint_lower = endpoint.lower()
+    if any(k in endpoint_lower for k in HIGH_RISK):
+        return 0.9
+    if any(k in endpoint_lower for k in MEDIUM_RISK):
+        return 0.5
+    return 0.2
+
+
+def legacy_user_agent(user_agent):
+    return 0.8 if any(bot in user_agent.lower() for bot in BOTS) else 0.0
+
+
+def _make_values(distinct, rng):
+    words = ["users", "orders", "profile", "items", "search", "v1", "v2", "api", "reports", "settings"]
+    words += HIGH_RISK + MEDIUM_RISK
+    endpoints = ["/" + "/".join(rng.choice(words) for _ in range(rng.randint(2, 5))) + f"/{i}" for i in range(distinct)]
+    agents = [
+        rng.choice([
+            f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/{100 + i % 30}.0",
+            f"Mozilla/5.0 (Macintosh; Intel Mac OS X 13_{i % 7}) Safari/605.1.15",
+            f"Googlebot/2.{i % 5}", f"python-requests/2.{i % 32}", f"HeadlessChrome/{i % 120}",
+        ]) + f" build/{i}"
+        for i in range(distinct)
+    ]
+    return endpoints, agents
+
+
+def _time(fn, values):
+    started = time.perf_counter()
+    results = [fn(v) for v in values]
+    return time.perf_counter() - started, results
+
+
+def run(requests=200_000, distinct=2_000, seed=42):
+    rng = random.Random(seed)
+    endpoints, agents = _make_values(distinct, rng)
+    endpoint_stream = [rng.choice(endpoints) for _ in range(requests)]
+    agent_stream = [rng.choice(agents) for _ in range(requests)]
+
+    report = {"benchmark": "rule_engine", "requests": requests, "distinct_values": distinct, "results": []}
+    for name, legacy, section, stream in (
+        ("endpoint", legacy_endpoint_risk, "endpoint", endpoint_stream),
+        ("user_agent", legacy_user_agent, "user_agent", agent_stream),
+    ):
+        spec = DEFAULT_RULES[section]
+        cold = WeightedMatcher(spec["rules"], spec["default"], cache_size=0)
+        warm = WeightedMatcher(spec["rules"], spec["default"])
+
+        legacy_s, expected = _time(legacy, stream)
+        cold_s, cold_results = _time(cold.score, stream)
+        warm_s, warm_results = _time(warm.score, stream)
+        report["results"].append({
+            "matcher": name,
+            "identical": expected == cold_results == warm_results,
+            "legacy_ns_per_call": round(legacy_s / requests * 1e9, 1),
+            "compiled_ns_per_call": round(cold_s / requests * 1e9, 1),
+            "memoized_ns_per_call": round(warm_s / requests * 1e9, 1),
+            "speedup_compiled": round(legacy_s / cold_s, 2),
+            "speedup_memoized": round(legacy_s / warm_s, 2),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=2_000)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.requests, args.distinct)
+    for r in report["results"]:
+        print(r)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
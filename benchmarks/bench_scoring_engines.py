@@ -0,0 +1,85 @@
+"""
+Compare the sklearn and compiled scoring engines.
+
+    python -m benchmarks.bench_scoring_engines
+    python -m benchmarks.bench_scoring_engines --batch-sizes 1 100 10000 --json results.json
+
+Fits an IsolationForest on synthetic 5-feature data, compiles it, checks that
+both engines return bit-identical scores and reports the best-of-N wall time
+and throughput for each batch size.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from app.services.forest_compiler import CompiledForest
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+
+
+def _best_time(fn, X, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(train_samples=10_000, n_estimators=100, batch_sizes=DEFAULT_BATCH_SIZES, repeat=5, seed=42):
+    rng = np.random.default_rng(seed)
+    X_train = rng.random((train_samples, 5), dtype=np.float32)
+    model = IsolationForest(n_estimators=n_estimators, contamination=0.1, random_state=seed).fit(X_train)
+    forest = CompiledForest.from_sklearn(model)
+
+    results = []
+    for size in batch_sizes:
+        X = rng.random((size, 5), dtype=np.float32)
+        identical = bool(np.array_equal(model.score_samples(X), forest.score_samples(X)))
+        sklearn_s = _best_time(model.score_samples, X, repeat)
+        compiled_s = _best_time(forest.score_samples, X, repeat)
+        results.append({
+            "batch_size": size,
+            "identical": identical,
+            "sklearn_ms": round(sklearn_s * 1000, 4),
+            "compiled_ms": round(compiled_s * 1000, 4),
+            "sklearn_rows_per_s": round(size / sklearn_s),
+            "compiled_rows_per_s": round(size / compiled_s),
+            "speedup": round(sklearn_s / compiled_s, 2),
+        })
+    return {
+        "benchmark": "scoring_engines",
+        "train_samples": train_samples,
+        "n_estimators": n_estimators,
+        "n_nodes": forest.n_nodes,
+        "max_depth": forest.max_depth,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train-samples", type=int, default=10_000)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.train_samples, args.n_estimators, args.batch_sizes, args.repeat)
+
+    print(f"{'batch':>8} {'identical':>9} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for r in report["results"]:
+        print(f"{r['batch_size']:>8} {str(r['identical']):>9} {r['sklearn_ms']:>11.3f} "
+              f"{r['compiled_ms']:>12.3f} {r['speedup']:>7.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Diff two benchmark suite reports (python -m benchmarks.suite --json ...).
+
+    python -m benchmarks.compare results/base.json results/head.json
+    python -m benchmarks.compare results/base.json results/head.json --threshold 5
+
+Compares every timing (`*_ms`, `*_us_per_request`, `*_seconds`: lower is
+better) and throughput (`*_per_s`: higher is better) present in both runs,
+prints the relative change and marks the ones that got worse by more than
+`threshold` percent. Exits with status 1 if any did, so it can gate CI.
+Differences in settings, traffic mix or hardware are printed first: runs
+that differ there are not comparable number by number.
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("_ms", "_us_per_request", "_seconds")
+HIGHER_IS_BETTER = ("_per_s",)
+COMPARABLE_META = ("settings", "mix", "seed", "cpu_count", "platform", "python", "numpy", "sklearn")
+
+
+def flatten(results, prefix=""):
+    """Yield (dotted path, value) for every numeric leaf."""
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{path}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def _direction(path):
+    name = path.rsplit(".", 1)[-1]
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    return 0
+
+
+def compare(base, head, threshold=10.0):
+    """Rows of (path, base value, head value, change %, regressed) for comparable metrics."""
+    base_values = dict(flatten(base["results"]))
+    rows = []
+    for path, head_value in flatten(head["results"]):
+        direction = _direction(path)
+        base_value = base_values.get(path)
+        if not direction or base_value is None or base_value == 0:
+            continue
+        change = (head_value - base_value) / base_value * 100
+        rows.append((path, base_value, head_value, change, change * direction < -threshold))
+    return rows
+
+
+def meta_differences(base, head):
+    return {
+        key: (base["meta"].get(key), head["meta"].get(key))
+        for key in COMPARABLE_META
+        if base["meta"].get(key) != head["meta"].get(key)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['meta'].get('commit')}  head {head['meta'].get('commit')}")
+    for key, (before, after) in meta_differences(base, head).items():
+        print(f"⚠ {key} differs: {before} -> {after}")
+
+    rows = compare(base, head, args.threshold)
+    width = max((len(path) for path, *_ in rows), default=10)
+    for path, before, after, change, regressed in rows:
+        mark = "✗" if regressed else " "
+        print(f"{mark} {path:<{width}} {before:>14,.4g} {after:>14,.4g} {change:>+8.1f}%")
+
+    regressions = sum(1 for *_, regressed in rows if regressed)
+    print(f"{len(rows)} metrics compared, {regressions} regressed by more than {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Reproducible benchmark suite for the analysis pipeline.
+
+    python -m benchmarks.suite --json results/head.json
+    python -m benchmarks.suite --quick --stages features scoring --mix benign=60,bot=20,attack=20
+    python -m benchmarks.compare results/base.json results/head.json
+
+All stages run on seeded synthetic traffic (benchmarks.traffic) against the
+embedded SQLite backend in a fresh temporary database (schema applied by
+app.schema), so no MySQL server is needed and no real data is touched:
+
+  features  FeatureExtractor.measure_payload + extract_batch per batch size,
+            and per request for each traffic profile
+  scoring   MLService.score at batch sizes 1..100k against the active model
+  e2e       POST /analyze from concurrent clients and POST /analyze/batch
+            through the ASGI app (httpx), write-behind and micro-batching as
+            configured; latency percentiles, throughput and persisted rows
+  training  MLService.fit_model (load rows from the database, fit, export)
+            per sample count
+
+Before the scoring and e2e stages a model is fitted on the traffic and
+activated through MLService, so they exercise the real registry path. The
+JSON report carries the commit, library versions and relevant settings next
+to the results, keyed by stage and size so runs can be diffed across commits.
+Model artifacts go to a temporary MODEL_ARTIFACT_DIR unless one is set.
+"""
+import os
+import tempfile
+
+# Read at import by app.config: a scratch SQLite database, and the benchmark
+# model kept out of a real deployment's artifact directory
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="ifs-bench-")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(_SCRATCH_DIR, "bench.db")
+os.environ.setdefault("MODEL_ARTIFACT_DIR", os.path.join(_SCRATCH_DIR, "model_artifacts"))
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import IsolationForest
+
+from app.config import settings
+from app.database import db
+from app.models.request_models import AnalyzeRequest
+from app.services.feature_extractor import FeatureExtractor
+from app.services.feature_schema import tag_model
+from app.services.micro_batcher import micro_batcher
+from app.services.ml_service import ml_service
+from app.services.model_artifact import export_artifact
+from app.schema import apply_migrations
+from app.services.result_writer import INSERT_ANALYZED_REQUEST, result_writer
+from benchmarks.traffic import DEFAULT_MIX, PROFILES, generate_traffic, parse_mix, profile_counts
+
+SUITE_VERSION = 1
+STAGES = ("features", "scoring", "e2e", "training")
+MODEL_VERSION = "bench-suite"
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+DEFAULT_TRAINING_SAMPLES = [1_000, 10_000, 100_000]
+QUICK = {"batch_sizes": [1, 100, 10_000], "training_samples": [1_000, 10_000], "e2e_requests": 500, "repeat": 3}
+
+# Settings that change what the stages measure; recorded with every run
+REPORTED_SETTINGS = (
+    "SCORING_ENGINE", "COMPILED_MAX_BATCH", "MICROBATCH_ENABLED", "MICROBATCH_WINDOW_MS", "MICROBATCH_MAX_SIZE",
+    "WRITE_BEHIND_ENABLED", "WRITE_BEHIND_BATCH_SIZE", "RATE_TRACKER_BACKEND",
+    "INFERENCE_THREADPOOL_SIZE", "DB_THREADPOOL_SIZE", "METRICS_ENABLED", "DB_BACKEND",
+)
+
+
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _extract(requests):
+    payload_stats = [FeatureExtractor.measure_payload(r.payload) for r in requests]
+    return FeatureExtractor.extract_batch(requests, payload_stats)
+
+
+def _percentiles_ms(seconds):
+    values = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p90_ms": round(float(np.percentile(values, 90)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "max_ms": round(float(values.max()), 4),
+    }
+
+
+def _git(*args):
+    try:
+        result = subprocess.run(["git", *args], capture_output=True, text=True, check=False)
+    except OSError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def metadata(mix, seed):
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "suite_version": SUITE_VERSION,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "seed": seed,
+        "mix": mix,
+        "settings": {name: getattr(settings, name) for name in REPORTED_SETTINGS},
+    }
+
+
+# ==============================================================
+# Stages
+# ==============================================================
+
+def activate_model(X, n_estimators, seed):
+    """Fit a forest on the traffic features and activate it through MLService (stored in the database)."""
+    model = IsolationForest(n_estimators=n_estimators, contamination=0.1, random_state=seed, n_jobs=-1).fit(X)
+    tag_model(model)
+    ml_service.activate_model(export_artifact(model), MODEL_VERSION, len(X), model)
+
+
+def bench_features(requests, batch_sizes, repeat):
+    batches = {}
+    for size in batch_sizes:
+        batch = requests[:size]
+        seconds = _best_time(lambda: _extract(batch), repeat)
+        batches[str(size)] = {
+            "batch_size": len(batch),
+            "ms": round(seconds * 1000, 4),
+            "us_per_request": round(seconds / len(batch) * 1e6, 3),
+            "requests_per_s": round(len(batch) / seconds),
+        }
+
+    per_profile = {}
+    for profile in PROFILES:
+        subset = [r for r in requests[:10_000] if r.request_id.startswith(f"{profile}-")]
+        if subset:
+            seconds = _best_time(lambda: _extract(subset), repeat)
+            per_profile[profile] = {"requests": len(subset), "us_per_request": round(seconds / len(subset) * 1e6, 3)}
+    return {"batches": batches, "profiles": per_profile}
+
+
+def bench_scoring(X, batch_sizes, repeat):
+    batches = {}
+    for size in batch_sizes:
+        batch = np.resize(X, (size, X.shape[1]))
+        seconds = _best_time(lambda: ml_service.score(batch), repeat)
+        batches[str(size)] = {
+            "batch_size": size,
+            "ms": round(seconds * 1000, 4),
+            "rows_per_s": round(size / seconds),
+        }
+    return {"engine": ml_service.registry.stats()["scoring_engine"], "batches": batches}
+
+
+@contextmanager
+def _quiet_logs(*names):
+    """Raise these loggers to WARNING for the block (per-request INFO lines would bury the report)."""
+    loggers = [logging.getLogger(name) for name in names]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+
+
+async def _drive_app(bodies, concurrency, batch_size):
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    micro_batcher.start()   # ASGITransport does not run the startup hooks
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # First call pays for lazy imports, executor threads and the batcher task
+        (await client.post("/analyze", json=bodies[0])).raise_for_status()
+
+        pending = iter(bodies)
+        latencies, errors = [], 0
+
+        async def client_loop():
+            nonlocal errors
+            for body in pending:   # one shared iterator: each body is sent once
+                started = time.perf_counter()
+                response = await client.post("/analyze", json=body)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        single_seconds = time.perf_counter() - started
+
+        batch_latencies, batch_errors = [], 0
+        started = time.perf_counter()
+        for start in range(0, len(bodies), batch_size):
+            chunk = bodies[start:start + batch_size]
+            sent = time.perf_counter()
+            response = await client.post("/analyze/batch", json=chunk)
+            batch_latencies.append(time.perf_counter() - sent)
+            batch_errors += response.status_code != 200
+        batch_seconds = time.perf_counter() - started
+
+    await micro_batcher.stop()
+    return latencies, errors, single_seconds, batch_latencies, batch_errors, batch_seconds
+
+
+def bench_e2e(bodies, concurrency, batch_size):
+    before = db.fetch_one("SELECT COUNT(*) AS n FROM analyzed_requests")["n"]
+    # Importing app.main applies the app's INFO logging config; httpx logs every request at INFO
+    with _quiet_logs("httpx", "app"):
+        latencies, errors, single_seconds, batch_latencies, batch_errors, batch_seconds = asyncio.run(
+            _drive_app(bodies, concurrency, batch_size)
+        )
+    result_writer.close()   # flush write-behind rows so they are counted
+    persisted = db.fetch_one("SELECT COUNT(*) AS n FROM analyzed_requests")["n"] - before
+
+    return {
+        "requests": len(bodies),
+        "concurrency": concurrency,
+        "analyze": {
+            **_percentiles_ms(latencies),
+            "requests_per_s": round(len(bodies) / single_seconds),
+            "errors": errors,
+        },
+        "analyze_batch": {
+            "batch_size": batch_size,
+            **_percentiles_ms(batch_latencies),
+            "requests_per_s": round(len(bodies) / batch_seconds),
+            "errors": batch_errors,
+        },
+        "rows_persisted": persisted,
+        "rows_expected": 2 * len(bodies) + 1,
+        "rows_dropped": result_writer.stats()["dropped_rows"],
+    }
+
+
+def bench_training(X, sample_counts, n_estimators, seed):
+    # Enough rows for the largest count, newer than anything the e2e stage wrote
+    analyzed_at = datetime.utcnow()
+    rows = [
+        (f"train-{i}", "192.0.2.1", "/", "GET", 0, "{}", *X[i % len(X)].tolist(), False, 0.0, MODEL_VERSION, analyzed_at)
+        for i in range(max(sample_counts))
+    ]
+    for start in range(0, len(rows), 10_000):
+        db.execute_many(INSERT_ANALYZED_REQUEST, rows[start:start + 10_000])
+
+    results = {}
+    for samples in sample_counts:
+        started = time.perf_counter()
+        fitted = ml_service.fit_model(
+            contamination=0.1,
+            n_estimators=n_estimators,
+            use_corrected_labels=False,
+            data_options={"max_samples": samples, "sampling": "latest", "seed": seed},
+        )
+        total = time.perf_counter() - started
+        load = fitted["data_loading"]["load_seconds"]
+        results[str(samples)] = {
+            "samples": fitted["training_samples"],
+            "total_seconds": round(total, 4),
+            "load_seconds": load,
+            "fit_and_export_seconds": round(total - load, 4),
+            "artifact_bytes": len(fitted["model_data"]),
+        }
+    return {"n_estimators": n_estimators, "samples": results}
+
+
+# ==============================================================
+# Runner
+# ==============================================================
+
+def run(stages=STAGES, mix=DEFAULT_MIX, seed=42, batch_sizes=DEFAULT_BATCH_SIZES,
+        training_samples=DEFAULT_TRAINING_SAMPLES, e2e_requests=2_000, concurrency=32,
+        e2e_batch_size=100, n_estimators=100, repeat=5):
+    report = {"meta": metadata(mix, seed), "results": {}}
+    db.connect()
+    apply_migrations()
+
+    bodies = generate_traffic(max(max(batch_sizes), e2e_requests), mix, seed)
+    requests = [AnalyzeRequest(**body) for body in bodies]
+    report["meta"]["traffic"] = profile_counts(bodies)
+    X = _extract(requests)
+
+    if "features" in stages:
+        report["results"]["features"] = bench_features(requests, batch_sizes, repeat)
+    if "scoring" in stages or "e2e" in stages:
+        activate_model(X, n_estimators, seed)
+    if "scoring" in stages:
+        report["results"]["scoring"] = bench_scoring(X, batch_sizes, repeat)
+    if "e2e" in stages:
+        report["results"]["e2e"] = bench_e2e(bodies[:e2e_requests], concurrency, e2e_batch_size)
+    if "training" in stages:
+        report["results"]["training"] = bench_training(X, training_samples, n_estimators, seed)
+    return report
+
+
+def _print_report(report):
+    results = report["results"]
+    if "features" in results:
+        print("features          batch      ms   us/request")
+        for r in results["features"]["batches"].values():
+            print(f"{'':17} {r['batch_size']:>6} {r['ms']:>8.3f} {r['us_per_request']:>10.3f}")
+        for profile, r in results["features"]["profiles"].items():
+            print(f"  {profile:<15} {r['us_per_request']:>26.3f}")
+    if "scoring" in results:
+        print(f"scoring ({results['scoring']['engine']})  batch      ms       rows/s")
+        for r in results["scoring"]["batches"].values():
+            print(f"{'':17} {r['batch_size']:>6} {r['ms']:>8.3f} {r['rows_per_s']:>12,}")
+    if "e2e" in results:
+        e2e = results["e2e"]
+        for name in ("analyze", "analyze_batch"):
+            r = e2e[name]
+            print(f"e2e {name:<14} p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  "
+                  f"{r['requests_per_s']:,} req/s  errors {r['errors']}")
+        print(f"e2e persisted      {e2e['rows_persisted']} / {e2e['rows_expected']} rows")
+    if "training" in results:
+        print("training        samples  total s   load s")
+        for r in results["training"]["samples"].values():
+            print(f"{'':15} {r['samples']:>7} {r['total_seconds']:>8.3f} {r['load_seconds']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--mix", default="benign=80,bot=15,attack=5", help="Traffic profile weights")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--training-samples", type=int, nargs="+", default=DEFAULT_TRAINING_SAMPLES)
+    parser.add_argument("--e2e-requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--e2e-batch-size", type=int, default=100)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast smoke run")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    options = {
+        "batch_sizes": args.batch_sizes,
+        "training_samples": args.training_samples,
+        "e2e_requests": args.e2e_requests,
+        "repeat": args.repeat,
+    }
+    if args.quick:
+        options.update(QUICK)
+
+    report = run(
+        stages=args.stages,
+        mix=parse_mix(args.mix),
+        seed=args.seed,
+        concurrency=args.concurrency,
+        e2e_batch_size=args.e2e_batch_size,
+        n_estimators=args.n_estimators,
+        **options,
+    )
+    _print_report(report)
+
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
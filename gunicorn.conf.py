@@ -0,0 +1,46 @@
+"""
+Multi-worker deployment:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The application is imported once in the master (preload_app), which also
+memory-maps the active model artifact before forking, so the forest arrays are
+shared copy-on-write by every worker instead of being loaded N times. Each
+worker then opens its own MySQL pool and background threads in the FastAPI
+startup event; nothing that holds sockets or threads is created before fork.
+
+Model swaps are coordinated through MODEL_ARTIFACT_DIR: the worker that
+activates (or first loads) a model publishes its artifact in the ACTIVE
+pointer file and the others map that file when their next version check
+(MODEL_REFRESH_INTERVAL_SECONDS) sees the new stamp.
+"""
+from app.config import settings
+
+bind = f"{settings.API_HOST}:{settings.API_PORT}"
+workers = settings.API_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = settings.API_WORKER_TIMEOUT_SECONDS
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """Load the active model in the master, then drop the connections before workers fork."""
+    from app.database import db
+    from app.services.ml_service import ml_service
+
+    try:
+        db.connect()
+        ml_service.load_active_model()
+    except Exception as e:
+        server.log.warning(f"Model not preloaded, workers will load it on first use: {e}")
+    finally:
+        if db.is_connected():
+            db.disconnect()
+
+
+def post_fork(server, worker):
+    from app.services.ml_service import ml_service
+
+    server.log.info(f"Worker {worker.pid} serving model {ml_service.model_version or 'none'}")
@@ -0,0 +1,36 @@
+-- Base schema: trained models and analysis results.
+-- IF NOT EXISTS so databases created by hand before migrations existed are adopted as is.
+
+CREATE TABLE IF NOT EXISTS models (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    model_version VARCHAR(100) NOT NULL,
+    model_data LONGBLOB NOT NULL,
+    training_date DATETIME NOT NULL,
+    training_samples INT NOT NULL DEFAULT 0,
+    accuracy_score DECIMAL(5, 4) NULL,
+    is_active BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX idx_models_active (is_active)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS analyzed_requests (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    request_id VARCHAR(255) NOT NULL,
+    ip_address VARCHAR(45) NOT NULL,
+    endpoint VARCHAR(2048) NOT NULL,
+    http_method VARCHAR(16) NOT NULL,
+    payload_size INT NOT NULL DEFAULT 0,
+    headers_json JSON NULL,
+    ip_reputation_score FLOAT NOT NULL,
+    payload_complexity_score FLOAT NOT NULL,
+    header_anomaly_score FLOAT NOT NULL,
+    endpoint_risk_score FLOAT NOT NULL,
+    frequency_score FLOAT NOT NULL,
+    is_anomaly BOOLEAN NOT NULL,
+    confidence FLOAT NOT NULL,
+    model_version VARCHAR(100) NULL,
+    analyzed_at DATETIME NOT NULL,
+    user_label BOOLEAN NULL,
+    label_changed_at DATETIME NULL,
+    label_changed_by VARCHAR(255) NULL,
+    INDEX idx_analyzed_at (analyzed_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
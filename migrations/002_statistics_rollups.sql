@@ -0,0 +1,32 @@
+-- Hourly statistics rollup per model version.
+-- Workers add their in-memory counters here (app/services/request_stats.py);
+-- /statistics sums this table instead of scanning analyzed_requests.
+
+CREATE TABLE IF NOT EXISTS request_stats_hourly (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    anomalies BIGINT NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE NOT NULL DEFAULT 0,
+    corrections BIGINT NOT NULL DEFAULT 0,
+    false_positives_corrected BIGINT NOT NULL DEFAULT 0,
+    false_negatives_corrected BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Backfill from the rows analyzed before the rollup existed (one full scan, once)
+INSERT INTO request_stats_hourly (
+    bucket_start, model_version, requests, anomalies, confidence_sum,
+    corrections, false_positives_corrected, false_negatives_corrected
+)
+SELECT
+    DATE_FORMAT(analyzed_at, '%Y-%m-%d %H:00:00'),
+    COALESCE(model_version, ''),
+    COUNT(*),
+    SUM(is_anomaly = TRUE),
+    SUM(confidence),
+    SUM(user_label IS NOT NULL),
+    COALESCE(SUM(is_anomaly = TRUE AND user_label = FALSE), 0),
+    COALESCE(SUM(is_anomaly = FALSE AND user_label = TRUE), 0)
+FROM analyzed_requests
+GROUP BY 1, 2;
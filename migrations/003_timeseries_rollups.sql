@@ -0,0 +1,69 @@
+-- Per-minute rollup and confidence histograms for /statistics/timeseries.
+-- Minute rows are purged after STATS_MINUTE_RETENTION_HOURS; hourly rows are kept.
+-- Histogram bins must match app/services/request_stats.py:
+-- 50 bins of width 0.02 over confidence [-0.5, 0.5), values outside go to the edge bins.
+
+CREATE TABLE IF NOT EXISTS request_stats_minutely (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    anomalies BIGINT NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE NOT NULL DEFAULT 0,
+    corrections BIGINT NOT NULL DEFAULT 0,
+    false_positives_corrected BIGINT NOT NULL DEFAULT 0,
+    false_negatives_corrected BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS confidence_histogram_minutely (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    bin SMALLINT NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version, bin)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS confidence_histogram_hourly (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    bin SMALLINT NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version, bin)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Backfill: hourly histograms for all rows, minute rollups for the last two days
+INSERT INTO confidence_histogram_hourly (bucket_start, model_version, bin, requests)
+SELECT
+    DATE_FORMAT(analyzed_at, '%Y-%m-%d %H:00:00'),
+    COALESCE(model_version, ''),
+    LEAST(GREATEST(FLOOR((confidence + 0.5) / 0.02), 0), 49),
+    COUNT(*)
+FROM analyzed_requests
+GROUP BY 1, 2, 3;
+
+INSERT INTO request_stats_minutely (
+    bucket_start, model_version, requests, anomalies, confidence_sum,
+    corrections, false_positives_corrected, false_negatives_corrected
+)
+SELECT
+    DATE_FORMAT(analyzed_at, '%Y-%m-%d %H:%i:00'),
+    COALESCE(model_version, ''),
+    COUNT(*),
+    SUM(is_anomaly = TRUE),
+    SUM(confidence),
+    SUM(user_label IS NOT NULL),
+    COALESCE(SUM(is_anomaly = TRUE AND user_label = FALSE), 0),
+    COALESCE(SUM(is_anomaly = FALSE AND user_label = TRUE), 0)
+FROM analyzed_requests
+WHERE analyzed_at >= UTC_TIMESTAMP() - INTERVAL 2 DAY
+GROUP BY 1, 2;
+
+INSERT INTO confidence_histogram_minutely (bucket_start, model_version, bin, requests)
+SELECT
+    DATE_FORMAT(analyzed_at, '%Y-%m-%d %H:%i:00'),
+    COALESCE(model_version, ''),
+    LEAST(GREATEST(FLOOR((confidence + 0.5) / 0.02), 0), 49),
+    COUNT(*)
+FROM analyzed_requests
+WHERE analyzed_at >= UTC_TIMESTAMP() - INTERVAL 2 DAY
+GROUP BY 1, 2, 3;
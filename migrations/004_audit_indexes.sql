@@ -0,0 +1,14 @@
+-- Composite indexes for /audit/requests (app/services/audit_query.py).
+-- Results are ordered by (analyzed_at, id); InnoDB appends the primary key to
+-- every secondary index, so each (<filter>, analyzed_at) index below serves both
+-- the equality filter and the keyset ORDER BY ... LIMIT without a filesort.
+-- The unfiltered and date-range-only cases use idx_analyzed_at from 001.
+-- Built online (INPLACE, LOCK=NONE): inserts continue while the indexes build.
+
+ALTER TABLE analyzed_requests
+    ADD INDEX idx_ar_ip_time (ip_address, analyzed_at),
+    ADD INDEX idx_ar_ip_anomaly_time (ip_address, is_anomaly, analyzed_at),
+    ADD INDEX idx_ar_anomaly_time (is_anomaly, analyzed_at),
+    ADD INDEX idx_ar_label_time (user_label, analyzed_at),
+    ADD INDEX idx_ar_anomaly_confidence (is_anomaly, confidence),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,10 @@
+-- Feature schema each row's feature columns were extracted with
+-- (app/services/feature_schema.py). Rows stored before this migration were
+-- extracted with v1 (constant frequency_score, address-class-only
+-- ip_reputation_score); new rows are written with the current version and
+-- training only reads rows of that version.
+-- ALGORITHM=INSTANT: no table rebuild, inserts continue.
+
+ALTER TABLE analyzed_requests
+    ADD COLUMN feature_schema_version SMALLINT NOT NULL DEFAULT 1,
+    ALGORITHM=INSTANT;
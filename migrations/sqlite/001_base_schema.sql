@@ -0,0 +1,38 @@
+-- Base schema for the embedded SQLite backend (DB_BACKEND=sqlite).
+-- Same tables, columns and versions as migrations/*.sql, in SQLite's dialect.
+
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_version VARCHAR(100) NOT NULL,
+    model_data BLOB NOT NULL,
+    training_date DATETIME NOT NULL,
+    training_samples INTEGER NOT NULL DEFAULT 0,
+    accuracy_score DECIMAL(5, 4) NULL,
+    is_active BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE INDEX IF NOT EXISTS idx_models_active ON models (is_active);
+
+CREATE TABLE IF NOT EXISTS analyzed_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id VARCHAR(255) NOT NULL,
+    ip_address VARCHAR(45) NOT NULL,
+    endpoint VARCHAR(2048) NOT NULL,
+    http_method VARCHAR(16) NOT NULL,
+    payload_size INTEGER NOT NULL DEFAULT 0,
+    headers_json TEXT NULL,
+    ip_reputation_score FLOAT NOT NULL,
+    payload_complexity_score FLOAT NOT NULL,
+    header_anomaly_score FLOAT NOT NULL,
+    endpoint_risk_score FLOAT NOT NULL,
+    frequency_score FLOAT NOT NULL,
+    is_anomaly BOOLEAN NOT NULL,
+    confidence FLOAT NOT NULL,
+    model_version VARCHAR(100) NULL,
+    analyzed_at DATETIME NOT NULL,
+    user_label BOOLEAN NULL,
+    label_changed_at DATETIME NULL,
+    label_changed_by VARCHAR(255) NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_analyzed_at ON analyzed_requests (analyzed_at);
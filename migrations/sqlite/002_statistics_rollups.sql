@@ -0,0 +1,30 @@
+-- Hourly statistics rollup per model version (see migrations/002_statistics_rollups.sql).
+
+CREATE TABLE IF NOT EXISTS request_stats_hourly (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    anomalies BIGINT NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE NOT NULL DEFAULT 0,
+    corrections BIGINT NOT NULL DEFAULT 0,
+    false_positives_corrected BIGINT NOT NULL DEFAULT 0,
+    false_negatives_corrected BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version)
+);
+
+-- Backfill from the rows analyzed before the rollup existed
+INSERT INTO request_stats_hourly (
+    bucket_start, model_version, requests, anomalies, confidence_sum,
+    corrections, false_positives_corrected, false_negatives_corrected
+)
+SELECT
+    strftime('%Y-%m-%d %H:00:00', analyzed_at),
+    COALESCE(model_version, ''),
+    COUNT(*),
+    SUM(is_anomaly = TRUE),
+    SUM(confidence),
+    SUM(user_label IS NOT NULL),
+    COALESCE(SUM(is_anomaly = TRUE AND user_label = FALSE), 0),
+    COALESCE(SUM(is_anomaly = FALSE AND user_label = TRUE), 0)
+FROM analyzed_requests
+GROUP BY 1, 2;
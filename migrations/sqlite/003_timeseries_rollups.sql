@@ -0,0 +1,69 @@
+-- Per-minute rollup and confidence histograms (see migrations/003_timeseries_rollups.sql).
+-- Histogram bins must match app/services/request_stats.py:
+-- 50 bins of width 0.02 over confidence [-0.5, 0.5), values outside go to the edge bins.
+
+CREATE TABLE IF NOT EXISTS request_stats_minutely (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    anomalies BIGINT NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE NOT NULL DEFAULT 0,
+    corrections BIGINT NOT NULL DEFAULT 0,
+    false_positives_corrected BIGINT NOT NULL DEFAULT 0,
+    false_negatives_corrected BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version)
+);
+
+CREATE TABLE IF NOT EXISTS confidence_histogram_minutely (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    bin SMALLINT NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version, bin)
+);
+
+CREATE TABLE IF NOT EXISTS confidence_histogram_hourly (
+    bucket_start DATETIME NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    bin SMALLINT NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model_version, bin)
+);
+
+-- Backfill: hourly histograms for all rows, minute rollups for the last two days.
+-- CAST truncates toward zero, which equals FLOOR for every value not clamped to bin 0.
+INSERT INTO confidence_histogram_hourly (bucket_start, model_version, bin, requests)
+SELECT
+    strftime('%Y-%m-%d %H:00:00', analyzed_at),
+    COALESCE(model_version, ''),
+    MIN(MAX(CAST((confidence + 0.5) / 0.02 AS INTEGER), 0), 49),
+    COUNT(*)
+FROM analyzed_requests
+GROUP BY 1, 2, 3;
+
+INSERT INTO request_stats_minutely (
+    bucket_start, model_version, requests, anomalies, confidence_sum,
+    corrections, false_positives_corrected, false_negatives_corrected
+)
+SELECT
+    strftime('%Y-%m-%d %H:%M:00', analyzed_at),
+    COALESCE(model_version, ''),
+    COUNT(*),
+    SUM(is_anomaly = TRUE),
+    SUM(confidence),
+    SUM(user_label IS NOT NULL),
+    COALESCE(SUM(is_anomaly = TRUE AND user_label = FALSE), 0),
+    COALESCE(SUM(is_anomaly = FALSE AND user_label = TRUE), 0)
+FROM analyzed_requests
+WHERE analyzed_at >= datetime('now', '-2 days')
+GROUP BY 1, 2;
+
+INSERT INTO confidence_histogram_minutely (bucket_start, model_version, bin, requests)
+SELECT
+    strftime('%Y-%m-%d %H:%M:00', analyzed_at),
+    COALESCE(model_version, ''),
+    MIN(MAX(CAST((confidence + 0.5) / 0.02 AS INTEGER), 0), 49),
+    COUNT(*)
+FROM analyzed_requests
+WHERE analyzed_at >= datetime('now', '-2 days')
+GROUP BY 1, 2, 3;
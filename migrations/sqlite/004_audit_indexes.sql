@@ -0,0 +1,9 @@
+-- Composite indexes for /audit/requests (see migrations/004_audit_indexes.sql).
+-- SQLite appends the rowid (id) to every index, so these also serve the
+-- keyset ORDER BY analyzed_at DESC, id DESC.
+
+CREATE INDEX IF NOT EXISTS idx_ar_ip_time ON analyzed_requests (ip_address, analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_ar_ip_anomaly_time ON analyzed_requests (ip_address, is_anomaly, analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_ar_anomaly_time ON analyzed_requests (is_anomaly, analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_ar_label_time ON analyzed_requests (user_label, analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_ar_anomaly_confidence ON analyzed_requests (is_anomaly, confidence);
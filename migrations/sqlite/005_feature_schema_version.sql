@@ -0,0 +1,4 @@
+-- Feature schema of each row's feature columns (see migrations/005_feature_schema_version.sql).
+-- Existing rows were extracted with v1.
+
+ALTER TABLE analyzed_requests ADD COLUMN feature_schema_version SMALLINT NOT NULL DEFAULT 1;
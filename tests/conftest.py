@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Read at import by app.config: keep the suite on a scratch SQLite database
+# and out of a real deployment's artifact, spill and archive directories
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="ifs-tests-")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(_SCRATCH_DIR, "tests.db")
+os.environ["MODEL_ARTIFACT_DIR"] = os.path.join(_SCRATCH_DIR, "model_artifacts")
+os.environ["WRITE_BEHIND_SPILL_DIR"] = os.path.join(_SCRATCH_DIR, "spill")
+os.environ["ARCHIVE_DIR"] = os.path.join(_SCRATCH_DIR, "archive")
+os.environ["TRAINING_JOBS_DIR"] = os.path.join(_SCRATCH_DIR, "training_jobs")
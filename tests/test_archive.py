@@ -0,0 +1,173 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import db
+from app.schema import apply_migrations
+from app.services import archive as archive_module
+from app.services import audit_query
+from app.services.archive import RequestArchive, _pyarrow
+from app.services.audit_query import PAGE_COLUMNS, AuditFilters, archived_page, encode_cursor, keyset_condition
+from app.services.feature_schema import N_FEATURES
+from app.services.result_writer import INSERT_ANALYZED_REQUEST
+
+# Noon, so the minute offsets below never cross into another day partition
+NOW = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+def request_table():
+    db.connect()
+    apply_migrations()
+    db.execute_query("DELETE FROM analyzed_requests")
+    yield
+    db.execute_query("DELETE FROM analyzed_requests")
+
+
+def _insert(times):
+    db.execute_many(INSERT_ANALYZED_REQUEST, [
+        (f"req-{i}", "10.0.0.1", "/api", "GET", 0, "{}", *[0.1] * N_FEATURES, i % 3 == 0, 0.5, "v-test", at)
+        for i, at in enumerate(times)
+    ])
+
+
+def _database_ids():
+    return [row["id"] for row in db.fetch_all("SELECT id FROM analyzed_requests ORDER BY id")]
+
+
+def _archive_files(directory, suffix):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory) for name in names if name.endswith(suffix)
+    )
+
+
+# ==============================================================
+# Crash recovery
+# ==============================================================
+
+def test_crash_before_delete_commits_discards_tmp_files(request_table, tmp_path, monkeypatch):
+    _insert([NOW - timedelta(days=10, minutes=i) for i in range(20)] + [NOW - timedelta(days=9)])
+    ids = _database_ids()
+    archive = RequestArchive(directory=str(tmp_path), after_days=1, batch_size=100)
+
+    # The DELETE fails inside the transaction, after the day files were written
+    transaction = db.transaction
+
+    @contextmanager
+    def failing_delete():
+        with transaction() as cursor:
+            execute = cursor.execute
+
+            def execute_or_fail(query, params=None):
+                if query.startswith("DELETE"):
+                    raise RuntimeError("connection lost")
+                return execute(query, params)
+
+            cursor.execute = execute_or_fail
+            yield cursor
+
+    monkeypatch.setattr(db, "transaction", failing_delete)
+    with pytest.raises(RuntimeError):
+        archive.archive()
+    monkeypatch.undo()
+
+    assert _database_ids() == ids
+    assert len(_archive_files(tmp_path, ".parquet.tmp")) == 2
+    assert not archive.has_data()
+
+    archive._recover(_pyarrow())
+    assert _archive_files(tmp_path, ".parquet.tmp") == []
+    assert not archive.has_data()
+    assert _database_ids() == ids
+
+
+def test_crash_after_delete_commits_publishes_tmp_files(request_table, tmp_path, monkeypatch):
+    _insert([NOW - timedelta(days=10, minutes=i) for i in range(20)] + [NOW - timedelta(days=9)])
+    archive = RequestArchive(directory=str(tmp_path), after_days=1, batch_size=100)
+
+    # The rows are deleted, then the process dies before renaming the files into place
+    def crash(src, dst):
+        raise OSError("killed")
+
+    monkeypatch.setattr(archive_module.os, "replace", crash)
+    with pytest.raises(OSError):
+        archive.archive()
+    monkeypatch.undo()
+
+    assert _database_ids() == []
+    assert len(_archive_files(tmp_path, ".parquet.tmp")) == 2
+    assert not archive.has_data()
+
+    archive._recover(_pyarrow())
+    assert _archive_files(tmp_path, ".parquet.tmp") == []
+    assert len(_archive_files(tmp_path, ".parquet")) == 2
+    assert archive.count(AuditFilters()) == 21
+    assert archive.stats()["recovered_files"] == 2
+
+
+# ==============================================================
+# Pages continued in the archive
+# ==============================================================
+
+@pytest.fixture
+def two_tiers(request_table, tmp_path, monkeypatch):
+    """Rows split between the database and the archive, with the single-tier order taken before archiving."""
+    times = [NOW - timedelta(hours=i) for i in range(9)]                      # stay in the database
+    times += [NOW - timedelta(days=3, hours=i // 3) for i in range(12)]       # ties on analyzed_at
+    times += [NOW - timedelta(days=5 + i % 2, minutes=i) for i in range(10)]  # several partitions
+    _insert(times)
+    expected = {
+        filters: [row["id"] for row in db.fetch_all(
+            f"SELECT id FROM analyzed_requests WHERE {filters.where()[0]} ORDER BY analyzed_at DESC, id DESC",
+            tuple(filters.where()[1])
+        )]
+        for filters in (AuditFilters(), AuditFilters(is_anomaly=True))
+    }
+
+    archive = RequestArchive(directory=str(tmp_path), after_days=1, batch_size=8)
+    assert archive.archive() == 22
+    monkeypatch.setattr(audit_query, "request_archive", archive)
+    return expected
+
+
+def _page(filters, page_size, cursor=None, page=1):
+    """One /audit/requests page: the database query of the route, continued by archived_page."""
+    where, params = filters.where()
+    page_clause, page_params, offset = where, list(params), 0
+    if cursor:
+        keyset, keyset_params = keyset_condition(cursor)
+        page_clause, page_params = f"{where} AND {keyset}", page_params + keyset_params
+    else:
+        offset = (page - 1) * page_size
+    rows = db.fetch_all(
+        f"SELECT {', '.join(PAGE_COLUMNS)} FROM analyzed_requests WHERE {page_clause} "
+        f"ORDER BY analyzed_at DESC, id DESC LIMIT %s OFFSET %s",
+        tuple(page_params + [page_size, offset])
+    )
+    return list(rows) + archived_page(filters, where, params, len(rows), page_size, cursor, offset)
+
+
+@pytest.mark.parametrize("filters", [AuditFilters(), AuditFilters(is_anomaly=True)])
+@pytest.mark.parametrize("page_size", [4, 7])
+def test_cursor_pages_match_single_tier_order(two_tiers, filters, page_size):
+    ids, cursor = [], None
+    while True:
+        rows = _page(filters, page_size, cursor=cursor)
+        ids += [row["id"] for row in rows]
+        if len(rows) < page_size:
+            break
+        cursor = encode_cursor(rows[-1]["analyzed_at"], rows[-1]["id"])
+    assert ids == two_tiers[filters]
+
+
+@pytest.mark.parametrize("filters", [AuditFilters(), AuditFilters(is_anomaly=True)])
+@pytest.mark.parametrize("page_size", [4, 7])
+def test_offset_pages_match_single_tier_order(two_tiers, filters, page_size):
+    expected = two_tiers[filters]
+    pages = -(-len(expected) // page_size) + 1   # one past the end
+    for page in range(1, pages + 1):
+        rows = _page(filters, page_size, page=page)
+        assert [row["id"] for row in rows] == expected[(page - 1) * page_size:page * page_size]
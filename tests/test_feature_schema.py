@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from app.services.feature_schema import FEATURE_SCHEMA_VERSION, N_FEATURES, check_model_schema, tag_model
+from app.services.model_artifact import export_artifact, load_artifact
+
+
+def _fit():
+    X = np.random.default_rng(0).normal(size=(200, N_FEATURES))
+    return IsolationForest(n_estimators=5, random_state=0).fit(X)
+
+
+def test_tagged_model_is_accepted():
+    model = tag_model(_fit())
+    check_model_schema(model)
+    load_artifact(export_artifact(model)).check_schema()
+
+
+def test_untagged_model_counts_as_v1_and_is_refused():
+    assert FEATURE_SCHEMA_VERSION > 1
+    model = _fit()
+    with pytest.raises(ValueError, match="Retrain the model"):
+        check_model_schema(model)
+    with pytest.raises(ValueError, match="Retrain the model"):
+        load_artifact(export_artifact(model)).check_schema()
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from app.config import settings
+from app.services.feature_schema import N_FEATURES, tag_model
+from app.services.forest_compiler import compile_forest
+from app.services.ml_service import ActiveModel, MLService
+from app.services.model_artifact import export_artifact, load_artifact
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(7)
+    train = rng.normal(size=(2_000, N_FEATURES)).astype(np.float32)
+    model = tag_model(IsolationForest(n_estimators=50, contamination=0.1, random_state=7).fit(train))
+    X = np.vstack([
+        rng.normal(size=(1_500, N_FEATURES)),
+        rng.uniform(-6, 6, size=(500, N_FEATURES)),   # outliers, so both labels occur
+    ]).astype(np.float32)
+    return model, X
+
+
+def _service(snapshot: ActiveModel) -> MLService:
+    service = MLService()
+    service.registry._snapshot = snapshot
+    service.registry._next_check = time.monotonic() + 3600
+    return service
+
+
+def test_compiled_forest_matches_sklearn(fitted):
+    model, X = fitted
+    forest = compile_forest(model)
+    assert forest is not None
+    np.testing.assert_allclose(forest.decision_function(X), model.decision_function(X), rtol=0, atol=1e-9)
+
+
+def test_score_engines_agree_across_max_batch(fitted, monkeypatch):
+    model, X = fitted
+    monkeypatch.setattr(settings, "COMPILED_MAX_BATCH", 100)
+    service = _service(ActiveModel("v-test", ("v-test", None), forest=compile_forest(model), model=model))
+
+    small = [service.score(X[start:start + 100]) for start in range(0, len(X), 100)]   # compiled engine
+    large = service.score(X)                                                           # sklearn engine
+
+    np.testing.assert_allclose(np.concatenate([scores for _, scores, _ in small]), large[1], rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(np.concatenate([labels for labels, _, _ in small]), large[0])
+    np.testing.assert_array_equal(large[0], model.predict(X) == -1)
+
+
+def test_large_batch_falls_back_to_forest_when_estimator_cannot_load(fitted, monkeypatch, caplog):
+    model, X = fitted
+    monkeypatch.setattr(settings, "COMPILED_MAX_BATCH", 100)
+    artifact = load_artifact(export_artifact(model, include_estimator=True))
+
+    def broken_estimator():
+        raise ValueError("Could not load the embedded estimator")
+
+    monkeypatch.setattr(artifact, "load_estimator", broken_estimator)
+    service = _service(ActiveModel("v-test", ("v-test", None), forest=artifact.forest, artifact=artifact))
+
+    with caplog.at_level("WARNING", logger="app.services.ml_service"):
+        first = service.score(X)
+        second = service.score(X)
+
+    np.testing.assert_allclose(first[1], model.decision_function(X), rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(first[1], second[1])
+    assert sum("compiled forest only" in record.getMessage() for record in caplog.records) == 1